@@ -11,6 +11,7 @@ import json
 from core.auth import get_current_admin
 from core.admin_config_manager import admin_config_manager, APIConfiguration
 from core.professional_logger import professional_logger, LogLevel, LogCategory
+from core.query_profiler import query_profiler
 from core.external_api_integrator import (
     social_media_integrator, 
     payment_processor_integrator, 
@@ -346,10 +347,10 @@ async def get_system_logs(
     search: Optional[str] = None,
     user_id: Optional[str] = None,
     limit: int = 100,
-    offset: int = 0,
+    cursor: Optional[str] = None,
     current_admin: dict = Depends(get_current_admin)
 ):
-    """Get system logs with filtering for admin dashboard"""
+    """Get system logs with filtering for admin dashboard (cursor-paginated)"""
     try:
         # Parse dates if provided
         start_datetime = datetime.fromisoformat(start_date.replace('Z', '+00:00')) if start_date else None
@@ -367,8 +368,8 @@ async def get_system_logs(
             end_date=end_datetime,
             search=search,
             user_id=user_id,
-            limit=limit,
-            offset=offset
+            limit=min(max(limit, 1), 1000),
+            cursor=cursor
         )
         
         await professional_logger.log(
@@ -425,6 +426,31 @@ async def get_log_statistics(
         )
         raise HTTPException(status_code=500, detail=f"Failed to get log statistics: {str(e)}")
 
+@router.get("/database/slow-queries")
+async def get_slow_queries(
+    collection: Optional[str] = None,
+    collscan_only: bool = False,
+    limit: int = 50,
+    current_admin: dict = Depends(get_current_admin)
+):
+    """Per-operation Mongo latency and recent slow operations with their explain plans"""
+    try:
+        return query_profiler.get_report(
+            limit=min(max(limit, 1), query_profiler.SLOW_LOG_SIZE),
+            collection=collection,
+            collscan_only=collscan_only
+        )
+        
+    except Exception as e:
+        await professional_logger.log(
+            LogLevel.ERROR, LogCategory.ADMIN,
+            f"Failed to get slow queries: {str(e)}",
+            details={"admin_id": current_admin.get("user_id")},
+            user_id=current_admin.get("user_id"),
+            error=e
+        )
+        raise HTTPException(status_code=500, detail=f"Failed to get slow queries: {str(e)}")
+
 @router.get("/system/health")
 async def get_system_health(
     current_admin: dict = Depends(get_current_admin)
@@ -9,6 +9,7 @@ from datetime import datetime
 import uuid
 
 from core.auth import get_current_active_user
+from core.auth_cache import auth_cache
 from core.database import get_ai_conversations_collection
 from services.user_service import get_user_service
 
@@ -238,6 +239,7 @@ async def create_ai_conversation(
             {"_id": current_user["_id"]},
             {"$inc": {"usage_stats.ai_requests_used": 1}}
         )
+        auth_cache.invalidate_user(current_user["_id"])
         
         return {
             "success": True,
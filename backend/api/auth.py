@@ -3,11 +3,12 @@ Authentication API Routes
 Professional Mewayz Platform
 """
 from fastapi import APIRouter, HTTPException, Depends, status
-from fastapi.security import OAuth2PasswordRequestForm
+from fastapi.security import OAuth2PasswordRequestForm, HTTPAuthorizationCredentials
 from pydantic import BaseModel, EmailStr
-from datetime import timedelta
+from datetime import datetime, timedelta
 
-from core.auth import create_access_token, get_current_active_user
+from core.auth import create_access_token, get_current_active_user, security
+from core.auth_cache import auth_cache
 from core.config import settings
 from services.user_service import get_user_service
 
@@ -162,8 +163,16 @@ async def verify_token(current_user: dict = Depends(get_current_active_user)):
     }
 
 @router.post("/logout")
-async def logout_user(current_user: dict = Depends(get_current_active_user)):
-    """Logout user (client should remove token)"""
+async def logout_user(
+    current_user: dict = Depends(get_current_active_user),
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+):
+    """Logout user: the token is revoked (client should remove it too)"""
+    # Kept until the latest moment the token could still be valid
+    await auth_cache.revoke(
+        credentials.credentials, current_user["_id"],
+        datetime.utcnow() + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+    )
     return {
         "success": True,
         "message": "Logged out successfully"
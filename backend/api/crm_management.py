@@ -10,8 +10,10 @@ from datetime import datetime, timedelta
 import uuid
 
 from core.auth import get_current_active_user
+from core.cache import cache_manager
 from core.database import get_database
 from services.user_service import get_user_service
+from services.crm_service import CRMService
 
 router = APIRouter()
 
@@ -319,49 +321,12 @@ async def get_contacts(
                 return {"success": True, "data": {"contacts": [], "pagination": {}}}
             workspace_id = str(workspace["_id"])
         
-        contacts_collection = get_contacts_collection()
-        
-        # Build query
-        query = {"workspace_id": workspace_id}
-        
-        if status_filter:
-            query["status"] = status_filter
-        
-        if search:
-            query["$or"] = [
-                {"first_name": {"$regex": search, "$options": "i"}},
-                {"last_name": {"$regex": search, "$options": "i"}},
-                {"email": {"$regex": search, "$options": "i"}},
-                {"company": {"$regex": search, "$options": "i"}}
-            ]
-        
-        # Get total count
-        total_contacts = await contacts_collection.count_documents(query)
-        
-        # Get contacts with pagination
-        skip = (page - 1) * limit
-        contacts = await contacts_collection.find(query).sort("created_at", -1).skip(skip).limit(limit).to_list(length=None)
-        
-        # Enhance contacts with recent activity
-        for contact in contacts:
-            contact["id"] = str(contact["_id"])
-            contact["full_name"] = f"{contact['first_name']} {contact.get('last_name', '')}".strip()
-            
-            # Get last activity (simplified for performance)
-            contact["last_activity"] = contact.get("updated_at", contact["created_at"])
+        # Cached per workspace; contact and deal writes invalidate it
+        contacts = await CRMService.get_contacts(workspace_id, status_filter, search, limit, page)
         
         return {
             "success": True,
-            "data": {
-                "contacts": contacts,
-                "pagination": {
-                    "current_page": page,
-                    "total_pages": (total_contacts + limit - 1) // limit,
-                    "total_contacts": total_contacts,
-                    "has_next": skip + limit < total_contacts,
-                    "has_prev": page > 1
-                }
-            }
+            "data": contacts
         }
         
     except Exception as e:
@@ -445,6 +410,7 @@ async def create_contact(
         
         # Save contact
         await contacts_collection.insert_one(contact_doc)
+        await cache_manager.invalidate_workspace_collections(workspace_id, "contacts")
         
         response_contact = contact_doc.copy()
         response_contact["id"] = str(response_contact["_id"])
@@ -564,6 +530,7 @@ async def update_contact(
             {"_id": contact_id},
             update_doc
         )
+        await cache_manager.invalidate_workspace_collections(contact["workspace_id"], "contacts")
         
         if result.modified_count == 0:
             raise HTTPException(
@@ -656,6 +623,7 @@ async def create_deal(
                 "$set": {"updated_at": datetime.utcnow()}
             }
         )
+        await cache_manager.invalidate_workspace_collections(workspace_id, "deals", "contacts")
         
         response_deal = deal_doc.copy()
         response_deal["id"] = str(response_deal["_id"])
@@ -691,35 +659,12 @@ async def get_deals(
                 return {"success": True, "data": {"deals": []}}
             workspace_id = str(workspace["_id"])
         
-        deals_collection = get_deals_collection()
-        
-        # Build query
-        query = {"workspace_id": workspace_id}
-        if stage_filter:
-            query["stage"] = stage_filter
-        
-        # Get deals
-        deals = await deals_collection.find(query).sort("created_at", -1).limit(limit).to_list(length=None)
-        
-        # Enhance deals
-        for deal in deals:
-            deal["id"] = str(deal["_id"])
-        
-        # Group by stage for pipeline view
-        pipeline = {}
-        for deal in deals:
-            stage = deal["stage"]
-            if stage not in pipeline:
-                pipeline[stage] = []
-            pipeline[stage].append(deal)
+        # Cached per workspace; contact and deal writes invalidate it
+        deals = await CRMService.get_deals(workspace_id, stage_filter, limit)
         
         return {
             "success": True,
-            "data": {
-                "deals": deals,
-                "pipeline": pipeline,
-                "total_value": sum(deal.get("value", 0) for deal in deals)
-            }
+            "data": deals
         }
         
     except Exception as e:
@@ -775,6 +720,7 @@ async def create_activity(
                 {"_id": activity_data.contact_id},
                 {"$set": {"last_contacted_at": datetime.utcnow()}}
             )
+            await cache_manager.invalidate_workspace_collections(workspace_id, "contacts")
         
         response_activity = activity_doc.copy()
         response_activity["id"] = str(response_activity["_id"])
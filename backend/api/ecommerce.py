@@ -10,9 +10,11 @@ import uuid
 from decimal import Decimal
 
 from core.auth import get_current_active_user
+from core.cache import cache_manager
 from core.database import get_database
 from services.user_service import get_user_service
 from services.analytics_service import get_analytics_service
+from services.ecommerce_service import EcommerceService
 
 router = APIRouter()
 
@@ -105,43 +107,12 @@ async def get_products(
 ):
     """Get products with real database operations"""
     try:
-        products_collection = get_products_collection()
-        
-        # Build query
-        query = {"user_id": current_user["_id"], "is_active": True}
-        if category:
-            query["category"] = category
-        if search:
-            query["$or"] = [
-                {"name": {"$regex": search, "$options": "i"}},
-                {"description": {"$regex": search, "$options": "i"}}
-            ]
-        
-        # Calculate pagination
-        skip = (page - 1) * limit
-        
-        # Get products
-        products = await products_collection.find(query).sort("created_at", -1).skip(skip).limit(limit).to_list(length=None)
-        total_products = await products_collection.count_documents(query)
-        
-        # Calculate analytics for each product
-        for product in products:
-            # Get product analytics
-            product_analytics = await get_product_analytics(product["_id"])
-            product["analytics"] = product_analytics
+        # Cached per user; product writes invalidate it
+        products = await EcommerceService.get_products(current_user["_id"], category, search, limit, page)
         
         return {
             "success": True,
-            "data": {
-                "products": products,
-                "pagination": {
-                    "current_page": page,
-                    "total_pages": (total_products + limit - 1) // limit,
-                    "total_products": total_products,
-                    "has_next": skip + limit < total_products,
-                    "has_prev": page > 1
-                }
-            }
+            "data": products
         }
         
     except Exception as e:
@@ -196,6 +167,7 @@ async def create_product(
         
         # Save to database
         await products_collection.insert_one(product_doc)
+        await cache_manager.invalidate_collection_cache("products", current_user["_id"])
         
         return {
             "success": True,
@@ -374,6 +346,7 @@ async def update_product(
             {"_id": product_id},
             update_doc
         )
+        await cache_manager.invalidate_collection_cache("products", current_user["_id"])
         
         if result.modified_count == 0:
             raise HTTPException(
@@ -397,30 +370,3 @@ async def update_product(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to update product: {str(e)}"
         )
-
-# Helper functions
-async def get_product_analytics(product_id: str) -> Dict[str, Any]:
-    """Get product analytics - would integrate with real analytics"""
-    orders_collection = get_orders_collection()
-    
-    # Get order data for this product
-    orders_with_product = await orders_collection.find({
-        "items.product_id": product_id,
-        "status": {"$in": ["completed", "delivered"]}
-    }).to_list(length=None)
-    
-    total_sold = 0
-    total_revenue = 0.0
-    
-    for order in orders_with_product:
-        for item in order.get("items", []):
-            if item.get("product_id") == product_id:
-                total_sold += item.get("quantity", 0)
-                total_revenue += item.get("quantity", 0) * item.get("price", 0)
-    
-    return {
-        "total_sold": total_sold,
-        "total_revenue": round(total_revenue, 2),
-        "views": 0,  # Would be tracked from actual page views
-        "conversion_rate": 0.0  # Would be calculated from views vs purchases
-    }
\ No newline at end of file
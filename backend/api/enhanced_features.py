@@ -237,10 +237,10 @@ async def websocket_notifications(websocket: WebSocket, user_id: str):
             
             # Handle ping/pong for connection health
             if message.get("type") == "ping":
-                await websocket.send_text(json.dumps({
+                await notification_system.connection_manager.send_personal_message({
                     "type": "pong",
                     "timestamp": datetime.utcnow().isoformat()
-                }))
+                }, websocket)
             
     except WebSocketDisconnect:
         notification_system.connection_manager.disconnect(websocket)
@@ -13,6 +13,7 @@ import uuid
 import os
 
 from core.auth import create_access_token, get_current_active_user
+from core.auth_cache import auth_cache
 from core.database import get_database
 from services.user_service import get_user_service
 
@@ -177,6 +178,7 @@ async def google_verify_token(oauth_request: GoogleOAuthRequest):
                 {"email": email},
                 {"$set": update_data}
             )
+            auth_cache.invalidate_user(email=email)
             
             # Fetch updated user
             user = await users_collection.find_one({"email": email})
@@ -340,6 +342,7 @@ async def link_google_account(
             {"_id": current_user["_id"]},
             {"$set": update_data}
         )
+        auth_cache.invalidate_user(current_user["_id"])
         
         return {
             "success": True,
@@ -396,6 +399,7 @@ async def unlink_google_account(current_user: dict = Depends(get_current_active_
                 }
             }
         )
+        auth_cache.invalidate_user(current_user["_id"])
         
         return {
             "success": True,
@@ -9,12 +9,17 @@ from pydantic import BaseModel, HttpUrl
 from typing import Optional, Dict, Any, List
 from datetime import datetime, timedelta
 import uuid
-import secrets
 import re
 from urllib.parse import urlparse
+from pymongo.errors import DuplicateKeyError
 
 from core.auth import get_current_active_user
 from core.database import get_database
+from core.professional_logger import professional_logger, LogLevel, LogCategory
+from services.link_click_rollup_service import link_click_rollups
+from services.link_redirect_service import link_redirects
+from services.link_shortener_service import LinkShortenerService
+from services.short_code_allocator import short_code_allocator
 from services.user_service import get_user_service
 from services.analytics_service import get_analytics_service
 
@@ -87,6 +92,9 @@ class ShortLinkUpdate(BaseModel):
     is_active: Optional[bool] = None
     password: Optional[str] = None
 
+# Upper bound on links per bulk-create request
+MAX_BULK_LINKS = 10000
+
 class BulkLinkCreate(BaseModel):
     links: List[Dict[str, str]]  # [{"url": "...", "title": "..."}]
     default_domain: str = "mwz.to"
@@ -106,12 +114,6 @@ def get_link_clicks_collection():
     db = get_database()
     return db.link_clicks
 
-def generate_short_code(length: int = 8) -> str:
-    """Generate a random short code"""
-    # Use URL-safe characters
-    chars = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789"
-    return ''.join(secrets.choice(chars) for _ in range(length))
-
 def validate_custom_slug(slug: str) -> bool:
     """Validate custom slug format"""
     if not slug:
@@ -366,20 +368,8 @@ async def create_short_link(
             
             short_code = link_data.custom_slug
         else:
-            # Generate unique short code
-            attempts = 0
-            while attempts < 10:  # Prevent infinite loop
-                short_code = generate_short_code()
-                existing = await short_links_collection.find_one({"short_code": short_code})
-                if not existing:
-                    break
-                attempts += 1
-            
-            if attempts >= 10:
-                raise HTTPException(
-                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                    detail="Failed to generate unique short code"
-                )
+            # Allocated codes are unique by construction; no lookup needed
+            short_code = await LinkShortenerService.generate_short_code()
         
         # Validate original URL
         original_url = str(link_data.original_url)
@@ -411,7 +401,19 @@ async def create_short_link(
         }
         
         # Save to database
-        await short_links_collection.insert_one(link_doc)
+        if link_data.custom_slug:
+            try:
+                await short_links_collection.insert_one(link_doc)
+            except DuplicateKeyError:
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail="Custom slug already exists"
+                )
+        else:
+            await LinkShortenerService.insert_links([link_doc])
+            short_code = link_doc["short_code"]
+        # The code may be negatively cached from an earlier lookup
+        link_redirects.invalidate(short_code)
         
         # Create analytics record
         await create_link_analytics_record(link_doc["_id"], current_user["_id"])
@@ -436,105 +438,166 @@ async def create_short_link(
             detail=f"Failed to create short link: {str(e)}"
         )
 
-@router.get("/{short_code}")
-async def redirect_short_link(short_code: str, request: Request):
-    """Redirect short link and track analytics"""
+@router.post("/bulk-create")
+async def bulk_create_short_links(
+    bulk_data: BulkLinkCreate,
+    current_user: dict = Depends(get_current_active_user)
+):
+    """Create many short links at once, e.g. for campaign imports
+    
+    Codes come from a leased range (one round trip per thousand codes) and the
+    links are written with a single insert_many, with no per-link collision checks.
+    Rows with a missing or invalid URL are reported back and skipped.
+    """
     try:
-        short_links_collection = get_short_links_collection()
-        link_clicks_collection = get_link_clicks_collection()
-        
-        # Find short link
-        link = await short_links_collection.find_one({"short_code": short_code})
-        
-        if not link:
+        if not bulk_data.links:
             raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Short link not found"
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="No links provided"
             )
-        
-        # Check if link is active
-        if not link.get("is_active", True):
+        if len(bulk_data.links) > MAX_BULK_LINKS:
             raise HTTPException(
-                status_code=status.HTTP_410_GONE,
-                detail="This link has been disabled"
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"At most {MAX_BULK_LINKS} links per request"
             )
         
-        # Check if link is expired
-        if link.get("expires_at") and link["expires_at"] < datetime.utcnow():
+        short_links_collection = get_short_links_collection()
+        
+        # Check user's link creation limits for the whole batch
+        existing_links = await short_links_collection.count_documents({"user_id": current_user["_id"]})
+        max_links = await get_user_link_limit(current_user)
+        if max_links != -1 and existing_links + len(bulk_data.links) > max_links:
             raise HTTPException(
-                status_code=status.HTTP_410_GONE,
-                detail="This link has expired"
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail=f"Link limit reached ({max_links}). Upgrade your plan for more links."
             )
         
-        # Handle password protection
-        if link.get("password"):
-            # In a real implementation, this would redirect to a password entry page
-            # For now, we'll just track the click and redirect
-            pass
-        
-        # Extract click information
-        user_agent = request.headers.get("user-agent", "")
-        client_ip = request.client.host
-        referer = request.headers.get("referer", "")
-        
-        # Determine device type (simple detection)
-        device_type = "desktop"
-        if any(mobile in user_agent.lower() for mobile in ['mobile', 'android', 'iphone']):
-            device_type = "mobile"
-        elif 'tablet' in user_agent.lower() or 'ipad' in user_agent.lower():
-            device_type = "tablet"
-        
-        # Record click
-        click_doc = {
-            "_id": str(uuid.uuid4()),
-            "user_id": link["user_id"],
-            "link_id": link["_id"],
-            "short_code": short_code,
-            "clicked_at": datetime.utcnow(),
-            "ip_address": client_ip,
-            "user_agent": user_agent,
-            "referer": referer,
-            "device_type": device_type,
-            "country": "Unknown",  # Would integrate with GeoIP service
-            "city": "Unknown"
-        }
-        
-        await link_clicks_collection.insert_one(click_doc)
-        
-        # Update link statistics
-        await short_links_collection.update_one(
-            {"_id": link["_id"]},
-            {
-                "$inc": {"total_clicks": 1},
-                "$set": {"last_clicked_at": datetime.utcnow()}
-            }
-        )
-        
-        # Build final URL with UTM parameters
-        final_url = link["original_url"]
-        if link.get("utm_parameters"):
-            utm_params = []
-            for key, value in link["utm_parameters"].items():
-                utm_params.append(f"{key}={value}")
+        valid_rows = []
+        failed = []
+        for row_index, row in enumerate(bulk_data.links):
+            original_url = (row.get("url") or "").strip()
+            parsed_url = urlparse(original_url)
+            if parsed_url.scheme not in ("http", "https") or not parsed_url.netloc:
+                failed.append({"index": row_index, "url": original_url, "error": "Invalid URL format"})
+                continue
+            valid_rows.append((row, original_url, parsed_url))
+        
+        link_docs = []
+        if valid_rows:
+            codes = await short_code_allocator.allocate(len(valid_rows))
+            now = datetime.utcnow()
+            for (row, original_url, parsed_url), short_code in zip(valid_rows, codes):
+                link_docs.append({
+                    "_id": str(uuid.uuid4()),
+                    "user_id": current_user["_id"],
+                    "short_code": short_code,
+                    "original_url": original_url,
+                    "title": row.get("title") or f"Link to {parsed_url.netloc}",
+                    "description": row.get("description", ""),
+                    "total_clicks": 0,
+                    "unique_clicks": 0,
+                    "expires_at": None,
+                    "password": None,
+                    "utm_parameters": {},
+                    "is_active": True,
+                    "created_at": now,
+                    "updated_at": now,
+                    "last_clicked_at": None,
+                    "domain": bulk_data.default_domain
+                })
             
-            separator = "&" if "?" in final_url else "?"
-            final_url = f"{final_url}{separator}{'&'.join(utm_params)}"
+            await LinkShortenerService.insert_links(link_docs)
+            for link_doc in link_docs:
+                link_redirects.invalidate(link_doc["short_code"])
+            await create_link_analytics_records(
+                [link_doc["_id"] for link_doc in link_docs], current_user["_id"]
+            )
         
-        # Redirect to original URL
-        return RedirectResponse(url=final_url, status_code=302)
+        return {
+            "success": True,
+            "message": f"Created {len(link_docs)} short links",
+            "data": {
+                "created": [
+                    {
+                        "_id": link_doc["_id"],
+                        "short_code": link_doc["short_code"],
+                        "short_url": f"https://{bulk_data.default_domain}/{link_doc['short_code']}",
+                        "original_url": link_doc["original_url"],
+                        "title": link_doc["title"]
+                    }
+                    for link_doc in link_docs
+                ],
+                "failed": failed
+            }
+        }
         
     except HTTPException:
         raise
     except Exception as e:
-        # Log error but still try to redirect if we have the URL
-        print(f"Error tracking click: {e}")
-        if 'link' in locals() and link:
-            return RedirectResponse(url=link["original_url"], status_code=302)
-        
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to create short links: {str(e)}"
+        )
+
+@router.get("/{short_code}")
+async def redirect_short_link(short_code: str, request: Request):
+    """Redirect short link and track analytics
+    
+    Resolved from the in-process code cache; the click is queued rather than
+    written inline, so a cache hit does no Mongo round trip.
+    """
+    try:
+        target = await link_redirects.resolve(short_code)
+    except Exception as e:
+        await professional_logger.log(
+            LogLevel.ERROR, LogCategory.DATABASE,
+            f"Short link lookup failed for {short_code}: {str(e)}",
+            error=e
+        )
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Internal server error"
         )
+    
+    if target is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Short link not found"
+        )
+    
+    # Check if link is active
+    if not target.is_active:
+        raise HTTPException(
+            status_code=status.HTTP_410_GONE,
+            detail="This link has been disabled"
+        )
+    
+    # Check if link is expired
+    if target.is_expired():
+        raise HTTPException(
+            status_code=status.HTTP_410_GONE,
+            detail="This link has expired"
+        )
+    
+    # Password protection would redirect to a password entry page here
+    
+    try:
+        await link_redirects.record_click(
+            target,
+            short_code,
+            user_agent=request.headers.get("user-agent", ""),
+            ip_address=request.client.host if request.client else None,
+            referer=request.headers.get("referer", "")
+        )
+    except Exception as e:
+        # Tracking must never block the redirect
+        await professional_logger.log(
+            LogLevel.WARNING, LogCategory.API,
+            f"Error tracking click for {short_code}: {str(e)}",
+            error=e
+        )
+    
+    return RedirectResponse(url=target.url, status_code=302)
 
 @router.get("/analytics/{link_id}")
 async def get_link_analytics(
@@ -563,17 +626,12 @@ async def get_link_analytics(
         end_date = datetime.utcnow()
         start_date = end_date - timedelta(days=days)
         
-        # Get click data for the period
-        clicks = await link_clicks_collection.find({
-            "link_id": link_id,
-            "clicked_at": {"$gte": start_date, "$lte": end_date}
-        }).sort("clicked_at", -1).to_list(length=None)
-        
-        # Analyze clicks by day
-        daily_clicks = {}
-        for click in clicks:
-            day = click["clicked_at"].strftime("%Y-%m-%d")
-            daily_clicks[day] = daily_clicks.get(day, 0) + 1
+        # Rollups answer the period in O(hours + days); raw clicks only feed the recent list
+        stats = await link_click_rollups.get_link_stats(link_id, start_date, end_date)
+        recent_clicks = await link_clicks_collection.find(
+            {"link_id": link_id},
+            {"clicked_at": 1, "device_type": 1, "referer": 1, "country": 1}
+        ).sort("clicked_at", -1).limit(20).to_list(length=20)
         
         # Fill missing days with 0
         current_date = start_date
@@ -582,34 +640,13 @@ async def get_link_analytics(
             day_str = current_date.strftime("%Y-%m-%d")
             complete_daily_data.append({
                 "date": day_str,
-                "clicks": daily_clicks.get(day_str, 0)
+                "clicks": stats["daily_clicks"].get(day_str, 0)
             })
             current_date += timedelta(days=1)
         
-        # Analyze by device type
-        device_breakdown = {}
-        for click in clicks:
-            device = click.get("device_type", "unknown")
-            device_breakdown[device] = device_breakdown.get(device, 0) + 1
-        
-        # Analyze by referer
-        referer_breakdown = {}
-        for click in clicks:
-            referer = click.get("referer", "direct")
-            if referer == "":
-                referer = "direct"
-            elif referer:
-                # Extract domain from referer
-                try:
-                    domain = urlparse(referer).netloc
-                    referer = domain if domain else "direct"
-                except:
-                    referer = "other"
-            
-            referer_breakdown[referer] = referer_breakdown.get(referer, 0) + 1
-        
         # Get top referers (limit to top 10)
-        top_referers = sorted(referer_breakdown.items(), key=lambda x: x[1], reverse=True)[:10]
+        top_referers = sorted(stats["referrers"].items(), key=lambda x: x[1], reverse=True)[:10]
+        period_clicks = stats["clicks"]
         
         analytics_data = {
             "link_info": {
@@ -622,19 +659,24 @@ async def get_link_analytics(
                 "total_clicks": link["total_clicks"]
             },
             "period_stats": {
-                "period_clicks": len(clicks),
+                "period_clicks": period_clicks,
+                "unique_visitors": stats["unique_visitors"],
                 "period_days": days,
-                "avg_daily_clicks": round(len(clicks) / days, 1)
+                "avg_daily_clicks": round(period_clicks / days, 1)
             },
             "daily_breakdown": complete_daily_data,
             "device_breakdown": [
                 {"device": device, "clicks": count}
-                for device, count in device_breakdown.items()
+                for device, count in stats["devices"].items()
             ],
             "referer_breakdown": [
                 {"referer": referer, "clicks": count}
                 for referer, count in top_referers
             ],
+            "country_breakdown": [
+                {"country": country, "clicks": count}
+                for country, count in stats["countries"].items()
+            ],
             "recent_clicks": [
                 {
                     "clicked_at": click["clicked_at"],
@@ -642,7 +684,7 @@ async def get_link_analytics(
                     "referer": click.get("referer", "direct"),
                     "country": click.get("country", "unknown")
                 }
-                for click in clicks[:20]  # Last 20 clicks
+                for click in recent_clicks
             ]
         }
         
@@ -700,6 +742,7 @@ async def update_short_link(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="No changes made"
             )
+        link_redirects.invalidate(link["short_code"])
         
         return {
             "success": True,
@@ -726,20 +769,22 @@ async def delete_short_link(
         link_analytics_collection = get_link_analytics_collection()
         
         # Find and delete link
-        result = await short_links_collection.delete_one({
-            "_id": link_id,
-            "user_id": current_user["_id"]
-        })
+        deleted_link = await short_links_collection.find_one_and_delete(
+            {"_id": link_id, "user_id": current_user["_id"]},
+            projection={"short_code": 1}
+        )
         
-        if result.deleted_count == 0:
+        if deleted_link is None:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Link not found"
             )
+        link_redirects.invalidate(deleted_link["short_code"])
         
         # Delete associated analytics data
         await link_clicks_collection.delete_many({"link_id": link_id})
         await link_analytics_collection.delete_many({"link_id": link_id})
+        await link_click_rollups.delete_link(link_id)
         
         return {
             "success": True,
@@ -799,4 +844,27 @@ async def create_link_analytics_record(link_id: str, user_id: str):
         
     except Exception as e:
         print(f"Failed to create analytics record: {e}")
-        # Don't fail link creation if analytics fails
\ No newline at end of file
+        # Don't fail link creation if analytics fails
+
+async def create_link_analytics_records(link_ids: List[str], user_id: str):
+    """Create initial analytics records for a batch of new links in one write"""
+    try:
+        link_analytics_collection = get_link_analytics_collection()
+        now = datetime.utcnow()
+        
+        await link_analytics_collection.insert_many([
+            {
+                "_id": str(uuid.uuid4()),
+                "link_id": link_id,
+                "user_id": user_id,
+                "total_clicks": 0,
+                "unique_clicks": 0,
+                "created_at": now,
+                "last_updated": now
+            }
+            for link_id in link_ids
+        ], ordered=False)
+        
+    except Exception as e:
+        print(f"Failed to create analytics records: {e}")
+        # Don't fail link creation if analytics fails
@@ -231,6 +231,7 @@ async def update_notification_preferences(
     categories: str = Form("[]"),  # JSON array
     quiet_hours_start: str = Form("22:00"),
     quiet_hours_end: str = Form("08:00"),
+    digest_window_seconds: Optional[int] = Form(None),
     current_user: dict = Depends(get_current_user)
 ):
     """Update user notification preferences"""
@@ -244,7 +245,8 @@ async def update_notification_preferences(
             push_enabled=push_enabled,
             categories=categories_list,
             quiet_hours_start=quiet_hours_start,
-            quiet_hours_end=quiet_hours_end
+            quiet_hours_end=quiet_hours_end,
+            digest_window_seconds=digest_window_seconds
         )
         
         return {"success": True, "data": preferences, "message": "Preferences updated successfully"}
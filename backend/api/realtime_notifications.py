@@ -21,7 +21,7 @@ router = APIRouter(
 )
 
 # Global instances
-connection_manager = WebSocketConnectionManager()
+connection_manager = WebSocketConnectionManager("realtime_notifications")
 notification_processor = NotificationProcessor(connection_manager)
 
 # Pydantic models
@@ -110,7 +110,7 @@ async def websocket_endpoint(websocket: WebSocket, user_id: str):
                 
                 # Handle ping messages
                 if data == "ping":
-                    await websocket.send_text("pong")
+                    connection_manager.send_frame("pong", websocket)
                 
                 # Update last ping time
                 if websocket in connection_manager.connection_metadata:
@@ -222,8 +222,12 @@ async def send_notification(
             action_text=notification_request.action_text
         )
         
-        # Send notification
-        result = await notification_processor.send_notification(notification)
+        # Send notification (scheduled ones are queued for delivery at scheduled_for)
+        if scheduled_for:
+            await notification_processor.queue_notification(notification)
+            result = {"success": True, "scheduled_for": scheduled_for.isoformat()}
+        else:
+            result = await notification_processor.send_notification(notification)
         
         await professional_logger.log(
             LogLevel.INFO, LogCategory.SYSTEM,
@@ -625,8 +629,8 @@ async def get_notification_stats(
         read_percentage = (total_notifications - unread_notifications) / total_notifications * 100 if total_notifications > 0 else 0
         click_percentage = clicked_notifications / total_notifications * 100 if total_notifications > 0 else 0
         
-        # Get active WebSocket connections count
-        active_connections = connection_manager.get_user_connection_count(user_id)
+        # Get active WebSocket connections count (all workers)
+        active_connections = await connection_manager.get_global_user_connection_count(user_id)
         
         return {
             "success": True,
@@ -673,8 +677,8 @@ async def get_connection_status(
             )
         
         # Get connection information
-        active_connections = connection_manager.get_user_connection_count(user_id)
-        total_connections = connection_manager.get_total_connections()
+        active_connections = await connection_manager.get_global_user_connection_count(user_id)
+        total_connections = await connection_manager.get_global_total_connections()
         
         # Get connection metadata if user has active connections
         connection_details = []
@@ -12,7 +12,9 @@ import stripe
 import os
 
 from core.auth import get_current_active_user
+from core.auth_cache import auth_cache
 from core.database import get_database
+from services.rate_limiting_service import RateLimitingService
 from services.user_service import get_user_service
 
 router = APIRouter()
@@ -292,6 +294,7 @@ async def create_subscription(
                 {"_id": current_user["_id"]},
                 {"$set": {"stripe_customer_id": stripe_customer_id}}
             )
+            auth_cache.invalidate_user(current_user["_id"])
         
         # Attach payment method to customer
         stripe.PaymentMethod.attach(
@@ -353,6 +356,8 @@ async def create_subscription(
                 }
             }
         )
+        auth_cache.invalidate_user(current_user["_id"])
+        RateLimitingService.invalidate_subscription_profile(current_user["_id"], current_user.get("email"))
         
         return {
             "success": True,
@@ -3,7 +3,6 @@ Advanced AI-Powered Analytics Engine
 Predictive insights, trend analysis, and intelligent recommendations
 """
 import asyncio
-import numpy as np
 from datetime import datetime, timedelta
 from typing import Dict, Any, List, Optional, Tuple
 import json
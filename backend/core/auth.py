@@ -10,8 +10,8 @@ from datetime import datetime, timedelta
 from typing import Optional
 import uuid
 
+from .auth_cache import auth_cache
 from .config import settings
-from .database import get_users_collection
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 security = HTTPBearer()
@@ -37,23 +37,33 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     return encoded_jwt
 
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    """Get current authenticated user"""
+    """Get current authenticated user
+    
+    Verified tokens, user documents and the revocation set are cached per
+    process (core/auth_cache.py), so a warm request does no Mongo round trip.
+    """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
     
-    try:
-        payload = jwt.decode(credentials.credentials, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
+    token = credentials.credentials
+    email = auth_cache.get_token_subject(token)
+    if email is None:
+        try:
+            payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+            email = payload.get("sub")
+            if email is None:
+                raise credentials_exception
+        except JWTError:
             raise credentials_exception
-    except JWTError:
+        auth_cache.set_token_subject(token, email, payload.get("exp"))
+    
+    if await auth_cache.is_revoked(token):
         raise credentials_exception
     
-    users_collection = get_users_collection()
-    user = await users_collection.find_one({"email": email})
+    user = await auth_cache.get_user(email)
     if user is None:
         raise credentials_exception
     
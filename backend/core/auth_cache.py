@@ -0,0 +1,241 @@
+"""
+Authentication Caches
+Per-process caches that keep Mongo off the authenticated request path:
+verified token -> principal, user documents, and a revoked-token Bloom filter
+"""
+
+import asyncio
+import copy
+import hashlib
+import math
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+from pymongo.errors import OperationFailure, PyMongoError
+
+from core.cache import CacheTags, LocalLRUCache
+from core.config import settings
+from core.database import get_database
+from core.indexes import index, index_registry
+from core.logging import admin_logger
+from core.mongo_pool import create_background_task
+
+index_registry.register(
+    __name__,
+    index("revoked_tokens", "revoked_at")
+)
+
+# Polls re-read this far behind the last seen revocation, covering clock skew between workers
+REVOCATION_POLL_OVERLAP = timedelta(seconds=5)
+REVOCATION_REBUILD_INTERVAL = timedelta(hours=1)
+
+def token_hash(token: str) -> str:
+    """Hash stored in revoked_tokens for a token"""
+    return hashlib.sha256(token.encode()).hexdigest()
+
+class BloomFilter:
+    """Fixed-size Bloom filter over hex digests (no false negatives)"""
+
+    def __init__(self, capacity: int, error_rate: float = 0.001):
+        self.capacity = capacity
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, digest: str):
+        # Double hashing from two independent halves of an already uniform digest
+        first, second = int(digest[:16], 16), int(digest[16:32], 16) | 1
+        for i in range(self.hash_count):
+            yield (first + i * second) % self.size
+
+    def add(self, digest: str):
+        for position in self._positions(digest):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, digest: str) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(digest))
+
+class AuthCache:
+    """Token, user and revocation caches used by core.auth.get_current_user
+
+    Staleness bounds across workers:
+    - user documents: dropped on change-stream events where available (replica
+      sets), otherwise after AUTH_USER_CACHE_TTL_SECONDS; the worker making an
+      update drops its copy immediately through invalidate_user
+    - revocations: picked up within AUTH_REVOCATION_POLL_SECONDS; the revoking
+      worker sees them at once. Bloom hits are confirmed against Mongo.
+    Until the revocation set is first loaded, revocation checks go to Mongo.
+    """
+
+    def __init__(self):
+        self.tokens = LocalLRUCache(max_entries=settings.AUTH_TOKEN_CACHE_SIZE, max_bytes=16 * 1024 * 1024)
+        self.users = LocalLRUCache(max_entries=settings.AUTH_USER_CACHE_SIZE, max_bytes=64 * 1024 * 1024)
+        self.revoked: Optional[BloomFilter] = None
+        self.revoked_capacity = settings.AUTH_REVOCATION_BLOOM_CAPACITY
+        self._revoked_watermark: Optional[datetime] = None
+        self._revoked_built_at: Optional[datetime] = None
+        self._tasks = []
+        self.stats = {
+            "token_hits": 0,
+            "token_misses": 0,
+            "user_hits": 0,
+            "user_misses": 0,
+            "revocation_lookups": 0,
+            "user_invalidations": 0
+        }
+
+    # Verified tokens
+
+    def get_token_subject(self, token: str) -> Optional[str]:
+        subject = self.tokens.get(token)
+        self.stats["token_hits" if subject is not None else "token_misses"] += 1
+        return subject
+
+    def set_token_subject(self, token: str, subject: str, expires_at: Optional[float]):
+        """Remember a verified token until its own exp at the latest"""
+        ttl = settings.AUTH_TOKEN_CACHE_TTL_SECONDS
+        if expires_at is not None:
+            ttl = min(ttl, expires_at - datetime.utcnow().timestamp())
+        if ttl > 0:
+            self.tokens.set(token, subject, ttl)
+
+    # Users
+
+    async def get_user(self, email: str) -> Optional[Dict[str, Any]]:
+        """User document by email, from cache or Mongo; a deep copy per caller
+
+        Handlers may change nested fields (usage_stats, subscription) without
+        touching what other requests read from the cache.
+        """
+        user = self.users.get(email)
+        if user is None:
+            self.stats["user_misses"] += 1
+            user = await get_database().users.find_one({"email": email})
+            if user is None:
+                return None
+            self.users.set(email, user, settings.AUTH_USER_CACHE_TTL_SECONDS,
+                           tags=[CacheTags.user(str(user["_id"]))])
+        else:
+            self.stats["user_hits"] += 1
+        return copy.deepcopy(user)
+
+    def invalidate_user(self, user_id: Any = None, email: Optional[str] = None):
+        """Drop a cached user after it is updated or deleted in this worker"""
+        if user_id is not None:
+            self.users.invalidate_tag(CacheTags.user(str(user_id)))
+        if email is not None:
+            self.users.delete(email)
+        self.stats["user_invalidations"] += 1
+
+    # Revocations
+
+    async def is_revoked(self, token: str) -> bool:
+        digest = token_hash(token)
+        if self.revoked is not None and digest not in self.revoked:
+            return False
+        # Bloom hit (possibly false positive) or filter not loaded yet
+        self.stats["revocation_lookups"] += 1
+        revoked = await get_database().revoked_tokens.find_one(
+            {"token_hash": digest, "expires_at": {"$gt": datetime.utcnow()}}, {"_id": 1}
+        )
+        return revoked is not None
+
+    def mark_revoked(self, token: str):
+        if self.revoked is not None:
+            self.revoked.add(token_hash(token))
+        self.tokens.delete(token)
+
+    async def revoke(self, token: str, user_id: Any, expires_at: datetime):
+        """Record a revocation until the token would have expired anyway"""
+        now = datetime.utcnow()
+        await get_database().revoked_tokens.insert_one({
+            "token_hash": token_hash(token),
+            "user_id": user_id,
+            "revoked_at": now,
+            "expires_at": expires_at
+        })
+        self.mark_revoked(token)
+
+    async def refresh_revocations(self):
+        """Rebuild the filter hourly (dropping expired entries); otherwise add new revocations"""
+        now = datetime.utcnow()
+        collection = get_database().revoked_tokens
+        if self.revoked is None or now - self._revoked_built_at > REVOCATION_REBUILD_INTERVAL:
+            revoked = BloomFilter(self.revoked_capacity)
+            query = {"expires_at": {"$gt": now}}
+            built_at = watermark = now
+        else:
+            revoked = self.revoked
+            query = {"revoked_at": {"$gt": self._revoked_watermark - REVOCATION_POLL_OVERLAP}}
+            built_at, watermark = self._revoked_built_at, self._revoked_watermark
+
+        async for entry in collection.find(query, {"token_hash": 1, "revoked_at": 1}):
+            revoked.add(entry["token_hash"])
+            if entry.get("revoked_at") and entry["revoked_at"] > watermark:
+                watermark = entry["revoked_at"]
+
+        if revoked.count > revoked.capacity:
+            # Over capacity the false positive rate climbs; rebuild larger on the next poll
+            self.revoked_capacity = revoked.count * 2
+            built_at = now - REVOCATION_REBUILD_INTERVAL
+        self.revoked, self._revoked_built_at, self._revoked_watermark = revoked, built_at, watermark
+
+    async def _poll_revocations(self):
+        while True:
+            try:
+                await self.refresh_revocations()
+            except Exception as e:
+                admin_logger.log_system_event("AUTH_REVOCATION_REFRESH_ERROR", {"error": str(e)}, "WARNING")
+            await asyncio.sleep(settings.AUTH_REVOCATION_POLL_SECONDS)
+
+    async def _watch_users(self):
+        """Drop cached users changed by any worker; needs a replica set"""
+        pipeline = [{"$match": {"operationType": {"$in": ["update", "replace", "delete"]}}}]
+        while True:
+            try:
+                async with get_database().users.watch(pipeline) as stream:
+                    # Anything changed while not watching may be cached
+                    self.users.clear()
+                    async for change in stream:
+                        self.invalidate_user(change["documentKey"]["_id"])
+            except OperationFailure as e:
+                if e.code in (40573, 40324):
+                    admin_logger.log_system_event("AUTH_USER_WATCH_UNAVAILABLE", {
+                        "error": str(e),
+                        "ttl_seconds": settings.AUTH_USER_CACHE_TTL_SECONDS
+                    }, "INFO")
+                    return
+                admin_logger.log_system_event("AUTH_USER_WATCH_ERROR", {"error": str(e)}, "WARNING")
+            except PyMongoError as e:
+                admin_logger.log_system_event("AUTH_USER_WATCH_ERROR", {"error": str(e)}, "WARNING")
+            await asyncio.sleep(5)
+
+    async def start(self):
+        """Load revocations, then keep them and the user cache current in the background"""
+        try:
+            await self.refresh_revocations()
+        except Exception as e:
+            admin_logger.log_system_event("AUTH_REVOCATION_REFRESH_ERROR", {"error": str(e)}, "WARNING")
+        self._tasks = [
+            create_background_task(self._poll_revocations()),
+            create_background_task(self._watch_users())
+        ]
+
+    def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "tokens": self.tokens.get_stats(),
+            "users": self.users.get_stats(),
+            "revoked_loaded": self.revoked is not None,
+            "revoked_entries": self.revoked.count if self.revoked is not None else 0
+        }
+
+# Global auth cache instance
+auth_cache = AuthCache()
@@ -3,11 +3,16 @@ Cache Manager with Redis
 High-performance caching for external API responses and database queries
 """
 
-import json
-import pickle
-from typing import Any, Dict, Optional, List
-from datetime import datetime, timedelta
+import sys
+import time
+import fnmatch
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, List, Set, Tuple
+from datetime import datetime
 import asyncio
+from core.cache_codec import CacheSerializer, JSONCodec, MsgPackCodec, MSGPACK_AVAILABLE
+from core.config import settings
 from core.logging import admin_logger
 
 try:
@@ -17,28 +22,228 @@ except ImportError:
     REDIS_AVAILABLE = False
     redis = None
 
+def _estimate_size(value: Any, depth: int = 0) -> int:
+    """Approximate the in-memory footprint of a cached value in bytes"""
+    size = sys.getsizeof(value)
+    if depth >= 4:
+        return size
+    if isinstance(value, dict):
+        for item_key, item_value in value.items():
+            size += _estimate_size(item_key, depth + 1) + _estimate_size(item_value, depth + 1)
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        for item in value:
+            size += _estimate_size(item, depth + 1)
+    return size
+
+class CacheTags:
+    """Canonical tag names used to group cache entries for invalidation"""
+    
+    @staticmethod
+    def user(user_id: str) -> str:
+        return f"user:{user_id}"
+    
+    @staticmethod
+    def workspace(workspace_id: str) -> str:
+        return f"workspace:{workspace_id}"
+    
+    @staticmethod
+    def collection(name: str, owner_id: Optional[str] = None) -> str:
+        """Tag for entries derived from a collection, optionally scoped to one owner"""
+        if owner_id:
+            return f"collection:{name}:user:{owner_id}"
+        return f"collection:{name}"
+    
+    @staticmethod
+    def workspace_collection(name: str, workspace_id: str) -> str:
+        """Tag for entries derived from one workspace's documents in a collection"""
+        return f"collection:{name}:workspace:{workspace_id}"
+
+@dataclass
+class CacheEntry:
+    value: Any
+    expires_at: float  # monotonic deadline for fresh reads
+    stale_until: float  # monotonic deadline for stale-while-revalidate reads
+    size: int
+    tags: tuple = ()
+
+    def is_fresh(self, now: Optional[float] = None) -> bool:
+        return (now or time.monotonic()) < self.expires_at
+
+class LocalLRUCache:
+    """Bounded per-process LRU cache with TTL, stale window and size accounting
+    
+    Values are stored and returned by reference; CacheManager keeps encoded
+    bytes here so hits cannot share mutable objects.
+    """
+    
+    def __init__(self, max_entries: int = 10000, max_bytes: int = 64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._tag_index: Dict[str, Set[str]] = {}
+        self.stats = {
+            "evictions": 0,
+            "expirations": 0
+        }
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def __contains__(self, key: str) -> bool:
+        return self.get_entry(key) is not None
+    
+    def keys(self) -> List[str]:
+        return list(self._entries.keys())
+    
+    def get_entry(self, key: str) -> Optional[CacheEntry]:
+        """Get entry (fresh or stale) and mark it as recently used"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        
+        if entry.stale_until <= time.monotonic():
+            self._remove(key)
+            self.stats["expirations"] += 1
+            return None
+        
+        self._entries.move_to_end(key)
+        return entry
+    
+    def get(self, key: str) -> Optional[Any]:
+        """Get a fresh value, ignoring entries that are only servable as stale"""
+        entry = self.get_entry(key)
+        if entry is not None and entry.is_fresh():
+            return entry.value
+        return None
+    
+    def set(self, key: str, value: Any, ttl_seconds: float, stale_seconds: float = 0,
+            tags: Iterable[str] = ()) -> bool:
+        """Store value, evicting least recently used entries to stay within bounds"""
+        size = _estimate_size(value)
+        if size > self.max_bytes:
+            self.delete(key)
+            return False
+        
+        if key in self._entries:
+            self._remove(key)
+        
+        now = time.monotonic()
+        entry = CacheEntry(
+            value=value,
+            expires_at=now + ttl_seconds,
+            stale_until=now + ttl_seconds + stale_seconds,
+            size=size,
+            tags=tuple(tags)
+        )
+        self._entries[key] = entry
+        self.current_bytes += size
+        for tag in entry.tags:
+            self._tag_index.setdefault(tag, set()).add(key)
+        
+        while len(self._entries) > self.max_entries or self.current_bytes > self.max_bytes:
+            oldest_key = next(iter(self._entries))
+            self._remove(oldest_key)
+            self.stats["evictions"] += 1
+        
+        return True
+    
+    def delete(self, key: str) -> bool:
+        if key in self._entries:
+            self._remove(key)
+            return True
+        return False
+    
+    def invalidate_tag(self, tag: str) -> int:
+        """Drop every entry registered under tag"""
+        keys = self._tag_index.pop(tag, set())
+        for key in keys:
+            if key in self._entries:
+                self._remove(key)
+        return len(keys)
+    
+    def clear_pattern(self, pattern: str) -> int:
+        matching_keys = [key for key in self._entries if fnmatch.fnmatch(key, pattern)]
+        for key in matching_keys:
+            self._remove(key)
+        return len(matching_keys)
+    
+    def clear(self):
+        self._entries.clear()
+        self._tag_index.clear()
+        self.current_bytes = 0
+    
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "bytes": self.current_bytes,
+            "max_bytes": self.max_bytes,
+            "tags": len(self._tag_index),
+            **self.stats
+        }
+    
+    def _remove(self, key: str):
+        entry = self._entries.pop(key)
+        self.current_bytes -= entry.size
+        for tag in entry.tags:
+            tagged_keys = self._tag_index.get(tag)
+            if tagged_keys is not None:
+                tagged_keys.discard(key)
+                if not tagged_keys:
+                    del self._tag_index[tag]
+
+# Redis tag index: one sorted set per tag, members scored by their entry's
+# expiry. Every write to a tag trims its expired members, so an index holds at
+# most the live entries under it; it lives at least as long as its newest
+# member and is dropped on invalidation.
+TAG_INDEX_TTL_SECONDS = 86400
+
+def _tag_index_key(tag: str) -> str:
+    return f"mewayz:tagidx:{tag}"
+
 class CacheManager:
-    """High-performance cache manager using Redis"""
+    """High-performance two-tier cache: bounded in-process LRU in front of Redis"""
     
     def __init__(self):
         self.redis_client = None
-        self.fallback_cache = {}  # In-memory fallback
+        self.local_cache = LocalLRUCache(
+            max_entries=settings.CACHE_LOCAL_MAX_ENTRIES,
+            max_bytes=settings.CACHE_LOCAL_MAX_BYTES
+        )
+        # Upper bound on how long a process may serve a value without
+        # going back to Redis, so other workers' writes become visible
+        self.local_ttl_seconds = settings.CACHE_LOCAL_TTL_SECONDS
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.serializer = CacheSerializer(
+            codec=self._configured_codec(),
+            compress_threshold=settings.CACHE_COMPRESS_THRESHOLD_BYTES
+        )
         self.cache_stats = {
             "hits": 0,
             "misses": 0,
-            "errors": 0
+            "errors": 0,
+            "local_hits": 0,
+            "redis_hits": 0,
+            "loads": 0,
+            "coalesced_loads": 0,
+            "stale_served": 0
         }
         
+    @staticmethod
+    def _configured_codec():
+        if settings.CACHE_CODEC == "msgpack" and MSGPACK_AVAILABLE:
+            return MsgPackCodec()
+        return JSONCodec()
+    
     async def initialize(self):
         """Initialize Redis connection"""
         if REDIS_AVAILABLE:
             try:
                 # Connect to Redis
-                self.redis_client = redis.Redis(
-                    host='localhost',
-                    port=6379,
-                    db=0,
-                    decode_responses=True,
+                self.redis_client = redis.Redis.from_url(
+                    settings.REDIS_URL,
+                    decode_responses=False,
                     socket_timeout=5.0,
                     socket_connect_timeout=5.0,
                     retry_on_timeout=True,
@@ -48,8 +253,7 @@ class CacheManager:
                 # Test connection
                 await self.redis_client.ping()
                 admin_logger.log_system_event("REDIS_CONNECTED", {
-                    "host": "localhost",
-                    "port": 6379
+                    "url": settings.REDIS_URL
                 })
                 
             except Exception as e:
@@ -71,30 +275,23 @@ class CacheManager:
     async def get(self, key: str) -> Optional[Any]:
         """Get value from cache"""
         try:
+            encoded = self.local_cache.get(key)
+            if encoded is not None:
+                self.cache_stats["hits"] += 1
+                self.cache_stats["local_hits"] += 1
+                return self.serializer.loads(encoded)
+            
             if self.redis_client:
-                value = await self.redis_client.get(f"mewayz:{key}")
-                if value is not None:
+                encoded = await self.redis_client.get(f"mewayz:{key}")
+                if encoded is not None:
                     self.cache_stats["hits"] += 1
-                    try:
-                        return json.loads(value)
-                    except json.JSONDecodeError:
-                        # Try pickle for complex objects
-                        return pickle.loads(value.encode('latin-1'))
-                else:
-                    self.cache_stats["misses"] += 1
-                    return None
-            else:
-                # Fallback to memory cache
-                if key in self.fallback_cache:
-                    entry = self.fallback_cache[key]
-                    if entry["expires_at"] > datetime.utcnow():
-                        self.cache_stats["hits"] += 1
-                        return entry["data"]
-                    else:
-                        del self.fallback_cache[key]
-                
-                self.cache_stats["misses"] += 1
-                return None
+                    self.cache_stats["redis_hits"] += 1
+                    value = self.serializer.loads(encoded)
+                    self.local_cache.set(key, encoded, self.local_ttl_seconds)
+                    return value
+            
+            self.cache_stats["misses"] += 1
+            return None
                 
         except Exception as e:
             self.cache_stats["errors"] += 1
@@ -104,32 +301,56 @@ class CacheManager:
             }, "WARNING")
             return None
     
-    async def set(self, key: str, value: Any, expire_seconds: int = 3600) -> bool:
-        """Set value in cache with expiration"""
+    async def set(self, key: str, value: Any, expire_seconds: int = 3600, stale_seconds: int = 0,
+                  tags: Optional[List[str]] = None) -> bool:
+        """Set value in cache with expiration
+        
+        stale_seconds keeps the local entry servable by get_or_load for that
+        long after expiry while a single background refresh runs. tags register
+        the key in the tag index so invalidate_tags can drop it without a scan.
+        """
+        try:
+            return await self._store(key, self.serializer.dumps(value), expire_seconds, stale_seconds, tags)
+        except Exception as e:
+            self.cache_stats["errors"] += 1
+            admin_logger.log_system_event("CACHE_SET_ERROR", {
+                "key": key,
+                "error": str(e)
+            }, "WARNING")
+            return False
+    
+    async def _store(self, key: str, serialized_value: bytes, expire_seconds: int, stale_seconds: int,
+                     tags: Optional[List[str]]) -> bool:
+        """Write an encoded value to both tiers
+        
+        The local tier keeps the encoded bytes too and every hit decodes its
+        own copy, so callers may mutate what they get back.
+        """
         try:
             if self.redis_client:
-                try:
-                    serialized_value = json.dumps(value)
-                except (TypeError, ValueError):
-                    # Use pickle for complex objects
-                    serialized_value = pickle.dumps(value).decode('latin-1')
-                
-                await self.redis_client.setex(
-                    f"mewayz:{key}",
-                    expire_seconds,
-                    serialized_value
-                )
-                return True
+                if tags:
+                    now = time.time()
+                    pipe = self.redis_client.pipeline()
+                    pipe.setex(f"mewayz:{key}", expire_seconds, serialized_value)
+                    for tag in tags:
+                        index_key = _tag_index_key(tag)
+                        pipe.zremrangebyscore(index_key, "-inf", now)
+                        pipe.zadd(index_key, {key: now + expire_seconds})
+                        pipe.expire(index_key, max(expire_seconds, TAG_INDEX_TTL_SECONDS))
+                    await pipe.execute()
+                else:
+                    await self.redis_client.setex(
+                        f"mewayz:{key}",
+                        expire_seconds,
+                        serialized_value
+                    )
+                local_ttl = min(expire_seconds, self.local_ttl_seconds)
             else:
-                # Fallback to memory cache
-                self.fallback_cache[key] = {
-                    "data": value,
-                    "expires_at": datetime.utcnow() + timedelta(seconds=expire_seconds)
-                }
-                
-                # Clean expired entries periodically
-                await self._cleanup_memory_cache()
-                return True
+                # Local tier is the only tier
+                local_ttl = expire_seconds
+            
+            self.local_cache.set(key, serialized_value, local_ttl, stale_seconds, tags or ())
+            return True
                 
         except Exception as e:
             self.cache_stats["errors"] += 1
@@ -139,17 +360,103 @@ class CacheManager:
             }, "WARNING")
             return False
     
+    async def get_or_load(self, key: str, loader: Callable[[], Awaitable[Any]],
+                          expire_seconds: int = 3600, stale_seconds: int = 0,
+                          tags: Optional[List[str]] = None) -> Any:
+        """Get value from cache, calling loader once for all concurrent misses
+        
+        Entries inside their stale window are returned immediately while a
+        single background refresh repopulates them.
+        """
+        value, _ = await self.get_or_load_outcome(key, loader, expire_seconds, stale_seconds, tags)
+        return value
+    
+    async def get_or_load_outcome(self, key: str, loader: Callable[[], Awaitable[Any]],
+                                  expire_seconds: int = 3600, stale_seconds: int = 0,
+                                  tags: Optional[List[str]] = None) -> Tuple[Any, str]:
+        """get_or_load, also returning how the value was obtained
+        
+        hit (fresh or stale cache entry), miss (this call ran the loader) or
+        coalesced (waited on a load another caller started).
+        """
+        entry = self.local_cache.get_entry(key)
+        if entry is not None:
+            if entry.is_fresh():
+                self.cache_stats["hits"] += 1
+                self.cache_stats["local_hits"] += 1
+                return self.serializer.loads(entry.value), "hit"
+            
+            self.cache_stats["stale_served"] += 1
+            if key not in self._inflight:
+                refresh = self._start_load(key, loader, expire_seconds, stale_seconds, tags)
+                refresh.add_done_callback(self._log_refresh_failure)
+            return self.serializer.loads(entry.value), "hit"
+        
+        value = await self.get(key)
+        if value is not None:
+            return value, "hit"
+        
+        future = self._inflight.get(key)
+        if future is not None:
+            self.cache_stats["coalesced_loads"] += 1
+            outcome = "coalesced"
+        else:
+            future = self._start_load(key, loader, expire_seconds, stale_seconds, tags)
+            outcome = "miss"
+        # Concurrent callers share the load; each decodes its own copy of the result
+        encoded, value = await asyncio.shield(future)
+        return (self.serializer.loads(encoded) if encoded is not None else value), outcome
+    
+    def _start_load(self, key: str, loader: Callable[[], Awaitable[Any]],
+                    expire_seconds: int, stale_seconds: int,
+                    tags: Optional[List[str]]) -> asyncio.Future:
+        """Register a single in-flight load for key"""
+        future = asyncio.ensure_future(
+            self._run_loader(key, loader, expire_seconds, stale_seconds, tags)
+        )
+        self._inflight[key] = future
+        return future
+    
+    async def _run_loader(self, key: str, loader: Callable[[], Awaitable[Any]],
+                          expire_seconds: int, stale_seconds: int,
+                          tags: Optional[List[str]]) -> Tuple[Optional[bytes], Any]:
+        """Load and cache a value; returns (encoded, value), encoded None if not cacheable"""
+        try:
+            self.cache_stats["loads"] += 1
+            value = await loader()
+            if value is None:
+                return None, None
+            try:
+                encoded = self.serializer.dumps(value)
+            except Exception as e:
+                # Serve the caller anyway; the value just is not cached
+                self.cache_stats["errors"] += 1
+                admin_logger.log_system_event("CACHE_SET_ERROR", {
+                    "key": key,
+                    "error": str(e)
+                }, "WARNING")
+                return None, value
+            await self._store(key, encoded, expire_seconds, stale_seconds, tags)
+            return encoded, value
+        finally:
+            self._inflight.pop(key, None)
+    
+    def _log_refresh_failure(self, future: asyncio.Future):
+        if future.cancelled() or future.exception() is None:
+            return
+        self.cache_stats["errors"] += 1
+        admin_logger.log_system_event("CACHE_REFRESH_ERROR", {
+            "error": str(future.exception())
+        }, "WARNING")
+    
     async def delete(self, key: str) -> bool:
         """Delete key from cache"""
         try:
+            deleted_locally = self.local_cache.delete(key)
             if self.redis_client:
                 result = await self.redis_client.delete(f"mewayz:{key}")
-                return result > 0
-            else:
-                if key in self.fallback_cache:
-                    del self.fallback_cache[key]
-                    return True
-                return False
+                return result > 0 or deleted_locally
+            return deleted_locally
                 
         except Exception as e:
             self.cache_stats["errors"] += 1
@@ -162,17 +469,12 @@ class CacheManager:
     async def exists(self, key: str) -> bool:
         """Check if key exists in cache"""
         try:
+            if self.local_cache.get(key) is not None:
+                return True
             if self.redis_client:
                 result = await self.redis_client.exists(f"mewayz:{key}")
                 return result > 0
-            else:
-                if key in self.fallback_cache:
-                    entry = self.fallback_cache[key]
-                    if entry["expires_at"] > datetime.utcnow():
-                        return True
-                    else:
-                        del self.fallback_cache[key]
-                return False
+            return False
                 
         except Exception as e:
             admin_logger.log_system_event("CACHE_EXISTS_ERROR", {
@@ -184,34 +486,42 @@ class CacheManager:
     async def get_many(self, keys: List[str]) -> Dict[str, Any]:
         """Get multiple values from cache"""
         results = {}
+        missing_keys = []
+        
+        for key in keys:
+            encoded = self.local_cache.get(key)
+            if encoded is not None:
+                results[key] = self.serializer.loads(encoded)
+                self.cache_stats["hits"] += 1
+                self.cache_stats["local_hits"] += 1
+            else:
+                missing_keys.append(key)
+        
+        if not missing_keys:
+            return results
         
         if self.redis_client:
             try:
-                redis_keys = [f"mewayz:{key}" for key in keys]
+                redis_keys = [f"mewayz:{key}" for key in missing_keys]
                 values = await self.redis_client.mget(redis_keys)
                 
-                for i, value in enumerate(values):
-                    if value is not None:
-                        try:
-                            results[keys[i]] = json.loads(value)
-                        except json.JSONDecodeError:
-                            results[keys[i]] = pickle.loads(value.encode('latin-1'))
+                for i, encoded in enumerate(values):
+                    if encoded is not None:
+                        results[missing_keys[i]] = self.serializer.loads(encoded)
+                        self.local_cache.set(missing_keys[i], encoded, self.local_ttl_seconds)
                         self.cache_stats["hits"] += 1
+                        self.cache_stats["redis_hits"] += 1
                     else:
                         self.cache_stats["misses"] += 1
                         
             except Exception as e:
                 self.cache_stats["errors"] += 1
                 admin_logger.log_system_event("CACHE_MGET_ERROR", {
-                    "keys": keys,
+                    "keys": missing_keys,
                     "error": str(e)
                 }, "WARNING")
         else:
-            # Fallback to individual gets
-            for key in keys:
-                value = await self.get(key)
-                if value is not None:
-                    results[key] = value
+            self.cache_stats["misses"] += len(missing_keys)
         
         return results
     
@@ -219,16 +529,15 @@ class CacheManager:
         """Set multiple values in cache"""
         if self.redis_client:
             try:
+                encoded = {key: self.serializer.dumps(value) for key, value in data.items()}
                 pipe = self.redis_client.pipeline()
-                for key, value in data.items():
-                    try:
-                        serialized_value = json.dumps(value)
-                    except (TypeError, ValueError):
-                        serialized_value = pickle.dumps(value).decode('latin-1')
-                    
+                for key, serialized_value in encoded.items():
                     pipe.setex(f"mewayz:{key}", expire_seconds, serialized_value)
                 
                 await pipe.execute()
+                local_ttl = min(expire_seconds, self.local_ttl_seconds)
+                for key, serialized_value in encoded.items():
+                    self.local_cache.set(key, serialized_value, local_ttl)
                 return True
                 
             except Exception as e:
@@ -247,23 +556,25 @@ class CacheManager:
             return success
     
     async def clear_pattern(self, pattern: str) -> int:
-        """Clear keys matching pattern"""
+        """Clear keys matching pattern
+        
+        Walks the keyspace, so cost grows with cache size. Prefer tagging
+        entries on set and calling invalidate_tags from write paths.
+        """
         try:
+            cleared_locally = self.local_cache.clear_pattern(pattern)
             if self.redis_client:
-                keys = await self.redis_client.keys(f"mewayz:{pattern}")
-                if keys:
-                    return await self.redis_client.delete(*keys)
-                return 0
-            else:
-                # Pattern matching for memory cache
-                import fnmatch
-                matching_keys = [
-                    key for key in self.fallback_cache.keys()
-                    if fnmatch.fnmatch(key, pattern)
-                ]
-                for key in matching_keys:
-                    del self.fallback_cache[key]
-                return len(matching_keys)
+                deleted = 0
+                batch = []
+                async for redis_key in self.redis_client.scan_iter(match=f"mewayz:{pattern}", count=500):
+                    batch.append(redis_key)
+                    if len(batch) >= 500:
+                        deleted += await self.redis_client.delete(*batch)
+                        batch = []
+                if batch:
+                    deleted += await self.redis_client.delete(*batch)
+                return deleted
+            return cleared_locally
                 
         except Exception as e:
             self.cache_stats["errors"] += 1
@@ -273,12 +584,52 @@ class CacheManager:
             }, "WARNING")
             return 0
     
+    async def invalidate_tags(self, tags: List[str]) -> int:
+        """Drop every entry registered under any of the given tags
+        
+        Costs O(entries under the tags). Other workers' local tiers age out
+        within local_ttl_seconds.
+        """
+        try:
+            invalidated = 0
+            for tag in tags:
+                invalidated += self.local_cache.invalidate_tag(tag)
+            
+            if self.redis_client:
+                pipe = self.redis_client.pipeline()
+                for tag in tags:
+                    pipe.zrange(_tag_index_key(tag), 0, -1)
+                members = await pipe.execute()
+                
+                member_keys = {
+                    key.decode('utf-8') if isinstance(key, bytes) else key
+                    for tag_members in members for key in tag_members
+                }
+                # Entries read back from Redis sit in the local tier untagged
+                for key in member_keys:
+                    self.local_cache.delete(key)
+                redis_keys = {f"mewayz:{key}" for key in member_keys}
+                redis_keys.update(_tag_index_key(tag) for tag in tags)
+                await self.redis_client.delete(*redis_keys)
+                invalidated = sum(len(tag_members) for tag_members in members)
+            
+            return invalidated
+                
+        except Exception as e:
+            self.cache_stats["errors"] += 1
+            admin_logger.log_system_event("CACHE_INVALIDATE_TAGS_ERROR", {
+                "tags": tags,
+                "error": str(e)
+            }, "WARNING")
+            return 0
+    
     async def increment(self, key: str, amount: int = 1, expire_seconds: int = 3600) -> int:
         """Increment counter in cache"""
         try:
             if self.redis_client:
                 result = await self.redis_client.incr(f"mewayz:{key}", amount)
                 await self.redis_client.expire(f"mewayz:{key}", expire_seconds)
+                self.local_cache.delete(key)
                 return result
             else:
                 # Memory cache increment
@@ -301,12 +652,12 @@ class CacheManager:
         hit_rate = (self.cache_stats["hits"] / total_requests * 100) if total_requests > 0 else 0
         
         stats = {
-            "hits": self.cache_stats["hits"],
-            "misses": self.cache_stats["misses"],
-            "errors": self.cache_stats["errors"],
+            **self.cache_stats,
             "hit_rate": round(hit_rate, 2),
             "total_requests": total_requests,
-            "backend": "redis" if self.redis_client else "memory"
+            "backend": "redis" if self.redis_client else "memory",
+            "local_cache": self.local_cache.get_stats(),
+            "inflight_loads": len(self._inflight)
         }
         
         if self.redis_client:
@@ -321,7 +672,7 @@ class CacheManager:
             except Exception as e:
                 stats["redis_error"] = str(e)
         else:
-            stats["memory_cache_size"] = len(self.fallback_cache)
+            stats["memory_cache_size"] = len(self.local_cache)
         
         return stats
     
@@ -337,17 +688,6 @@ class CacheManager:
         except Exception:
             return False
     
-    async def _cleanup_memory_cache(self):
-        """Clean up expired entries from memory cache"""
-        if len(self.fallback_cache) > 1000:  # Only cleanup when cache gets large
-            now = datetime.utcnow()
-            expired_keys = [
-                key for key, entry in self.fallback_cache.items()
-                if entry["expires_at"] <= now
-            ]
-            for key in expired_keys:
-                del self.fallback_cache[key]
-    
     # Specialized caching methods for common use cases
     
     async def cache_external_api_response(self, api_name: str, endpoint: str, 
@@ -367,7 +707,27 @@ class CacheManager:
         cache_key = f"api:{api_name}:{endpoint}"
         return await self.get(cache_key)
     
-    async def cache_database_query(self, query_hash: str, result: Any, expire_minutes: int = 30) -> bool:
+    async def get_or_fetch_api_response(self, api_name: str, endpoint: str,
+                                        fetcher: Callable[[], Awaitable[Any]],
+                                        expire_minutes: int = 15,
+                                        stale_minutes: int = 5) -> Optional[Dict[str, Any]]:
+        """Get cached external API response, fetching it once on a miss"""
+        async def load():
+            response_data = await fetcher()
+            if response_data is None:
+                return None
+            return {
+                "data": response_data,
+                "cached_at": datetime.utcnow().isoformat(),
+                "api": api_name,
+                "endpoint": endpoint
+            }
+        
+        cache_key = f"api:{api_name}:{endpoint}"
+        return await self.get_or_load(cache_key, load, expire_minutes * 60, stale_minutes * 60)
+    
+    async def cache_database_query(self, query_hash: str, result: Any, expire_minutes: int = 30,
+                                   tags: Optional[List[str]] = None) -> bool:
         """Cache database query result"""
         cache_key = f"db:{query_hash}"
         cached_data = {
@@ -375,7 +735,7 @@ class CacheManager:
             "cached_at": datetime.utcnow().isoformat(),
             "query_hash": query_hash
         }
-        return await self.set(cache_key, cached_data, expire_minutes * 60)
+        return await self.set(cache_key, cached_data, expire_minutes * 60, tags=tags)
     
     async def get_cached_database_query(self, query_hash: str) -> Optional[Any]:
         """Get cached database query result"""
@@ -383,10 +743,30 @@ class CacheManager:
         cached_data = await self.get(cache_key)
         return cached_data.get("result") if cached_data else None
     
+    async def get_or_run_database_query(self, query_hash: str,
+                                        query: Callable[[], Awaitable[Any]],
+                                        expire_minutes: int = 30,
+                                        stale_minutes: int = 0,
+                                        tags: Optional[List[str]] = None) -> Any:
+        """Get cached database query result, running the query once on a miss"""
+        async def load():
+            result = await query()
+            if result is None:
+                return None
+            return {
+                "result": result,
+                "cached_at": datetime.utcnow().isoformat(),
+                "query_hash": query_hash
+            }
+        
+        cache_key = f"db:{query_hash}"
+        cached_data = await self.get_or_load(cache_key, load, expire_minutes * 60, stale_minutes * 60, tags)
+        return cached_data.get("result") if cached_data else None
+    
     async def cache_user_session(self, user_id: str, session_data: Dict[str, Any], expire_hours: int = 24) -> bool:
         """Cache user session data"""
         cache_key = f"session:{user_id}"
-        return await self.set(cache_key, session_data, expire_hours * 3600)
+        return await self.set(cache_key, session_data, expire_hours * 3600, tags=[CacheTags.user(user_id)])
     
     async def get_user_session(self, user_id: str) -> Optional[Dict[str, Any]]:
         """Get cached user session data"""
@@ -394,8 +774,18 @@ class CacheManager:
         return await self.get(cache_key)
     
     async def invalidate_user_cache(self, user_id: str) -> int:
-        """Invalidate all cache entries for a user"""
-        return await self.clear_pattern(f"*{user_id}*")
+        """Invalidate all cache entries for a user: everything cached under CacheTags.user"""
+        return await self.invalidate_tags([CacheTags.user(user_id)])
+    
+    async def invalidate_collection_cache(self, collection: str, owner_id: Optional[str] = None) -> int:
+        """Invalidate entries derived from a collection after a write to it"""
+        return await self.invalidate_tags([CacheTags.collection(collection, owner_id)])
+    
+    async def invalidate_workspace_collections(self, workspace_id: str, *collections: str) -> int:
+        """Invalidate entries derived from a workspace's documents after writes to them"""
+        return await self.invalidate_tags([
+            CacheTags.workspace_collection(collection, workspace_id) for collection in collections
+        ])
 
 # Global cache manager instance
 cache_manager = CacheManager()
\ No newline at end of file
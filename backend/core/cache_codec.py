@@ -0,0 +1,199 @@
+"""
+Cache Codecs
+Pluggable binary serialization for cached values with optional compression
+"""
+
+import json
+import uuid
+import zlib
+from abc import ABC, abstractmethod
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Dict, Optional
+
+try:
+    import msgpack
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    MSGPACK_AVAILABLE = False
+    msgpack = None
+
+try:
+    from bson import ObjectId
+except ImportError:
+    ObjectId = None
+
+# Every encoded payload starts with one header byte: the high bit marks the
+# new format (JSON text never starts with a byte >= 0x80), the low bits name
+# the codec and whether the body is compressed.
+HEADER_MARKER = 0x80
+HEADER_COMPRESSED = 0x40
+HEADER_CODEC_MASK = 0x0F
+
+# msgpack extension type codes
+EXT_DATETIME = 1
+EXT_OBJECT_ID = 2
+EXT_DECIMAL = 3
+EXT_UUID = 4
+EXT_DATE = 5
+
+class CacheCodecError(Exception):
+    """Raised when a cached payload cannot be encoded or decoded"""
+
+class CacheCodec(ABC):
+    """Base codec: converts Python values to bytes and back"""
+
+    codec_id = 0
+    name = "base"
+
+    @abstractmethod
+    def dumps(self, value: Any) -> bytes:
+        ...
+
+    @abstractmethod
+    def loads(self, data: bytes) -> Any:
+        ...
+
+class JSONCodec(CacheCodec):
+    """JSON codec with tagged objects for datetime, ObjectId, Decimal and UUID"""
+
+    codec_id = 1
+    name = "json"
+
+    @staticmethod
+    def _default(value: Any) -> Dict[str, str]:
+        if isinstance(value, datetime):
+            return {"$dt": value.isoformat()}
+        if isinstance(value, date):
+            return {"$date": value.isoformat()}
+        if isinstance(value, Decimal):
+            return {"$dec": str(value)}
+        if isinstance(value, uuid.UUID):
+            return {"$uuid": str(value)}
+        if ObjectId is not None and isinstance(value, ObjectId):
+            return {"$oid": str(value)}
+        if isinstance(value, (set, frozenset)):
+            return list(value)
+        raise TypeError(f"Object of type {type(value).__name__} is not cacheable")
+
+    @staticmethod
+    def _object_hook(obj: Dict[str, Any]) -> Any:
+        if len(obj) != 1:
+            return obj
+        if "$dt" in obj:
+            return datetime.fromisoformat(obj["$dt"])
+        if "$date" in obj:
+            return date.fromisoformat(obj["$date"])
+        if "$dec" in obj:
+            return Decimal(obj["$dec"])
+        if "$uuid" in obj:
+            return uuid.UUID(obj["$uuid"])
+        if "$oid" in obj and ObjectId is not None:
+            return ObjectId(obj["$oid"])
+        return obj
+
+    def dumps(self, value: Any) -> bytes:
+        return json.dumps(value, default=self._default, separators=(",", ":")).encode("utf-8")
+
+    def loads(self, data: bytes) -> Any:
+        return json.loads(data, object_hook=self._object_hook)
+
+class MsgPackCodec(CacheCodec):
+    """Compact msgpack codec with extension types for Mongo/BSON values"""
+
+    codec_id = 2
+    name = "msgpack"
+
+    def __init__(self):
+        if not MSGPACK_AVAILABLE:
+            raise CacheCodecError("msgpack is not installed")
+
+    @staticmethod
+    def _default(value: Any) -> Any:
+        if isinstance(value, datetime):
+            return msgpack.ExtType(EXT_DATETIME, value.isoformat().encode("ascii"))
+        if isinstance(value, date):
+            return msgpack.ExtType(EXT_DATE, value.isoformat().encode("ascii"))
+        if isinstance(value, Decimal):
+            return msgpack.ExtType(EXT_DECIMAL, str(value).encode("ascii"))
+        if isinstance(value, uuid.UUID):
+            return msgpack.ExtType(EXT_UUID, value.bytes)
+        if ObjectId is not None and isinstance(value, ObjectId):
+            return msgpack.ExtType(EXT_OBJECT_ID, value.binary)
+        if isinstance(value, (set, frozenset)):
+            return list(value)
+        raise TypeError(f"Object of type {type(value).__name__} is not cacheable")
+
+    @staticmethod
+    def _ext_hook(code: int, data: bytes) -> Any:
+        if code == EXT_DATETIME:
+            return datetime.fromisoformat(data.decode("ascii"))
+        if code == EXT_DATE:
+            return date.fromisoformat(data.decode("ascii"))
+        if code == EXT_DECIMAL:
+            return Decimal(data.decode("ascii"))
+        if code == EXT_UUID:
+            return uuid.UUID(bytes=data)
+        if code == EXT_OBJECT_ID and ObjectId is not None:
+            return ObjectId(data)
+        return msgpack.ExtType(code, data)
+
+    def dumps(self, value: Any) -> bytes:
+        return msgpack.packb(value, default=self._default, use_bin_type=True, datetime=False)
+
+    def loads(self, data: bytes) -> Any:
+        return msgpack.unpackb(data, ext_hook=self._ext_hook, raw=False, strict_map_key=False)
+
+class CacheSerializer:
+    """Frames codec output with a header byte and compresses large payloads"""
+
+    def __init__(self, codec: Optional[CacheCodec] = None, compress_threshold: int = 4096,
+                 compression_level: int = 1):
+        self.codec = codec or default_codec()
+        self.compress_threshold = compress_threshold
+        self.compression_level = compression_level
+        self._decoders: Dict[int, CacheCodec] = {JSONCodec.codec_id: JSONCodec()}
+        self._decoders[self.codec.codec_id] = self.codec
+        if MSGPACK_AVAILABLE:
+            self._decoders.setdefault(MsgPackCodec.codec_id, MsgPackCodec())
+
+    def dumps(self, value: Any) -> bytes:
+        try:
+            body = self.codec.dumps(value)
+        except (TypeError, ValueError) as e:
+            raise CacheCodecError(str(e)) from e
+
+        header = HEADER_MARKER | self.codec.codec_id
+        if self.compress_threshold and len(body) >= self.compress_threshold:
+            compressed = zlib.compress(body, self.compression_level)
+            if len(compressed) < len(body):
+                body = compressed
+                header |= HEADER_COMPRESSED
+
+        return bytes((header,)) + body
+
+    def loads(self, data: bytes) -> Any:
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        if not data:
+            raise CacheCodecError("Empty cache payload")
+
+        header = data[0]
+        if not header & HEADER_MARKER:
+            # Plain JSON written before codecs existed, or a raw INCR counter
+            return json.loads(data)
+
+        codec = self._decoders.get(header & HEADER_CODEC_MASK)
+        if codec is None:
+            raise CacheCodecError(f"Unknown cache codec id {header & HEADER_CODEC_MASK}")
+
+        body = data[1:]
+        if header & HEADER_COMPRESSED:
+            body = zlib.decompress(body)
+        return codec.loads(body)
+
+def default_codec() -> CacheCodec:
+    """Fastest codec available in this environment"""
+    if MSGPACK_AVAILABLE:
+        return MsgPackCodec()
+    return JSONCodec()
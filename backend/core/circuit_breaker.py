@@ -0,0 +1,73 @@
+"""
+Circuit Breaker
+Stops calling a failing dependency for a while instead of letting every
+caller wait on it
+"""
+
+import time
+from typing import Any, Dict
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker
+
+    closed: calls pass; failure_threshold failures in a row open the circuit.
+    open: calls are refused until reset_timeout has passed.
+    half-open: a single trial call is let through; its outcome closes the
+    circuit again or reopens it for another reset_timeout.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_progress = False
+        self.stats = {
+            "opened": 0,
+            "rejected": 0
+        }
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        """Whether a call may go ahead now; callers must report its outcome"""
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self._trial_in_progress:
+            self._trial_in_progress = True
+            return True
+        self.stats["rejected"] += 1
+        return False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_progress = False
+
+    def record_ignored(self):
+        """Outcome says nothing about the dependency (e.g. a bad request); frees a trial slot"""
+        self._trial_in_progress = False
+
+    def record_failure(self):
+        self.failures += 1
+        if self._trial_in_progress or self.failures >= self.failure_threshold:
+            if self.opened_at is None:
+                self.stats["opened"] += 1
+            self.opened_at = time.monotonic()
+        self._trial_in_progress = False
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "name": self.name,
+            "state": self.state,
+            "consecutive_failures": self.failures
+        }
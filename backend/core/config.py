@@ -12,6 +12,28 @@ class Settings:
     # Database
     MONGO_URL: str = os.getenv("MONGO_URL", "mongodb://localhost:27017/mewayz_professional")
     DATABASE_NAME: str = "mewayz_professional"
+    MONGO_MAX_POOL_SIZE: int = int(os.getenv("MONGO_MAX_POOL_SIZE", "50"))
+    MONGO_MIN_POOL_SIZE: int = int(os.getenv("MONGO_MIN_POOL_SIZE", "5"))
+    MONGO_MAX_IDLE_TIME_MS: int = int(os.getenv("MONGO_MAX_IDLE_TIME_MS", "300000"))
+    MONGO_MAX_CONNECTING: int = int(os.getenv("MONGO_MAX_CONNECTING", "4"))
+    MONGO_WAIT_QUEUE_TIMEOUT_MS: int = int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", "5000"))
+    MONGO_SERVER_SELECTION_TIMEOUT_MS: int = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "10000"))
+    MONGO_COMPRESSORS: list = [
+        name.strip() for name in os.getenv("MONGO_COMPRESSORS", "zstd,snappy,zlib").split(",") if name.strip()
+    ]
+    MONGO_ANALYTICS_READ_PREFERENCE: str = os.getenv("MONGO_ANALYTICS_READ_PREFERENCE", "secondaryPreferred")
+    MONGO_ANALYTICS_MAX_STALENESS_SECONDS: int = int(os.getenv("MONGO_ANALYTICS_MAX_STALENESS_SECONDS", "120"))
+    # Per route class Mongo time budget (maxTimeMS), "class=ms" pairs; 0 disables
+    MONGO_ROUTE_TIMEOUTS_MS: dict = {
+        name.strip(): int(value) for name, value in (
+            pair.split("=", 1) for pair in
+            os.getenv("MONGO_ROUTE_TIMEOUTS_MS", "default=5000,analytics=30000,admin=15000,health=2000").split(",")
+            if "=" in pair
+        )
+    }
+    QUERY_PROFILER_ENABLED: bool = os.getenv("QUERY_PROFILER_ENABLED", "true").lower() == "true"
+    SLOW_QUERY_THRESHOLD_MS: float = float(os.getenv("SLOW_QUERY_THRESHOLD_MS", "100"))
+    QUERY_EXPLAIN_ENABLED: bool = os.getenv("QUERY_EXPLAIN_ENABLED", "true").lower() == "true"
     
     # Security
     SECRET_KEY: str = os.getenv("SECRET_KEY", "mewayz-professional-secret-key-2025-ultra-secure")
@@ -30,10 +52,92 @@ class Settings:
     # AI Services
     OPENAI_API_KEY: Optional[str] = os.getenv("OPENAI_API_KEY")
     
+    # Per-process auth caches (core/auth_cache.py)
+    AUTH_TOKEN_CACHE_SIZE: int = int(os.getenv("AUTH_TOKEN_CACHE_SIZE", "50000"))
+    AUTH_TOKEN_CACHE_TTL_SECONDS: int = int(os.getenv("AUTH_TOKEN_CACHE_TTL_SECONDS", "300"))
+    AUTH_USER_CACHE_SIZE: int = int(os.getenv("AUTH_USER_CACHE_SIZE", "20000"))
+    AUTH_USER_CACHE_TTL_SECONDS: int = int(os.getenv("AUTH_USER_CACHE_TTL_SECONDS", "30"))
+    AUTH_REVOCATION_POLL_SECONDS: float = float(os.getenv("AUTH_REVOCATION_POLL_SECONDS", "5"))
+    AUTH_REVOCATION_BLOOM_CAPACITY: int = int(os.getenv("AUTH_REVOCATION_BLOOM_CAPACITY", "100000"))
+    
+    # Rate limiting: proxies in front of the app that append to X-Forwarded-For;
+    # 0 keys anonymous callers on the socket peer address
+    RATE_LIMIT_TRUSTED_PROXY_HOPS: int = int(os.getenv("RATE_LIMIT_TRUSTED_PROXY_HOPS", "0"))
+    # Retention of raw usage records and of the per-minute rollups analytics read (30d timeframe max)
+    API_USAGE_RETENTION_DAYS: int = int(os.getenv("API_USAGE_RETENTION_DAYS", "30"))
+    API_USAGE_ROLLUP_RETENTION_DAYS: int = int(os.getenv("API_USAGE_ROLLUP_RETENTION_DAYS", "90"))
+    
+    # Cache
+    REDIS_URL: str = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+    CACHE_LOCAL_MAX_ENTRIES: int = int(os.getenv("CACHE_LOCAL_MAX_ENTRIES", "10000"))
+    CACHE_LOCAL_MAX_BYTES: int = int(os.getenv("CACHE_LOCAL_MAX_BYTES", str(64 * 1024 * 1024)))
+    CACHE_LOCAL_TTL_SECONDS: int = int(os.getenv("CACHE_LOCAL_TTL_SECONDS", "30"))
+    CACHE_CODEC: str = os.getenv("CACHE_CODEC", "msgpack")
+    CACHE_COMPRESS_THRESHOLD_BYTES: int = int(os.getenv("CACHE_COMPRESS_THRESHOLD_BYTES", "4096"))
+    
+    # Startup
+    LAZY_ROUTERS: bool = os.getenv("LAZY_ROUTERS", "true").lower() == "true"
+    EAGER_ROUTERS: list = [
+        name.strip() for name in
+        os.getenv("EAGER_ROUTERS", "auth,users,user,dashboard,workspace,workspaces").split(",")
+        if name.strip()
+    ]
+    STARTUP_PROFILE: bool = os.getenv("STARTUP_PROFILE", "false").lower() == "true"
+    # Seconds between in-app analytics daily rollup runs; 0 leaves it to the maintenance script
+    ANALYTICS_ROLLUP_INTERVAL_SECONDS: int = int(os.getenv("ANALYTICS_ROLLUP_INTERVAL_SECONDS", "3600"))
+    # Already rolled days re-rolled on every run so late-arriving events are counted
+    ANALYTICS_ROLLUP_LATE_DAYS: int = int(os.getenv("ANALYTICS_ROLLUP_LATE_DAYS", "2"))
+    # Event ingestion: buffered inserts into the analytics_event_stream time-series collection
+    ANALYTICS_INGEST_BATCH_SIZE: int = int(os.getenv("ANALYTICS_INGEST_BATCH_SIZE", "1000"))
+    ANALYTICS_INGEST_FLUSH_SECONDS: float = float(os.getenv("ANALYTICS_INGEST_FLUSH_SECONDS", "0.5"))
+    ANALYTICS_INGEST_MAX_PENDING: int = int(os.getenv("ANALYTICS_INGEST_MAX_PENDING", "50000"))
+    ANALYTICS_EVENT_RETENTION_DAYS: int = int(os.getenv("ANALYTICS_EVENT_RETENTION_DAYS", "400"))
+    ANALYTICS_LIVE_COUNTER_RETENTION_DAYS: int = int(os.getenv("ANALYTICS_LIVE_COUNTER_RETENTION_DAYS", "35"))
+    # Short-link redirects: per-worker code cache (seconds bound cross-worker staleness after edits)
+    LINK_REDIRECT_CACHE_SIZE: int = int(os.getenv("LINK_REDIRECT_CACHE_SIZE", "50000"))
+    LINK_REDIRECT_CACHE_MAX_BYTES: int = int(os.getenv("LINK_REDIRECT_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+    LINK_REDIRECT_CACHE_TTL_SECONDS: int = int(os.getenv("LINK_REDIRECT_CACHE_TTL_SECONDS", "60"))
+    LINK_REDIRECT_NEGATIVE_TTL_SECONDS: int = int(os.getenv("LINK_REDIRECT_NEGATIVE_TTL_SECONDS", "10"))
+    LINK_CLICK_RETENTION_DAYS: int = int(os.getenv("LINK_CLICK_RETENTION_DAYS", "90"))
+    # Expire raw clicks after LINK_CLICK_RETENTION_DAYS; turn on only once
+    # scripts/maintenance/backfill_link_rollups.py has replayed older clicks
+    LINK_CLICK_TTL_ENABLED: bool = os.getenv("LINK_CLICK_TTL_ENABLED", "false").lower() == "true"
+    # Generated short codes: fixed length, ids leased in blocks; length and secret must stay stable
+    SHORT_CODE_LENGTH: int = int(os.getenv("SHORT_CODE_LENGTH", "7"))
+    SHORT_CODE_LEASE_SIZE: int = int(os.getenv("SHORT_CODE_LEASE_SIZE", "1000"))
+    SHORT_CODE_SHUFFLE: bool = os.getenv("SHORT_CODE_SHUFFLE", "true").lower() == "true"
+    SHORT_CODE_SECRET: str = os.getenv("SHORT_CODE_SECRET", SECRET_KEY)
+    # WebSocket fan-out: frames queued per connection; a full queue drops its oldest frame,
+    # a send stalled past the timeout disconnects the slow client
+    WEBSOCKET_SEND_QUEUE_SIZE: int = int(os.getenv("WEBSOCKET_SEND_QUEUE_SIZE", "256"))
+    WEBSOCKET_SEND_TIMEOUT_SECONDS: float = float(os.getenv("WEBSOCKET_SEND_TIMEOUT_SECONDS", "10"))
+    # Cross-worker WebSocket delivery: auto uses Redis pub/sub when connected, local keeps it in-process
+    REALTIME_BACKPLANE: str = os.getenv("REALTIME_BACKPLANE", "auto")
+    REALTIME_BACKPLANE_FLUSH_MS: float = float(os.getenv("REALTIME_BACKPLANE_FLUSH_MS", "5"))
+    REALTIME_PRESENCE_TTL_SECONDS: int = int(os.getenv("REALTIME_PRESENCE_TTL_SECONDS", "30"))
+    # Notification delivery: concurrent workers per scheduler; persisted jobs of a worker
+    # that stops renewing its lease are taken over by others after this long
+    NOTIFICATION_WORKERS: int = int(os.getenv("NOTIFICATION_WORKERS", "8"))
+    NOTIFICATION_LEASE_SECONDS: int = int(os.getenv("NOTIFICATION_LEASE_SECONDS", "60"))
+    # Per delivery channel (email, sms, push, ...): concurrent sends, send timeout and the
+    # consecutive failures that open its circuit breaker for NOTIFICATION_BREAKER_RESET_SECONDS
+    NOTIFICATION_CHANNEL_CONCURRENCY: int = int(os.getenv("NOTIFICATION_CHANNEL_CONCURRENCY", "50"))
+    NOTIFICATION_CHANNEL_TIMEOUT_SECONDS: float = float(os.getenv("NOTIFICATION_CHANNEL_TIMEOUT_SECONDS", "10"))
+    # How long shutdown waits for background channel sends and their history records
+    NOTIFICATION_SHUTDOWN_TIMEOUT_SECONDS: float = float(os.getenv("NOTIFICATION_SHUTDOWN_TIMEOUT_SECONDS", "15"))
+    NOTIFICATION_BREAKER_FAILURES: int = int(os.getenv("NOTIFICATION_BREAKER_FAILURES", "5"))
+    NOTIFICATION_BREAKER_RESET_SECONDS: float = float(os.getenv("NOTIFICATION_BREAKER_RESET_SECONDS", "30"))
+    # Default digest window for bursts of similar notifications (users opt in through their
+    # notification preferences; 0, the default, delivers every notification individually)
+    NOTIFICATION_DIGEST_WINDOW_SECONDS: int = int(os.getenv("NOTIFICATION_DIGEST_WINDOW_SECONDS", "0"))
+    NOTIFICATION_DIGEST_PREFERENCES_TTL_SECONDS: int = int(os.getenv("NOTIFICATION_DIGEST_PREFERENCES_TTL_SECONDS", "300"))
+    INDEX_RECONCILE_ON_STARTUP: bool = os.getenv("INDEX_RECONCILE_ON_STARTUP", "true").lower() == "true"
+    
     # Application
     APP_NAME: str = "Mewayz Professional Platform"
     VERSION: str = "3.0.0"
     DEBUG: bool = os.getenv("DEBUG", "false").lower() == "true"
+    WEB_CONCURRENCY: int = int(os.getenv("WEB_CONCURRENCY", "1"))
     
     # CORS Settings
     ALLOWED_ORIGINS: list = [
@@ -6,17 +6,28 @@ from motor.motor_asyncio import AsyncIOMotorClient
 from typing import Optional
 import asyncio
 from .config import settings
+from .mongo_pool import analytics_read_preference, client_options, pool_monitor
+from .query_profiler import query_profiler
 
 class Database:
     client: Optional[AsyncIOMotorClient] = None
     database = None
+    # Same database with the analytics read preference (secondaries)
+    analytics_database = None
 
 db = Database()
 
 async def connect_to_mongo():
     """Create database connection"""
-    db.client = AsyncIOMotorClient(settings.MONGO_URL)
+    event_listeners = [pool_monitor]
+    if settings.QUERY_PROFILER_ENABLED:
+        event_listeners.append(query_profiler)
+    db.client = AsyncIOMotorClient(settings.MONGO_URL, event_listeners=event_listeners, **client_options())
+    query_profiler.bind(db.client, asyncio.get_running_loop())
     db.database = db.client[settings.DATABASE_NAME]
+    db.analytics_database = db.client.get_database(
+        settings.DATABASE_NAME, read_preference=analytics_read_preference()
+    )
     
     # Test connection
     try:
@@ -40,6 +51,14 @@ async def get_database_async():
     """Get database instance (async version for compatibility)"""
     return db.database
 
+def get_analytics_database():
+    """Database handle for analytics/BI reads, routed by MONGO_ANALYTICS_READ_PREFERENCE;
+    writes through it still go to the primary"""
+    return db.analytics_database if db.analytics_database is not None else db.database
+
+async def get_analytics_database_async():
+    return get_analytics_database()
+
 # Collection getters - these will return the actual collections
 def get_users_collection():
     return db.database.users
@@ -11,11 +11,22 @@ from core.admin_config_manager import admin_config_manager
 from core.professional_logger import professional_logger, LogLevel, LogCategory
 import asyncio
 
-class SocialMediaAPIIntegrator:
+class LazyHTTPClientMixin:
+    """Creates the httpx client on first use instead of at import time"""
+    
+    client_timeout = 30.0
+    _client = None
+    
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(timeout=self.client_timeout)
+        return self._client
+
+class SocialMediaAPIIntegrator(LazyHTTPClientMixin):
     """Social Media API integrations with admin configuration"""
     
-    def __init__(self):
-        self.client = httpx.AsyncClient(timeout=30.0)
+    client_timeout = 30.0
     
     async def get_twitter_data(self, user_handle: str) -> Dict[str, Any]:
         """Get Twitter data using Twitter API v2"""
@@ -264,11 +275,10 @@ class PaymentProcessorIntegrator:
         # Razorpay implementation would go here
         return {"success": True, "processor": "razorpay", "payment_id": "mock_razorpay_id"}
 
-class EmailServiceIntegrator:
+class EmailServiceIntegrator(LazyHTTPClientMixin):
     """Email service integration with multiple providers"""
     
-    def __init__(self):
-        self.client = httpx.AsyncClient(timeout=30.0)
+    client_timeout = 30.0
     
     async def send_email(
         self, 
@@ -290,7 +300,7 @@ class EmailServiceIntegrator:
             elif service == "aws_ses":
                 return await self._send_aws_ses_email(to_email, subject, content, from_email)
             else:
-                return {"success": False, "error": f"Email service {service} not configured"}
+                return {"success": False, "error": f"Email service {service} not configured", "permanent": True}
                 
         except Exception as e:
             await professional_logger.log(
@@ -309,7 +319,7 @@ class EmailServiceIntegrator:
             from_email = from_email or config.get("sendgrid_from_email")
             
             if not api_key:
-                return {"success": False, "error": "SendGrid API key not configured"}
+                return {"success": False, "error": "SendGrid API key not configured", "permanent": True}
             
             headers = {
                 "Authorization": f"Bearer {api_key}",
@@ -342,7 +352,12 @@ class EmailServiceIntegrator:
             if response.status_code == 202:
                 return {"success": True, "service": "sendgrid"}
             else:
-                return {"success": False, "error": f"SendGrid error: {response.status_code}"}
+                # 4xx other than throttling: this message or our configuration, not an outage
+                return {
+                    "success": False,
+                    "error": f"SendGrid error: {response.status_code}",
+                    "permanent": 400 <= response.status_code < 500 and response.status_code != 429
+                }
                 
         except Exception as e:
             return {"success": False, "error": str(e)}
@@ -357,11 +372,12 @@ class EmailServiceIntegrator:
         # AWS SES implementation would go here
         return {"success": True, "service": "aws_ses"}
 
-class FileStorageIntegrator:
+class FileStorageIntegrator(LazyHTTPClientMixin):
     """Backblaze B2 file storage integration"""
     
+    client_timeout = 60.0
+
     def __init__(self):
-        self.client = httpx.AsyncClient(timeout=60.0)
         self.auth_token = None
         self.api_url = None
     
@@ -439,11 +455,10 @@ class FileStorageIntegrator:
             )
             return {"success": False, "error": str(e)}
 
-class AIServiceIntegrator:
+class AIServiceIntegrator(LazyHTTPClientMixin):
     """AI service integration with multiple providers"""
     
-    def __init__(self):
-        self.client = httpx.AsyncClient(timeout=60.0)
+    client_timeout = 60.0
     
     async def generate_content(
         self, 
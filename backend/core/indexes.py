@@ -0,0 +1,225 @@
+"""
+Index Registry
+Declarative Mongo index specs, declared next to the code that queries the
+collection and reconciled at startup or with scripts/maintenance/ensure_indexes.py
+"""
+
+import asyncio
+import importlib
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from pymongo import ASCENDING, IndexModel
+
+from core.database import get_database
+from core.logging import admin_logger
+
+# Modules that declare indexes; imported before reconciling so that lazily
+# loaded routers and services are covered too
+INDEXED_MODULES = [
+    "core.auth_cache",
+    "core.notification_scheduler",
+    "core.professional_logger",
+    "core.performance_optimizer",
+    "core.security_enhancements",
+    "services.analytics_ingest_service",
+    "services.analytics_rollup_service",
+    "services.analytics_service",
+    "services.bookings_service",
+    "services.dashboard_service",
+    "services.link_click_rollup_service",
+    "services.link_shortener_service",
+    "services.rate_limiting_service",
+]
+
+IndexKey = Tuple[str, Any]
+
+@dataclass
+class IndexSpec:
+    collection: str
+    keys: List[IndexKey]
+    unique: bool = False
+    sparse: bool = False
+    expire_after_seconds: Optional[int] = None
+    partial_filter: Optional[Dict[str, Any]] = None
+    name: Optional[str] = None
+    owner: str = field(default="", compare=False)
+
+    @property
+    def index_name(self) -> str:
+        """Explicit name, or the name Mongo would generate from the keys"""
+        return self.name or "_".join(f"{key}_{direction}" for key, direction in self.keys)
+
+    def model(self) -> IndexModel:
+        options: Dict[str, Any] = {"name": self.index_name}
+        if self.unique:
+            options["unique"] = True
+        if self.sparse:
+            options["sparse"] = True
+        if self.expire_after_seconds is not None:
+            options["expireAfterSeconds"] = self.expire_after_seconds
+        if self.partial_filter is not None:
+            options["partialFilterExpression"] = self.partial_filter
+        return IndexModel(self.keys, **options)
+
+    def options(self) -> Dict[str, Any]:
+        return {
+            "unique": self.unique,
+            "sparse": self.sparse,
+            "expireAfterSeconds": self.expire_after_seconds,
+            "partialFilterExpression": self.partial_filter
+        }
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "collection": self.collection,
+            "name": self.index_name,
+            "keys": [list(key) for key in self.keys],
+            "owner": self.owner,
+            **{option: value for option, value in self.options().items() if value not in (None, False)}
+        }
+
+def index(collection: str, *keys, **options) -> IndexSpec:
+    """Shorthand: index("links", "short_code", unique=True) or index("c", ("ts", -1))"""
+    normalized = [key if isinstance(key, tuple) else (key, ASCENDING) for key in keys]
+    return IndexSpec(collection=collection, keys=normalized, **options)
+
+def _normalize_key(key) -> List[IndexKey]:
+    return [(name, int(direction) if isinstance(direction, float) else direction) for name, direction in key]
+
+def _existing_options(info: Dict[str, Any]) -> Dict[str, Any]:
+    expire = info.get("expireAfterSeconds")
+    return {
+        "unique": bool(info.get("unique", False)),
+        "sparse": bool(info.get("sparse", False)),
+        "expireAfterSeconds": int(expire) if expire is not None else None,
+        "partialFilterExpression": dict(info["partialFilterExpression"]) if info.get("partialFilterExpression") else None
+    }
+
+class IndexRegistry:
+    """Collects IndexSpecs from their owning modules and reconciles them with Mongo"""
+
+    def __init__(self):
+        self.specs: List[IndexSpec] = []
+        self._background_task: Optional[asyncio.Task] = None
+        self.last_report: Optional[Dict[str, Any]] = None
+
+    def register(self, owner: str, *specs: IndexSpec):
+        for spec in specs:
+            spec.owner = owner
+            if spec not in self.specs:
+                self.specs.append(spec)
+
+    def discover(self, modules: Optional[List[str]] = None) -> List[str]:
+        """Import the declaring modules; returns those that failed to import"""
+        failed = []
+        for module_path in modules or INDEXED_MODULES:
+            try:
+                importlib.import_module(module_path)
+            except Exception as e:
+                failed.append(f"{module_path}: {e}")
+        return failed
+
+    @staticmethod
+    def _check(spec: IndexSpec, existing: Dict[str, Dict[str, Any]]) -> Tuple[str, Optional[str]]:
+        """present, missing or conflict (with a reason) for one spec"""
+        wanted_keys = _normalize_key(spec.keys)
+        named = existing.get(spec.index_name)
+        if named is not None and _normalize_key(named["key"]) != wanted_keys:
+            return "conflict", f"index {spec.index_name} exists with keys {named['key']}"
+
+        for name, info in existing.items():
+            if _normalize_key(info["key"]) != wanted_keys:
+                continue
+            existing_options = _existing_options(info)
+            if existing_options == spec.options():
+                return "present", None
+            if name == spec.index_name or existing_options["partialFilterExpression"] == spec.partial_filter:
+                differences = {
+                    option: {"declared": value, "existing": existing_options[option]}
+                    for option, value in spec.options().items() if existing_options[option] != value
+                }
+                return "conflict", f"index {name} has different options: {differences}"
+        return "missing", None
+
+    async def reconcile(self, create: bool = True, discover: bool = True) -> Dict[str, Any]:
+        """Compare declared indexes with the database and create the missing ones
+
+        Conflicting indexes (same keys or name, different options) are only
+        reported; dropping an index is left to an operator.
+        """
+        errors = self.discover() if discover else []
+        report: Dict[str, Any] = {
+            "declared": len(self.specs),
+            "present": [],
+            "created": [],
+            "missing": [],
+            "conflicts": [],
+            "errors": errors
+        }
+
+        db = get_database()
+        by_collection: Dict[str, List[IndexSpec]] = {}
+        for spec in self.specs:
+            by_collection.setdefault(spec.collection, []).append(spec)
+
+        for collection_name, specs in by_collection.items():
+            collection = db[collection_name]
+            try:
+                existing = await collection.index_information()
+            except Exception as e:
+                report["errors"].append(f"{collection_name}: {e}")
+                continue
+
+            to_create = []
+            for spec in specs:
+                status, reason = self._check(spec, existing)
+                if status == "present":
+                    report["present"].append(spec.describe())
+                elif status == "conflict":
+                    report["conflicts"].append({**spec.describe(), "reason": reason})
+                else:
+                    to_create.append(spec)
+
+            if not to_create:
+                continue
+            if not create:
+                report["missing"].extend(spec.describe() for spec in to_create)
+                continue
+            try:
+                # One createIndexes command per collection
+                await collection.create_indexes([spec.model() for spec in to_create])
+                report["created"].extend(spec.describe() for spec in to_create)
+            except Exception:
+                # The batch fails as a whole; retry one by one to isolate the bad spec
+                for spec in to_create:
+                    try:
+                        await collection.create_indexes([spec.model()])
+                        report["created"].append(spec.describe())
+                    except Exception as e:
+                        report["missing"].append(spec.describe())
+                        report["errors"].append(f"{collection_name}.{spec.index_name}: {e}")
+
+        self.last_report = report
+        admin_logger.log_system_event("INDEX_RECONCILE", {
+            "declared": report["declared"],
+            "present": len(report["present"]),
+            "created": [f"{spec['collection']}.{spec['name']}" for spec in report["created"]],
+            "missing": [f"{spec['collection']}.{spec['name']}" for spec in report["missing"]],
+            "conflicts": [f"{spec['collection']}.{spec['name']}" for spec in report["conflicts"]],
+            "errors": report["errors"]
+        }, "WARNING" if report["missing"] or report["conflicts"] or report["errors"] else "INFO")
+        return report
+
+    def start_background_reconcile(self):
+        """Reconcile without holding up startup; index builds can take a while"""
+        async def run():
+            try:
+                await self.reconcile()
+            except Exception as e:
+                admin_logger.log_system_event("INDEX_RECONCILE_ERROR", {"error": str(e)}, "ERROR")
+
+        self._background_task = asyncio.get_running_loop().create_task(run())
+
+# Global index registry instance
+index_registry = IndexRegistry()
@@ -9,7 +9,6 @@ import os
 from datetime import datetime, timedelta
 from typing import Dict, Any, Optional, List
 from pathlib import Path
-import asyncio
 from fastapi import Request
 import aiofiles
 
@@ -72,7 +71,7 @@ class AdminLogger:
         self.logger.info(f"API_CALL: {json.dumps(log_entry, indent=2)}")
         
         # Also store in database for admin dashboard
-        asyncio.create_task(self._store_log_in_db(log_entry))
+        self._store_in_background(log_entry)
     
     def log_external_api_call(self, service: str, endpoint: str, status: int, 
                              response_time: float, error: str = None, request_data: Dict = None):
@@ -93,7 +92,7 @@ class AdminLogger:
         level = logging.ERROR if status >= 400 else logging.INFO
         self.logger.log(level, f"EXTERNAL_API: {json.dumps(log_entry, indent=2)}")
         
-        asyncio.create_task(self._store_log_in_db(log_entry))
+        self._store_in_background(log_entry)
     
     def log_system_event(self, event_type: str, details: Dict[str, Any], severity: str = "INFO"):
         """Log system events with categorization"""
@@ -109,7 +108,7 @@ class AdminLogger:
         level = getattr(logging, severity.upper(), logging.INFO)
         self.logger.log(level, f"SYSTEM_EVENT: {json.dumps(log_entry, indent=2)}")
         
-        asyncio.create_task(self._store_log_in_db(log_entry))
+        self._store_in_background(log_entry)
     
     def log_security_event(self, event_type: str, user_id: str, ip_address: str, 
                           details: Dict[str, Any], severity: str = "WARNING"):
@@ -128,7 +127,7 @@ class AdminLogger:
         level = getattr(logging, severity.upper(), logging.WARNING)
         self.logger.log(level, f"SECURITY_EVENT: {json.dumps(log_entry, indent=2)}")
         
-        asyncio.create_task(self._store_log_in_db(log_entry))
+        self._store_in_background(log_entry)
     
     def log_payment_event(self, processor: str, transaction_id: str, amount: float, 
                          currency: str, status: str, user_id: str, details: Dict = None):
@@ -149,7 +148,7 @@ class AdminLogger:
         level = logging.ERROR if status == "failed" else logging.INFO
         self.logger.log(level, f"PAYMENT_EVENT: {json.dumps(log_entry, indent=2)}")
         
-        asyncio.create_task(self._store_log_in_db(log_entry))
+        self._store_in_background(log_entry)
     
     async def get_logs_for_admin(self, filters: Dict[str, Any]) -> List[Dict[str, Any]]:
         """Retrieve logs with admin filtering capabilities"""
@@ -185,6 +184,12 @@ class AdminLogger:
             self.logger.error(f"Failed to retrieve logs for admin: {str(e)}")
             return []
     
+    def _store_in_background(self, log_entry: Dict[str, Any]):
+        """Write the entry without holding up the caller or sharing its Mongo deadline"""
+        # Imported here: core.mongo_pool depends on this module through core.metrics
+        from core.mongo_pool import create_background_task
+        create_background_task(self._store_log_in_db(log_entry))
+    
     async def _store_log_in_db(self, log_entry: Dict[str, Any]):
         """Store log entry in database for admin dashboard"""
         try:
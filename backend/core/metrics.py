@@ -0,0 +1,227 @@
+"""
+Request Metrics
+Fixed-memory log-bucket latency histograms per route, method and status,
+recorded by ASGI middleware and exported in the Prometheus text format
+"""
+
+import math
+import time
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional, Tuple
+
+from core.logging import admin_logger
+
+class LogHistogram:
+    """Log-bucketed histogram: constant memory, quantiles within ~4.5% relative error"""
+
+    # 8 buckets per power of two between MIN_VALUE and MAX_VALUE
+    SUB_BUCKETS = 8
+    MIN_VALUE = 1e-6
+    MAX_VALUE = 1e5
+
+    _LOG_MIN = math.log2(MIN_VALUE)
+    BUCKET_COUNT = int(math.ceil((math.log2(MAX_VALUE) - _LOG_MIN) * SUB_BUCKETS)) + 2
+
+    __slots__ = ("counts", "count", "total", "min", "max")
+
+    def __init__(self):
+        self.counts = [0] * self.BUCKET_COUNT
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    @classmethod
+    def _index(cls, value: float) -> int:
+        # Bucket 0 holds everything <= MIN_VALUE (including zero)
+        if value <= cls.MIN_VALUE:
+            return 0
+        index = int((math.log2(value) - cls._LOG_MIN) * cls.SUB_BUCKETS) + 1
+        return min(index, cls.BUCKET_COUNT - 1)
+
+    @classmethod
+    def _bucket_value(cls, index: int) -> float:
+        """Geometric midpoint of a bucket"""
+        if index == 0:
+            return 0.0
+        return 2 ** (cls._LOG_MIN + (index - 0.5) / cls.SUB_BUCKETS)
+
+    def record(self, value: float):
+        self.counts[self._index(value)] += 1
+        self.count += 1
+        self.total += value
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q: float) -> float:
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if bucket_count and seen >= rank:
+                return min(max(self._bucket_value(index), self.min), self.max)
+        return self.max
+
+    def summary(self) -> Dict[str, float]:
+        if not self.count:
+            return {"count": 0, "avg": 0, "min": 0, "max": 0, "p50": 0, "p95": 0, "p99": 0}
+        return {
+            "count": self.count,
+            "avg": self.total / self.count,
+            "min": self.min,
+            "max": self.max,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99)
+        }
+
+SeriesKey = Tuple[str, str, str]
+
+# ASGI scope of the request being served, for code that runs below the route
+# handler (e.g. database command listeners) and wants to know the route
+current_request_scope: ContextVar[Optional[Dict[str, Any]]] = ContextVar("current_request_scope", default=None)
+
+class RequestMetrics:
+    """Request latency histograms keyed by (method, route template, status)"""
+
+    QUANTILES = (0.5, 0.95, 0.99)
+    # Further label combinations are folded into one overflow series
+    MAX_SERIES = 5000
+    OVERFLOW_ROUTE = "__other__"
+
+    def __init__(self):
+        self.series: Dict[SeriesKey, LogHistogram] = {}
+        self.in_flight = 0
+        self.start_time = time.time()
+
+    def observe(self, method: str, route: str, status: int, seconds: float):
+        key = (method, route, str(status))
+        histogram = self.series.get(key)
+        if histogram is None:
+            if len(self.series) >= self.MAX_SERIES:
+                key = (method, self.OVERFLOW_ROUTE, str(status))
+                histogram = self.series.get(key)
+            if histogram is None:
+                histogram = self.series[key] = LogHistogram()
+        histogram.record(seconds)
+
+    def get_summary(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Per-series latency summary in milliseconds, slowest p95 first"""
+        rows = []
+        for (method, route, status), histogram in self.series.items():
+            stats = histogram.summary()
+            rows.append({
+                "method": method,
+                "route": route,
+                "status": int(status) if status.isdigit() else status,
+                "count": stats["count"],
+                "avg_ms": round(stats["avg"] * 1000, 3),
+                "p50_ms": round(stats["p50"] * 1000, 3),
+                "p95_ms": round(stats["p95"] * 1000, 3),
+                "p99_ms": round(stats["p99"] * 1000, 3),
+                "max_ms": round(stats["max"] * 1000, 3)
+            })
+        rows.sort(key=lambda row: row["p95_ms"], reverse=True)
+        return rows[:limit] if limit else rows
+
+    @staticmethod
+    def _escape(value: str) -> str:
+        return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+    def render_prometheus(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)"""
+        name = "mewayz_http_request_duration_seconds"
+        lines = [
+            f"# HELP {name} HTTP request latency by route template, method and status.",
+            f"# TYPE {name} summary"
+        ]
+        for (method, route, status), histogram in sorted(self.series.items()):
+            labels = f'method="{self._escape(method)}",route="{self._escape(route)}",status="{status}"'
+            for q in self.QUANTILES:
+                lines.append(f'{name}{{{labels},quantile="{q}"}} {histogram.quantile(q):.6g}')
+            lines.append(f"{name}_sum{{{labels}}} {histogram.total:.6g}")
+            lines.append(f"{name}_count{{{labels}}} {histogram.count}")
+
+        lines.extend([
+            "# HELP mewayz_http_requests_in_flight Requests currently being served.",
+            "# TYPE mewayz_http_requests_in_flight gauge",
+            f"mewayz_http_requests_in_flight {self.in_flight}",
+            "# HELP mewayz_process_uptime_seconds Seconds since this worker started.",
+            "# TYPE mewayz_process_uptime_seconds gauge",
+            f"mewayz_process_uptime_seconds {time.time() - self.start_time:.3f}"
+        ])
+        return "\n".join(lines) + "\n"
+
+def route_template(scope) -> Optional[str]:
+    """Full path template of the route the router matched, e.g. /api/links/{link_id}
+
+    scope["route"].path is relative to the router that declares the route (on
+    FastAPI versions that keep included routers nested it lacks every include
+    prefix), so the prefix is recovered as the part of the request path in
+    front of the longest suffix the route's own pattern matches. None if no
+    route matched.
+    """
+    route = scope.get("route")
+    template = getattr(route, "path", None)
+    path_regex = getattr(route, "path_regex", None)
+    if not template or path_regex is None:
+        return template
+    path = scope.get("path", "")
+    start = 0
+    while start != -1:
+        if path_regex.match(path[start:]):
+            return path[:start] + template
+        start = path.find("/", start + 1)
+    return template
+
+class MetricsMiddleware:
+    """Pure ASGI middleware timing every HTTP request into request_metrics"""
+
+    UNMATCHED_ROUTE = "__unmatched__"
+
+    def __init__(self, app, metrics: Optional[RequestMetrics] = None):
+        self.app = app
+        self.metrics = metrics or request_metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start_time = time.perf_counter()
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        self.metrics.in_flight += 1
+        scope_token = current_request_scope.set(scope)
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            current_request_scope.reset(scope_token)
+            self.metrics.in_flight -= 1
+            try:
+                # The router stores the matched route in the shared scope; the
+                # template keeps path parameters from exploding label cardinality
+                self.metrics.observe(
+                    scope["method"],
+                    route_template(scope) or self.UNMATCHED_ROUTE,
+                    status_code,
+                    time.perf_counter() - start_time
+                )
+            except Exception as e:
+                admin_logger.log_system_event("REQUEST_METRICS_ERROR", {
+                    "path": scope.get("path"),
+                    "error": str(e)
+                }, "WARNING")
+
+# Global request metrics instance
+request_metrics = RequestMetrics()
@@ -0,0 +1,294 @@
+"""
+Mongo Connection Management
+Motor client pool options, connection-pool metrics, analytics read preference
+and per-route-class server-side time limits (pymongo.timeout -> maxTimeMS)
+"""
+
+import asyncio
+import contextvars
+import threading
+import time
+from typing import Any, Dict, List
+
+import pymongo
+from fastapi import Request
+from pymongo import monitoring
+from pymongo.read_preferences import Nearest, Primary, PrimaryPreferred, Secondary, SecondaryPreferred
+
+from core.config import settings
+from core.metrics import LogHistogram
+
+try:
+    import zstandard  # noqa: F401
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
+try:
+    import snappy  # noqa: F401
+    SNAPPY_AVAILABLE = True
+except ImportError:
+    SNAPPY_AVAILABLE = False
+
+_READ_PREFERENCES = {
+    "primary": Primary,
+    "primarypreferred": PrimaryPreferred,
+    "secondary": Secondary,
+    "secondarypreferred": SecondaryPreferred,
+    "nearest": Nearest
+}
+
+# Route classes for server-side time limits; the first matching prefix wins
+ROUTE_CLASSES = [
+    ("health", ("/health", "/api/health", "/ready", "/readiness", "/metrics")),
+    ("analytics", ("/api/analytics", "/api/analytics-system", "/api/advanced-analytics",
+                   "/api/business-intelligence", "/api/ai-analytics", "/api/financial-analytics")),
+    ("admin", ("/api/admin", "/api/admin-config")),
+]
+
+def available_compressors() -> List[str]:
+    """Configured wire compressors whose libraries are installed, in preference order"""
+    available = {"zstd": ZSTD_AVAILABLE, "snappy": SNAPPY_AVAILABLE, "zlib": True}
+    return [name for name in settings.MONGO_COMPRESSORS if available.get(name)]
+
+def client_options() -> Dict[str, Any]:
+    """Keyword options for AsyncIOMotorClient"""
+    options = {
+        "maxPoolSize": settings.MONGO_MAX_POOL_SIZE,
+        "minPoolSize": settings.MONGO_MIN_POOL_SIZE,
+        "maxIdleTimeMS": settings.MONGO_MAX_IDLE_TIME_MS,
+        "maxConnecting": settings.MONGO_MAX_CONNECTING,
+        "waitQueueTimeoutMS": settings.MONGO_WAIT_QUEUE_TIMEOUT_MS,
+        "serverSelectionTimeoutMS": settings.MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        "appname": settings.APP_NAME
+    }
+    compressors = available_compressors()
+    if compressors:
+        options["compressors"] = ",".join(compressors)
+    return options
+
+def analytics_read_preference():
+    """Read preference for analytics/BI reads; secondaries by default"""
+    mode = _READ_PREFERENCES.get(settings.MONGO_ANALYTICS_READ_PREFERENCE.lower(), SecondaryPreferred)
+    if mode is Primary:
+        return Primary()
+    max_staleness = settings.MONGO_ANALYTICS_MAX_STALENESS_SECONDS
+    return mode(max_staleness=max_staleness if max_staleness > 0 else -1)
+
+def route_class(path: str) -> str:
+    for name, prefixes in ROUTE_CLASSES:
+        for prefix in prefixes:
+            if path == prefix or path.startswith(prefix + "/"):
+                return name
+    return "default"
+
+def operation_timeout(route_class_name: str = "default"):
+    """pymongo.timeout block for a route class; every command inside gets maxTimeMS
+    from the remaining budget. Usable outside requests, e.g. in jobs and scripts."""
+    timeout_ms = settings.MONGO_ROUTE_TIMEOUTS_MS.get(
+        route_class_name, settings.MONGO_ROUTE_TIMEOUTS_MS.get("default", 0)
+    )
+    return pymongo.timeout(timeout_ms / 1000 if timeout_ms > 0 else None)
+
+def create_background_task(coro) -> asyncio.Task:
+    """Start a task in a fresh context so it outlives the request without inheriting
+    its Mongo deadline (pymongo.timeout is carried in contextvars)"""
+    return contextvars.Context().run(asyncio.get_running_loop().create_task, coro)
+
+async def request_operation_timeout(request: Request):
+    """App-wide dependency bounding a request's Mongo work by its route class
+
+    Registered with scope="function", so the budget covers the dependencies and
+    the endpoint only: it ends before the response is sent and BackgroundTasks
+    run without it. Commands issued after it runs out fail fast instead of
+    queueing behind a saturated pool or a runaway query. Tasks spawned by the
+    endpoint copy the deadline with the context; start work that should
+    outlive the request with create_background_task.
+    """
+    with operation_timeout(route_class(request.scope.get("path", ""))):
+        yield
+
+class PoolMonitor(monitoring.ConnectionPoolListener):
+    """Connection pool listener: open/in-use/waiting gauges and checkout wait histograms
+
+    Pool events fire on the driver's executor threads, hence the lock.
+    """
+
+    def __init__(self):
+        self.pools: Dict[str, Dict[str, Any]] = {}
+        self.checkout_wait: Dict[str, LogHistogram] = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    @staticmethod
+    def _address(event) -> str:
+        host, port = event.address
+        return f"{host}:{port}"
+
+    def _pool(self, address: str) -> Dict[str, Any]:
+        pool = self.pools.get(address)
+        if pool is None:
+            pool = self.pools[address] = {
+                "open": 0, "in_use": 0, "waiting": 0,
+                "peak_open": 0, "peak_in_use": 0, "peak_waiting": 0,
+                "created": 0, "closed": 0, "checkouts": 0, "cleared": 0,
+                "checkout_failures": {}
+            }
+            self.checkout_wait[address] = LogHistogram()
+        return pool
+
+    def pool_created(self, event):
+        with self._lock:
+            self._pool(self._address(event))
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        with self._lock:
+            self._pool(self._address(event))["cleared"] += 1
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        with self._lock:
+            pool = self._pool(self._address(event))
+            pool["created"] += 1
+            pool["open"] += 1
+            pool["peak_open"] = max(pool["peak_open"], pool["open"])
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        with self._lock:
+            pool = self._pool(self._address(event))
+            pool["closed"] += 1
+            pool["open"] = max(pool["open"] - 1, 0)
+
+    def connection_check_out_started(self, event):
+        # Checkout start and finish fire on the same thread
+        self._local.started = time.perf_counter()
+        with self._lock:
+            pool = self._pool(self._address(event))
+            pool["waiting"] += 1
+            pool["peak_waiting"] = max(pool["peak_waiting"], pool["waiting"])
+
+    def _checkout_finished(self, event) -> float:
+        # PyMongo 4.7+ reports the wait itself
+        duration = getattr(event, "duration", None)
+        if duration is None:
+            started = getattr(self._local, "started", None)
+            duration = time.perf_counter() - started if started is not None else 0.0
+        self._local.started = None
+        return duration
+
+    def connection_check_out_failed(self, event):
+        duration = self._checkout_finished(event)
+        address = self._address(event)
+        with self._lock:
+            pool = self._pool(address)
+            pool["waiting"] = max(pool["waiting"] - 1, 0)
+            reason = str(event.reason)
+            pool["checkout_failures"][reason] = pool["checkout_failures"].get(reason, 0) + 1
+            self.checkout_wait[address].record(duration)
+
+    def connection_checked_out(self, event):
+        duration = self._checkout_finished(event)
+        address = self._address(event)
+        with self._lock:
+            pool = self._pool(address)
+            pool["waiting"] = max(pool["waiting"] - 1, 0)
+            pool["in_use"] += 1
+            pool["checkouts"] += 1
+            pool["peak_in_use"] = max(pool["peak_in_use"], pool["in_use"])
+            self.checkout_wait[address].record(duration)
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            pool = self._pool(self._address(event))
+            pool["in_use"] = max(pool["in_use"] - 1, 0)
+
+    def reset_peaks(self):
+        with self._lock:
+            for pool in self.pools.values():
+                pool["peak_open"] = pool["open"]
+                pool["peak_in_use"] = pool["in_use"]
+                pool["peak_waiting"] = pool["waiting"]
+
+    @staticmethod
+    def _sizing_hint(checkouts: int, peak_in_use: int, p99_wait_ms: float, failures: int) -> str:
+        max_pool_size = settings.MONGO_MAX_POOL_SIZE
+        if not checkouts and not failures:
+            return "no traffic yet"
+        if failures or (peak_in_use >= max_pool_size and p99_wait_ms > 5):
+            return "saturated: requests wait for connections; raise MONGO_MAX_POOL_SIZE or lower per-worker concurrency"
+        if max_pool_size and peak_in_use < max_pool_size / 4:
+            return "oversized: peak usage is under a quarter of MONGO_MAX_POOL_SIZE"
+        return "ok"
+
+    def get_stats(self) -> Dict[str, Any]:
+        workers = settings.WEB_CONCURRENCY
+        servers = {}
+        with self._lock:
+            for address, pool in self.pools.items():
+                wait = self.checkout_wait[address].summary()
+                failures = sum(pool["checkout_failures"].values())
+                servers[address] = {
+                    **{key: value for key, value in pool.items() if key != "checkout_failures"},
+                    "checkout_failures": dict(pool["checkout_failures"]),
+                    "wait_avg_ms": round(wait["avg"] * 1000, 3),
+                    "wait_p50_ms": round(wait["p50"] * 1000, 3),
+                    "wait_p99_ms": round(wait["p99"] * 1000, 3),
+                    "wait_max_ms": round(wait["max"] * 1000, 3),
+                    "sizing": self._sizing_hint(pool["checkouts"], pool["peak_in_use"], wait["p99"] * 1000, failures)
+                }
+        return {
+            "config": {
+                **{key: value for key, value in client_options().items() if key != "appname"},
+                "analytics_read_preference": settings.MONGO_ANALYTICS_READ_PREFERENCE,
+                "route_timeouts_ms": settings.MONGO_ROUTE_TIMEOUTS_MS
+            },
+            "workers": workers,
+            # Every worker process has its own pool per server
+            "max_connections_per_server": settings.MONGO_MAX_POOL_SIZE * workers,
+            "servers": servers
+        }
+
+    def render_prometheus(self) -> str:
+        lines = [
+            "# HELP mewayz_mongo_pool_connections Connections per server by state.",
+            "# TYPE mewayz_mongo_pool_connections gauge"
+        ]
+        with self._lock:
+            pools = sorted(self.pools.items())
+            for address, pool in pools:
+                for state in ("open", "in_use", "waiting"):
+                    lines.append(f'mewayz_mongo_pool_connections{{address="{address}",state="{state}"}} {pool[state]}')
+
+            name = "mewayz_mongo_pool_checkout_wait_seconds"
+            lines.extend([
+                f"# HELP {name} Time spent waiting to check a connection out of the pool.",
+                f"# TYPE {name} summary"
+            ])
+            for address, _ in pools:
+                histogram = self.checkout_wait[address]
+                for q in (0.5, 0.99):
+                    lines.append(f'{name}{{address="{address}",quantile="{q}"}} {histogram.quantile(q):.6g}')
+                lines.append(f'{name}_sum{{address="{address}"}} {histogram.total:.6g}')
+                lines.append(f'{name}_count{{address="{address}"}} {histogram.count}')
+
+            lines.extend([
+                "# HELP mewayz_mongo_pool_checkout_failures_total Failed connection checkouts by reason.",
+                "# TYPE mewayz_mongo_pool_checkout_failures_total counter"
+            ])
+            for address, pool in pools:
+                for reason, count in sorted(pool["checkout_failures"].items()):
+                    lines.append(
+                        f'mewayz_mongo_pool_checkout_failures_total{{address="{address}",reason="{reason}"}} {count}'
+                    )
+        return "\n".join(lines) + "\n"
+
+# Global pool monitor instance
+pool_monitor = PoolMonitor()
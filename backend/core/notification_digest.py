@@ -0,0 +1,209 @@
+"""
+Notification Digests
+Coalesces bursts of similar notifications per user into one digest
+notification per window
+"""
+
+import asyncio
+import uuid
+from collections import deque
+from dataclasses import dataclass, field, replace
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+from core.cache import LocalLRUCache
+from core.config import settings
+from core.logging import admin_logger
+from core.mongo_pool import create_background_task
+
+# Types that may be folded into digests; errors, critical and system alerts always go out
+DIGEST_TYPES = {"info", "success", "warning", "marketing"}
+# Priority from which a notification bypasses digests
+URGENT_PRIORITY = 8
+# Most recent notifications a digest lists individually
+DIGEST_SAMPLE_SIZE = 5
+
+PreferencesLoader = Callable[[str], Awaitable[Dict[str, Any]]]
+
+_digesters: List["NotificationDigester"] = []
+
+async def load_notification_preferences(user_id: str) -> Dict[str, Any]:
+    """Preferences as kept by NotificationService (imported here to keep core free of services imports)"""
+    from services.notification_service import NotificationService
+    return (await NotificationService.get_user_preferences(user_id))["preferences"]
+
+@dataclass
+class DigestWindow:
+    """Notifications held back for one (user, group) during one window"""
+    user_id: str
+    group: str
+    seconds: float
+    digest_id: str = field(default_factory=lambda: str(uuid.uuid4()))
+    started_at: datetime = field(default_factory=datetime.utcnow)
+    count: int = 0
+    latest: Any = None
+    priority: int = 1
+    channels: Dict[Any, None] = field(default_factory=dict)
+    samples: Deque[Dict[str, Any]] = field(default_factory=lambda: deque(maxlen=DIGEST_SAMPLE_SIZE))
+    handle: Optional[asyncio.TimerHandle] = None
+
+    def add(self, notification):
+        self.count += 1
+        self.latest = notification
+        self.priority = max(self.priority, notification.priority)
+        self.channels.update(dict.fromkeys(notification.channels))
+        self.samples.append({
+            "title": notification.title,
+            "message": notification.message,
+            "data": notification.data,
+            "action_url": notification.action_url,
+            "created_at": notification.created_at
+        })
+
+    def build_digest(self):
+        """One notification standing for everything held in this window"""
+        if self.count == 1:
+            return replace(self.latest, notification_id=self.digest_id)
+        titles = [sample["title"] for sample in self.samples]
+        message = "; ".join(reversed(titles[-3:]))
+        if self.count > 3:
+            message += f" and {self.count - 3} more"
+        action_urls = {sample["action_url"] for sample in self.samples}
+        return replace(
+            self.latest,
+            notification_id=self.digest_id,
+            title=f"{self.count} new {self.group} notifications",
+            message=message,
+            channels=list(self.channels),
+            priority=self.priority,
+            data={
+                "digest": True,
+                "group": self.group,
+                "count": self.count,
+                "window_started_at": self.started_at.isoformat(),
+                "items": list(self.samples)
+            },
+            created_at=datetime.utcnow(),
+            action_url=action_urls.pop() if len(action_urls) == 1 else None,
+            action_text=self.latest.action_text if len(action_urls) == 1 else None
+        )
+
+class NotificationDigester:
+    """Per-user, per-group coalescing in front of notification delivery
+
+    The first notification for a (user, group) goes out at once and opens a
+    window of the user's digest_window_seconds preference (per-group
+    overrides in digest_windows; 0 turns digests off). Notifications arriving
+    while it is open are held, and when it closes they go out as one digest,
+    which opens the next window. A sustained burst therefore costs one
+    delivery per window instead of one per event. Urgent notifications and
+    error/critical/system types are never held.
+
+    Windows are per worker, so with several workers a user may receive one
+    digest per worker per window. Preferences are cached for
+    NOTIFICATION_DIGEST_PREFERENCES_TTL_SECONDS.
+    """
+
+    def __init__(self, deliver: Callable[[Any], Awaitable[Any]],
+                 preferences_loader: PreferencesLoader = load_notification_preferences):
+        self.deliver = deliver
+        self.preferences_loader = preferences_loader
+        self.windows: Dict[Tuple[str, str], DigestWindow] = {}
+        self.preferences = LocalLRUCache(max_entries=10000, max_bytes=8 * 1024 * 1024)
+        self.stats = {
+            "passed": 0,
+            "coalesced": 0,
+            "digests": 0
+        }
+        _digesters.append(self)
+
+    async def window_seconds(self, user_id: str, group: str) -> float:
+        preferences = self.preferences.get(user_id)
+        if preferences is None:
+            try:
+                preferences = await self.preferences_loader(user_id) or {}
+            except Exception:
+                # e.g. no workspace yet: defaults apply
+                preferences = {}
+            self.preferences.set(user_id, preferences, settings.NOTIFICATION_DIGEST_PREFERENCES_TTL_SECONDS)
+        per_group = preferences.get("digest_windows") or {}
+        seconds = per_group.get(group, preferences.get("digest_window_seconds", settings.NOTIFICATION_DIGEST_WINDOW_SECONDS))
+        return float(seconds or 0)
+
+    async def submit(self, notification, group: Optional[str] = None) -> Optional[str]:
+        """None if the notification should be delivered now; otherwise the id of
+        the digest it was folded into"""
+        notification_type = getattr(notification.type, "value", notification.type)
+        if notification.priority >= URGENT_PRIORITY or notification_type not in DIGEST_TYPES:
+            return None
+        group = group or notification_type
+        key = (notification.user_id, group)
+
+        window = self.windows.get(key)
+        if window is None:
+            seconds = await self.window_seconds(notification.user_id, group)
+            if seconds <= 0:
+                return None
+            window = self.windows.get(key)
+            if window is None:
+                self._open(key, seconds)
+                self.stats["passed"] += 1
+                return None
+
+        window.add(notification)
+        self.stats["coalesced"] += 1
+        return window.digest_id
+
+    def _open(self, key: Tuple[str, str], seconds: float):
+        window = DigestWindow(user_id=key[0], group=key[1], seconds=seconds)
+        window.handle = asyncio.get_running_loop().call_later(seconds, self._close, key)
+        self.windows[key] = window
+
+    def _close(self, key: Tuple[str, str]):
+        window = self.windows.pop(key, None)
+        if window is None or not window.count:
+            return
+        # Events are still arriving: keep coalescing in a fresh window
+        self._open(key, window.seconds)
+        create_background_task(self._emit(window))
+
+    async def _emit(self, window: DigestWindow):
+        try:
+            await self.deliver(window.build_digest())
+            self.stats["digests"] += 1
+        except Exception as e:
+            admin_logger.log_system_event("NOTIFICATION_DIGEST_ERROR", {
+                "user_id": window.user_id,
+                "group": window.group,
+                "count": window.count,
+                "error": str(e)
+            }, "WARNING")
+
+    async def flush(self):
+        """Send every held notification now (shutdown)"""
+        windows, self.windows = list(self.windows.values()), {}
+        for window in windows:
+            window.handle.cancel()
+            if window.count:
+                await self._emit(window)
+
+    def invalidate_preferences(self, user_id: str):
+        """Drop cached preferences so the next notification uses the saved ones"""
+        self.preferences.delete(user_id)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "open_windows": len(self.windows),
+            "held": sum(window.count for window in self.windows.values())
+        }
+
+def invalidate_notification_preferences(user_id: str):
+    """Called when a user saves notification preferences; other workers see them within the cache TTL"""
+    for digester in _digesters:
+        digester.invalidate_preferences(user_id)
+
+async def flush_all_digests():
+    """Deliver held notifications of every digester; called from the application lifespan"""
+    for digester in _digesters:
+        await digester.flush()
@@ -0,0 +1,297 @@
+"""
+Notification Scheduler
+Priority lanes, a timer heap for scheduled delivery and a pool of delivery
+workers; pending jobs are persisted in Mongo so they survive restarts
+"""
+
+import asyncio
+import heapq
+import itertools
+import os
+import socket
+import time
+import uuid
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Set, Tuple
+
+from core.config import settings
+from core.database import get_database
+from core.indexes import index, index_registry
+from core.logging import admin_logger
+from core.mongo_pool import create_background_task
+
+QUEUE_COLLECTION = "notification_queue"
+
+index_registry.register(
+    __name__,
+    index(QUEUE_COLLECTION, "scheduler", "lease_until"),
+    index(QUEUE_COLLECTION, "scheduler", "owner"),
+    index(QUEUE_COLLECTION, "claim", partial_filter={"claim": {"$exists": True}})
+)
+
+# Lanes in the order workers take from them
+LANES = ("urgent", "normal", "low")
+# With both queued, every Nth pick takes from "low" so it is not starved by "normal"
+LOW_LANE_EVERY = 4
+# Jobs due sooner than this are delivered before a persisted copy would matter;
+# they are only written out if still pending at shutdown
+PERSIST_AFTER_SECONDS = 1.0
+
+Handler = Callable[[Dict[str, Any]], Awaitable[Any]]
+StopHook = Callable[[], Awaitable[Any]]
+
+_schedulers: List["NotificationScheduler"] = []
+
+def lane_for_priority(priority: int) -> str:
+    """Lane for a 1-10 notification priority"""
+    if priority >= 8:
+        return "urgent"
+    if priority <= 3:
+        return "low"
+    return "normal"
+
+def to_timestamp(moment: Optional[datetime]) -> float:
+    """Epoch seconds for a datetime (naive values are UTC); now if None"""
+    if moment is None:
+        return time.time()
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.timestamp()
+
+class NotificationScheduler:
+    """Delivers jobs through a pool of workers, most urgent lane first
+
+    Scheduled jobs wait in a heap watched by one timer task that sleeps until
+    the earliest due time, so a future job costs nothing until it is due and
+    never blocks jobs behind it. Due jobs go to their lane and are handed to
+    NOTIFICATION_WORKERS concurrent workers.
+
+    Jobs scheduled at least PERSIST_AFTER_SECONDS ahead are written to
+    notification_queue, owned by this worker under a lease it keeps renewing;
+    on shutdown every undelivered job is written out with its lease expired.
+    Any worker claims jobs whose lease has expired, so they survive restarts
+    and crashed workers. Delivery is at least once: a job finished just before
+    a crash may be delivered again.
+    """
+
+    def __init__(self, name: str, handler: Handler, workers: Optional[int] = None,
+                 on_stop: Optional[StopHook] = None):
+        self.name = name
+        self.handler = handler
+        # Awaited by stop() once the workers are gone, for work the handler left running
+        self.on_stop = on_stop
+        self.worker_count = workers or settings.NOTIFICATION_WORKERS
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.running = False
+        self._scheduled: List[Tuple[float, int, Dict[str, Any]]] = []
+        self._lanes: Dict[str, Deque[Dict[str, Any]]] = {lane: deque() for lane in LANES}
+        self._ready: Optional[asyncio.Semaphore] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._sequence = itertools.count()
+        self._picks = 0
+        self._in_flight: Dict[str, Dict[str, Any]] = {}
+        # Jobs with a notification_queue document owned by this worker
+        self._persisted: Set[str] = set()
+        self._completed: List[str] = []
+        self._tasks: List[asyncio.Task] = []
+        self._start_lock = asyncio.Lock()
+        self.stats = {
+            "submitted": 0,
+            "delivered": 0,
+            "failed": 0,
+            "persisted": 0,
+            "recovered": 0
+        }
+        _schedulers.append(self)
+
+    async def start(self):
+        async with self._start_lock:
+            if self.running:
+                return
+            self._ready = asyncio.Semaphore(0)
+            self._wakeup = asyncio.Event()
+            self.running = True
+            self._tasks = [create_background_task(self._timer()), create_background_task(self._maintain())]
+            self._tasks += [create_background_task(self._work()) for _ in range(self.worker_count)]
+
+    async def submit(self, job_id: str, payload: Dict[str, Any], priority: int = 5,
+                     due_at: Optional[datetime] = None):
+        """Queue a job for delivery now, or at due_at"""
+        if not self.running:
+            await self.start()
+        job = {"_id": job_id, "lane": lane_for_priority(priority), "due_at": to_timestamp(due_at), "payload": payload}
+        if job["due_at"] - time.time() >= PERSIST_AFTER_SECONDS:
+            await get_database()[QUEUE_COLLECTION].insert_one(self._document(job, self.worker_id))
+            self._persisted.add(job_id)
+            self.stats["persisted"] += 1
+        self.stats["submitted"] += 1
+        self._push(job)
+
+    def _document(self, job: Dict[str, Any], owner: Optional[str], lease_until: Optional[datetime] = None) -> Dict[str, Any]:
+        return {
+            **job,
+            "due_at": datetime.utcfromtimestamp(job["due_at"]),
+            "scheduler": self.name,
+            "owner": owner,
+            "lease_until": lease_until or datetime.utcnow() + timedelta(seconds=settings.NOTIFICATION_LEASE_SECONDS)
+        }
+
+    def _push(self, job: Dict[str, Any]):
+        if job["due_at"] <= time.time():
+            self._lanes[job["lane"]].append(job)
+            self._ready.release()
+            return
+        heapq.heappush(self._scheduled, (job["due_at"], next(self._sequence), job))
+        if self._scheduled[0][2] is job:
+            # New earliest job: the timer re-arms for it
+            self._wakeup.set()
+
+    async def _timer(self):
+        while True:
+            now = time.time()
+            while self._scheduled and self._scheduled[0][0] <= now:
+                _, _, job = heapq.heappop(self._scheduled)
+                self._lanes[job["lane"]].append(job)
+                self._ready.release()
+            self._wakeup.clear()
+            delay = self._scheduled[0][0] - now if self._scheduled else None
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+
+    def _take(self) -> Dict[str, Any]:
+        self._picks += 1
+        if self._lanes["urgent"]:
+            return self._lanes["urgent"].popleft()
+        if self._lanes["low"] and (not self._lanes["normal"] or self._picks % LOW_LANE_EVERY == 0):
+            return self._lanes["low"].popleft()
+        return self._lanes["normal"].popleft()
+
+    async def _work(self):
+        while True:
+            await self._ready.acquire()
+            job = self._take()
+            self._in_flight[job["_id"]] = job
+            try:
+                await self.handler(job["payload"])
+                self.stats["delivered"] += 1
+            except Exception as e:
+                self.stats["failed"] += 1
+                admin_logger.log_system_event("NOTIFICATION_DELIVERY_ERROR", {
+                    "scheduler": self.name,
+                    "job_id": job["_id"],
+                    "error": str(e)
+                }, "WARNING")
+            # Not in a finally: a job cancelled mid-delivery stays in flight and is persisted by stop()
+            del self._in_flight[job["_id"]]
+            if job["_id"] in self._persisted:
+                self._persisted.discard(job["_id"])
+                self._completed.append(job["_id"])
+
+    async def _maintain(self):
+        """Delete delivered jobs, renew this worker's lease and claim orphaned jobs"""
+        while True:
+            try:
+                await self._flush_completed()
+                await self._renew_and_recover()
+            except Exception as e:
+                admin_logger.log_system_event("NOTIFICATION_QUEUE_MAINTENANCE_ERROR", {
+                    "scheduler": self.name,
+                    "error": str(e)
+                }, "WARNING")
+            await asyncio.sleep(settings.NOTIFICATION_LEASE_SECONDS / 3)
+
+    async def _flush_completed(self):
+        completed, self._completed = self._completed, []
+        if completed:
+            await get_database()[QUEUE_COLLECTION].delete_many({"_id": {"$in": completed}})
+
+    async def _renew_and_recover(self):
+        collection = get_database()[QUEUE_COLLECTION]
+        now = datetime.utcnow()
+        lease_until = now + timedelta(seconds=settings.NOTIFICATION_LEASE_SECONDS)
+        await collection.update_many(
+            {"scheduler": self.name, "owner": self.worker_id},
+            {"$set": {"lease_until": lease_until}}
+        )
+        # Each document matches only one claimer, since claiming moves its lease forward
+        claim = uuid.uuid4().hex
+        result = await collection.update_many(
+            {"scheduler": self.name, "lease_until": {"$lt": now}},
+            {"$set": {"owner": self.worker_id, "lease_until": lease_until, "claim": claim}}
+        )
+        if not result.modified_count:
+            return
+        async for document in collection.find({"claim": claim}):
+            job = {
+                "_id": document["_id"],
+                "lane": document["lane"],
+                "due_at": to_timestamp(document["due_at"]),
+                "payload": document["payload"]
+            }
+            if job["_id"] in self._persisted or job["_id"] in self._in_flight:
+                continue
+            self._persisted.add(job["_id"])
+            self.stats["recovered"] += 1
+            self._push(job)
+
+    async def stop(self):
+        """Stop delivering; undelivered jobs are persisted for whichever worker starts next"""
+        if not self.running:
+            return
+        self.running = False
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+        pending = list(self._in_flight.values())
+        for lane in self._lanes.values():
+            pending.extend(lane)
+        pending.extend(job for _, _, job in self._scheduled)
+        self._in_flight.clear()
+        self._scheduled = []
+        for lane in self._lanes.values():
+            lane.clear()
+
+        collection = get_database()[QUEUE_COLLECTION]
+        now = datetime.utcnow()
+        try:
+            await self._flush_completed()
+            unsaved = [self._document(job, None, now) for job in pending if job["_id"] not in self._persisted]
+            if unsaved:
+                await collection.insert_many(unsaved, ordered=False)
+            # Hand this worker's jobs over at once instead of after the lease runs out
+            await collection.update_many(
+                {"scheduler": self.name, "owner": self.worker_id},
+                {"$set": {"owner": None, "lease_until": now}}
+            )
+        except Exception as e:
+            admin_logger.log_system_event("NOTIFICATION_QUEUE_PERSIST_ERROR", {
+                "scheduler": self.name,
+                "pending": len(pending),
+                "error": str(e)
+            }, "ERROR")
+        self._persisted.clear()
+        if self.on_stop is not None:
+            await self.on_stop()
+
+    def pending_count(self) -> int:
+        return len(self._scheduled) + sum(len(lane) for lane in self._lanes.values())
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "running": self.running,
+            "workers": self.worker_count,
+            "scheduled": len(self._scheduled),
+            "lanes": {lane: len(jobs) for lane, jobs in self._lanes.items()},
+            "in_flight": len(self._in_flight)
+        }
+
+async def stop_all_schedulers():
+    """Persist undelivered jobs of every scheduler; called from the application lifespan"""
+    for scheduler in _schedulers:
+        await scheduler.stop()
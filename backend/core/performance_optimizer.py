@@ -3,18 +3,38 @@ Performance Optimizer
 Redis caching, connection pooling, and performance monitoring
 """
 import redis
-import asyncio
 import time
 import json
-import gzip
 from typing import Dict, Any, Optional, Union, List
-from datetime import datetime, timedelta
+from datetime import datetime
 from functools import wraps
-import pickle
 import hashlib
+import inspect
 
-from core.database import get_database
+from core.cache import CacheTags, cache_manager
+from core.database import get_analytics_database, get_database
+from core.indexes import index, index_registry
+from core.metrics import LogHistogram
+from core.mongo_pool import pool_monitor
 from core.professional_logger import professional_logger, LogLevel, LogCategory
+from core.query_profiler import query_profiler
+
+# Essential indexes for collections without a dedicated service module
+index_registry.register(
+    __name__,
+    index("users", "email"),
+    index("users", "user_id"),
+    index("users", ("created_at", -1)),
+    index("user_activities", "user_id"),
+    index("user_activities", ("timestamp", -1)),
+    index("social_media_profiles", "user_id"),
+    index("social_media_profiles", "platform"),
+    index("financial_transactions", "user_id"),
+    index("financial_transactions", ("created_at", -1)),
+    index("financial_transactions", "type"),
+    index("email_campaigns", "user_id"),
+    index("email_campaigns", ("created_at", -1))
+)
 
 class RedisCache:
     """Redis caching system with connection pooling"""
@@ -115,49 +135,24 @@ class RedisCache:
             
         except Exception:
             return False
-    
-    async def clear_pattern(self, pattern: str) -> int:
-        """Clear keys matching pattern"""
-        try:
-            if not self.redis_client:
-                return 0
-            
-            keys = self.redis_client.keys(pattern)
-            if keys:
-                return self.redis_client.delete(*keys)
-            return 0
-            
-        except Exception:
-            return 0
 
 class DatabaseConnectionPool:
-    """Database connection pooling and optimization"""
+    """Database handles backed by the Motor client's connection pool
     
-    def __init__(self):
-        self.pool_size = 20
-        self.connections = {}
-        self.active_connections = 0
-        self.connection_stats = {
-            "created": 0,
-            "reused": 0,
-            "closed": 0,
-            "errors": 0
-        }
+    Pool sizing, idle time and compression are client options (core/mongo_pool.py);
+    this picks the handle for a workload and reports the pool listener's stats.
+    """
+    
+    ANALYTICS_CONNECTIONS = {"analytics", "reporting", "bi"}
     
     async def get_connection(self, connection_id: str = "default"):
-        """Get database connection from pool"""
+        """Get the database handle for a workload; analytics reads go to secondaries"""
         try:
-            if connection_id not in self.connections:
-                self.connections[connection_id] = get_database()
-                self.connection_stats["created"] += 1
-                self.active_connections += 1
-            else:
-                self.connection_stats["reused"] += 1
-            
-            return self.connections[connection_id]
+            if connection_id in self.ANALYTICS_CONNECTIONS:
+                return get_analytics_database()
+            return get_database()
             
         except Exception as e:
-            self.connection_stats["errors"] += 1
             await professional_logger.log(
                 LogLevel.ERROR, LogCategory.DATABASE,
                 f"Failed to get database connection: {str(e)}",
@@ -166,44 +161,60 @@ class DatabaseConnectionPool:
             raise
     
     async def release_connection(self, connection_id: str = "default"):
-        """Release database connection"""
-        if connection_id in self.connections:
-            # In production, you might want to actually close idle connections
-            pass
+        """Connections return to the driver's pool after each operation"""
+        pass
     
     def get_stats(self) -> Dict[str, Any]:
         """Get connection pool statistics"""
-        return {
-            "pool_size": self.pool_size,
-            "active_connections": self.active_connections,
-            "stats": self.connection_stats
-        }
+        return pool_monitor.get_stats()
 
 class PerformanceMonitor:
     """Performance monitoring and metrics collection"""
     
     def __init__(self):
-        self.metrics = {}
+        self.metrics: Dict[str, LogHistogram] = {}
+        self.function_stats: Dict[str, Dict[str, float]] = {}
         self.start_time = time.time()
     
+    def record_cache_access(self, function_name: str, outcome: str, latency: float):
+        """Count a cached function call; outcome is hit, miss, coalesced, bypass or uncacheable"""
+        stats = self.function_stats.get(function_name)
+        if stats is None:
+            stats = self.function_stats[function_name] = {
+                "hit": 0, "miss": 0, "coalesced": 0, "bypass": 0, "uncacheable": 0,
+                "hit_time": 0.0, "miss_time": 0.0
+            }
+        stats[outcome] += 1
+        if outcome == "hit":
+            stats["hit_time"] += latency
+        elif outcome == "miss":
+            stats["miss_time"] += latency
+    
+    def get_cache_function_stats(self) -> Dict[str, Any]:
+        """Per-function hit/miss counters and average latencies for cache_result"""
+        summary = {}
+        for function_name, stats in self.function_stats.items():
+            # Coalesced calls found no cached value, they only shared another call's load
+            lookups = stats["hit"] + stats["miss"] + stats["coalesced"]
+            summary[function_name] = {
+                "hits": stats["hit"],
+                "misses": stats["miss"],
+                "coalesced": stats["coalesced"],
+                "bypasses": stats["bypass"],
+                "uncacheable": stats["uncacheable"],
+                "hit_rate": round(stats["hit"] / lookups * 100, 2) if lookups else 0,
+                "avg_hit_ms": round(stats["hit_time"] / stats["hit"] * 1000, 3) if stats["hit"] else 0,
+                "avg_miss_ms": round(stats["miss_time"] / stats["miss"] * 1000, 3) if stats["miss"] else 0
+            }
+        return summary
+    
     async def record_metric(self, metric_name: str, value: Union[int, float], tags: Dict[str, str] = None):
-        """Record performance metric"""
+        """Record performance metric into a fixed-size histogram"""
         try:
-            timestamp = time.time()
-            
-            if metric_name not in self.metrics:
-                self.metrics[metric_name] = []
-            
-            metric = {
-                "timestamp": timestamp,
-                "value": value,
-                "tags": tags or {}
-            }
-            
-            # Keep only last 1000 metrics per type
-            self.metrics[metric_name].append(metric)
-            if len(self.metrics[metric_name]) > 1000:
-                self.metrics[metric_name] = self.metrics[metric_name][-1000:]
+            histogram = self.metrics.get(metric_name)
+            if histogram is None:
+                histogram = self.metrics[metric_name] = LogHistogram()
+            histogram.record(value)
             
         except Exception as e:
             await professional_logger.log(
@@ -216,20 +227,11 @@ class PerformanceMonitor:
         """Get performance metrics summary"""
         summary = {}
         
-        for metric_name, values in self.metrics.items():
-            if not values:
-                continue
-            
-            metric_values = [v["value"] for v in values]
-            
-            summary[metric_name] = {
-                "count": len(metric_values),
-                "avg": sum(metric_values) / len(metric_values),
-                "min": min(metric_values),
-                "max": max(metric_values),
-                "recent": metric_values[-10:] if len(metric_values) >= 10 else metric_values
-            }
+        for metric_name, histogram in self.metrics.items():
+            if histogram.count:
+                summary[metric_name] = histogram.summary()
         
+        summary["cached_functions"] = self.get_cache_function_stats()
         summary["uptime"] = time.time() - self.start_time
         
         return summary
@@ -244,8 +246,8 @@ class QueryOptimizer:
             db = get_database()
             collection = getattr(db, collection_name)
             
-            for index in indexes:
-                await collection.create_index(list(index.items()))
+            for spec in indexes:
+                await collection.create_index(list(spec.items()))
             
             await professional_logger.log(
                 LogLevel.INFO, LogCategory.DATABASE,
@@ -261,61 +263,83 @@ class QueryOptimizer:
             )
     
     @staticmethod
-    async def analyze_slow_queries():
-        """Analyze slow queries for optimization"""
-        try:
-            db = get_database()
-            
-            # Get profiling data (if enabled)
-            profiling_data = await db.command("db.system.profile.find().limit(10)")
-            
-            slow_queries = []
-            for profile in profiling_data.get("cursor", {}).get("firstBatch", []):
-                if profile.get("millis", 0) > 100:  # Queries taking more than 100ms
-                    slow_queries.append({
-                        "ns": profile.get("ns"),
-                        "command": profile.get("command"),
-                        "duration_ms": profile.get("millis"),
-                        "timestamp": profile.get("ts")
-                    })
-            
-            return slow_queries
-            
-        except Exception as e:
-            await professional_logger.log(
-                LogLevel.ERROR, LogCategory.DATABASE,
-                f"Failed to analyze slow queries: {str(e)}",
-                error=e
-            )
-            return []
+    async def analyze_slow_queries(limit: int = 50) -> List[Dict[str, Any]]:
+        """Recent slow operations captured by the command-monitoring profiler"""
+        return query_profiler.get_slow_queries(limit=limit)
+
+def _canonicalize(value: Any) -> Any:
+    """Reduce an argument to a process-independent, JSON-serializable form"""
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, dict):
+        return {str(k): _canonicalize(v) for k, v in sorted(value.items(), key=lambda item: str(item[0]))}
+    if isinstance(value, (list, tuple)):
+        return [_canonicalize(v) for v in value]
+    if isinstance(value, (set, frozenset)):
+        return sorted((_canonicalize(v) for v in value), key=repr)
+    if hasattr(value, "model_dump"):
+        return _canonicalize(value.model_dump())
+    if hasattr(value, "value") and hasattr(type(value), "__members__"):
+        return value.value
+    if type(value).__repr__ is object.__repr__:
+        # Default reprs embed memory addresses and would never match across processes
+        raise TypeError(f"Cannot build a stable cache key from {type(value).__name__}")
+    return str(value)
 
-def cache_result(expiration: int = 3600, key_prefix: str = "cache"):
-    """Decorator for caching function results"""
+def cache_result(expiration: int = 3600, key_prefix: str = "cache", key_args: List[str] = None,
+                 version: int = 1, tags: List[str] = None, stale_seconds: int = 0):
+    """Decorator for caching async function results
+    
+    Keys are built from the function's qualified name, version and the
+    canonicalized values of key_args (default: every argument except
+    self/cls), so they are stable across processes. Bump version when the
+    result shape changes. tags are format strings over the arguments, e.g.
+    "collection:products:user:{user_id}"; results of functions taking a
+    user_id are also tagged CacheTags.user so invalidate_user_cache drops
+    them. Callers may pass cache_ttl=<seconds>
+    or cache_bypass=True per call. Place below @staticmethod/@classmethod.
+    Every call gets its own copy of the cached value, so callers may mutate it.
+    """
     def decorator(func):
+        signature = inspect.signature(func)
+        function_name = f"{func.__module__}.{func.__qualname__}"
+        selected_args = key_args or [
+            name for name in signature.parameters if name not in ("self", "cls")
+        ]
+        
         @wraps(func)
         async def wrapper(*args, **kwargs):
-            # Generate cache key
-            key_data = f"{func.__name__}:{args}:{sorted(kwargs.items())}"
-            cache_key = f"{key_prefix}:{hashlib.md5(key_data.encode()).hexdigest()}"
+            ttl = kwargs.pop("cache_ttl", expiration)
+            bypass = kwargs.pop("cache_bypass", False)
+            start_time = time.perf_counter()
             
-            # Try to get from cache
-            cached_result = await redis_cache.get(cache_key)
-            if cached_result is not None:
-                await performance_monitor.record_metric("cache_hit", 1, {"function": func.__name__})
-                return cached_result
+            if bypass:
+                result = await func(*args, **kwargs)
+                performance_monitor.record_cache_access(function_name, "bypass", time.perf_counter() - start_time)
+                return result
             
-            # Execute function
-            start_time = time.time()
-            result = await func(*args, **kwargs)
-            execution_time = time.time() - start_time
+            try:
+                bound = signature.bind(*args, **kwargs)
+                bound.apply_defaults()
+                key_values = {name: _canonicalize(bound.arguments.get(name)) for name in selected_args}
+                key_data = json.dumps(key_values, sort_keys=True, separators=(",", ":"))
+                entry_tags = [tag.format(**bound.arguments) for tag in tags or []]
+                if bound.arguments.get("user_id") is not None:
+                    entry_tags.append(CacheTags.user(str(bound.arguments["user_id"])))
+            except (TypeError, KeyError):
+                result = await func(*args, **kwargs)
+                performance_monitor.record_cache_access(function_name, "uncacheable", time.perf_counter() - start_time)
+                return result
             
-            # Cache result
-            await redis_cache.set(cache_key, result, expiration)
+            cache_key = f"{key_prefix}:{function_name}:v{version}:{hashlib.sha1(key_data.encode()).hexdigest()}"
             
-            # Record metrics
-            await performance_monitor.record_metric("cache_miss", 1, {"function": func.__name__})
-            await performance_monitor.record_metric("function_execution_time", execution_time, {"function": func.__name__})
+            async def load():
+                return await func(*args, **kwargs)
             
+            result, outcome = await cache_manager.get_or_load_outcome(cache_key, load, ttl, stale_seconds, entry_tags)
+            performance_monitor.record_cache_access(function_name, outcome, time.perf_counter() - start_time)
             return result
         
         return wrapper
@@ -346,7 +370,7 @@ def monitor_performance(metric_name: str = None):
                 
                 return result
                 
-            except Exception as e:
+            except Exception:
                 execution_time = time.time() - start_time
                 
                 await performance_monitor.record_metric(
@@ -371,22 +395,8 @@ async def initialize_performance_optimizations():
         # Initialize Redis cache
         await redis_cache.initialize()
         
-        # Create essential database indexes
-        essential_indexes = [
-            ("users", [{"email": 1}, {"user_id": 1}, {"created_at": -1}]),
-            ("user_sessions", [{"session_id": 1}, {"user_id": 1}, {"expires_at": 1}]),
-            ("user_activities", [{"user_id": 1}, {"timestamp": -1}]),
-            ("social_media_profiles", [{"user_id": 1}, {"platform": 1}]),
-            ("financial_transactions", [{"user_id": 1}, {"created_at": -1}, {"type": 1}]),
-            ("email_campaigns", [{"user_id": 1}, {"created_at": -1}]),
-            ("admin_system_logs", [{"timestamp": -1}, {"level": 1}, {"category": 1}]),
-        ]
-        
-        for collection_name, indexes in essential_indexes:
-            index_specs = []
-            for index in indexes:
-                index_specs.append(index)
-            await query_optimizer.create_indexes(collection_name, index_specs)
+        # Create declared database indexes
+        await index_registry.reconcile()
         
         await professional_logger.log(
             LogLevel.INFO, LogCategory.SYSTEM,
@@ -2,13 +2,20 @@
 Professional Admin Logging System
 Comprehensive logging system with admin visibility, filtering, and real-time monitoring
 """
+import base64
 import logging
+import logging.handlers
 import json
+import queue
 from datetime import datetime, timedelta
 from typing import Dict, Any, Optional, List
 import traceback
 from enum import Enum
+from bson import ObjectId
+from pymongo import DESCENDING
 from core.database import get_database
+from core.indexes import index, index_registry
+from core.write_behind import BatchWriter, RollupBuffer, minute_bucket
 
 class LogLevel(str, Enum):
     DEBUG = "DEBUG"
@@ -30,11 +37,65 @@ class LogCategory(str, Enum):
     ADMIN = "ADMIN"
     SECURITY = "SECURITY"
 
+_FILE_LOG_LEVELS = {
+    LogLevel.DEBUG: logging.DEBUG,
+    LogLevel.INFO: logging.INFO,
+    LogLevel.WARNING: logging.WARNING,
+    LogLevel.ERROR: logging.ERROR,
+    LogLevel.CRITICAL: logging.CRITICAL
+}
+
+# Levels dropped first when the Mongo sink falls behind
+SHEDDABLE_LEVELS = {LogLevel.DEBUG, LogLevel.INFO}
+
+# Retention tiers: each entry carries its own expires_at, removed by a TTL index
+LOG_RETENTION_DAYS = {
+    LogLevel.DEBUG: 1,
+    LogLevel.INFO: 7,
+    LogLevel.WARNING: 30,
+    LogLevel.ERROR: 90,
+    LogLevel.CRITICAL: 180
+}
+
+# Per-minute counters outlive the entries they summarise
+LOG_STATS_RETENTION_DAYS = 400
+
+index_registry.register(
+    __name__,
+    index("admin_system_logs", "expires_at", expire_after_seconds=0),
+    index("admin_system_logs", ("timestamp", DESCENDING), ("_id", DESCENDING)),
+    index("admin_system_logs", "level", ("timestamp", DESCENDING), ("_id", DESCENDING)),
+    index("admin_system_logs", "category", ("timestamp", DESCENDING), ("_id", DESCENDING)),
+    index("admin_system_logs", "user_id", ("timestamp", DESCENDING), ("_id", DESCENDING)),
+    index("admin_log_stats", "minute", "endpoint", unique=True),
+    index("admin_log_stats", "minute", name="minute_ttl", expire_after_seconds=LOG_STATS_RETENTION_DAYS * 86400)
+)
+
 class ProfessionalLogger:
     """Professional logging system with admin dashboard integration"""
     
+    # Log entries buffered for admin_system_logs before anything is shed
+    MAX_PENDING_ENTRIES = 20000
+    # Above this fraction of MAX_PENDING_ENTRIES, DEBUG/INFO entries are shed
+    SHED_LOW_PRIORITY_RATIO = 0.5
+    
     def __init__(self):
         self.db = None
+        self.file_listener = None
+        self.sink = BatchWriter(
+            "admin_system_logs",
+            "admin_system_logs",
+            max_batch=500,
+            flush_interval=1.0,
+            max_pending=self.MAX_PENDING_ENTRIES
+        )
+        self.stats_rollups = RollupBuffer(
+            "admin_log_stats",
+            "admin_log_stats",
+            flush_interval=5.0
+        )
+        self.shed_threshold = int(self.MAX_PENDING_ENTRIES * self.SHED_LOW_PRIORITY_RATIO)
+        self.shed_counts = {level.value: 0 for level in LogLevel}
         self.setup_file_logger()
     
     async def get_database(self):
@@ -44,12 +105,13 @@ class ProfessionalLogger:
         return self.db
     
     def setup_file_logger(self):
-        """Setup file-based logging for backup"""
+        """Setup file-based logging for backup, written from a listener thread"""
         import os
         os.makedirs('/app/logs', exist_ok=True)
         
         self.file_logger = logging.getLogger("mewayz_admin")
         self.file_logger.setLevel(logging.INFO)
+        self.file_logger.propagate = False
         
         if not self.file_logger.handlers:
             # Professional formatter with detailed context
@@ -67,6 +129,26 @@ class ProfessionalLogger:
             error_handler.setLevel(logging.ERROR)
             error_handler.setFormatter(formatter)
             self.file_logger.addHandler(error_handler)
+        
+        # Callers only enqueue the record; file and console I/O for this logger
+        # (including handlers AdminLogger attached) runs on the listener thread
+        handlers = [handler for handler in self.file_logger.handlers
+                    if not isinstance(handler, logging.handlers.QueueHandler)]
+        if handlers:
+            log_queue = queue.SimpleQueue()
+            for handler in handlers:
+                self.file_logger.removeHandler(handler)
+            self.file_logger.addHandler(logging.handlers.QueueHandler(log_queue))
+            self.file_listener = logging.handlers.QueueListener(
+                log_queue, *handlers, respect_handler_level=True
+            )
+            self.file_listener.start()
+    
+    def close(self):
+        """Stop the file listener thread, flushing queued records to disk"""
+        if self.file_listener is not None:
+            self.file_listener.stop()
+            self.file_listener = None
     
     async def log(
         self, 
@@ -84,11 +166,17 @@ class ProfessionalLogger:
         status_code: int = None,
         error: Exception = None
     ):
-        """Comprehensive logging with admin visibility"""
+        """Comprehensive logging with admin visibility
+        
+        Only buffers the entry; admin_system_logs is written in batches by
+        the background sink, and DEBUG/INFO entries are shed when it falls behind.
+        """
         try:
             # Create comprehensive log entry
+            timestamp = datetime.utcnow()
             log_entry = {
-                "timestamp": datetime.utcnow(),
+                "timestamp": timestamp,
+                "expires_at": timestamp + timedelta(days=LOG_RETENTION_DAYS[level]),
                 "level": level.value,
                 "category": category.value,
                 "message": message,
@@ -113,29 +201,47 @@ class ProfessionalLogger:
                 }
                 log_entry["stack_trace"] = traceback.format_exc()
             
-            # Store in database for admin dashboard
-            db = await self.get_database()
-            await db.admin_system_logs.insert_one(log_entry)
+            # Counters are kept even for shed entries so statistics stay exact
+            inc = {
+                "total": 1,
+                f"level.{level.value}": 1,
+                f"category.{category.value}": 1
+            }
+            if response_time is not None:
+                inc["response_time_total"] = response_time
+                inc["response_time_count"] = 1
+            await self.stats_rollups.add(
+                {"minute": minute_bucket(), "endpoint": endpoint},
+                inc=inc,
+                block=False
+            )
             
-            # Also log to file for backup
-            log_message = f"{category.value} | {message}"
-            if details:
-                log_message += f" | Details: {json.dumps(details, default=str)}"
+            # Queue for the admin dashboard collection
+            if level in SHEDDABLE_LEVELS and self.sink.pending() >= self.shed_threshold:
+                self.shed_counts[level.value] += 1
+            elif not await self.sink.add(log_entry, block=False):
+                self.shed_counts[level.value] += 1
             
-            if level == LogLevel.DEBUG:
-                self.file_logger.debug(log_message)
-            elif level == LogLevel.INFO:
-                self.file_logger.info(log_message)
-            elif level == LogLevel.WARNING:
-                self.file_logger.warning(log_message)
-            elif level == LogLevel.ERROR:
-                self.file_logger.error(log_message)
-            elif level == LogLevel.CRITICAL:
-                self.file_logger.critical(log_message)
+            # Also log to file for backup
+            file_level = _FILE_LOG_LEVELS[level]
+            if self.file_logger.isEnabledFor(file_level):
+                log_message = f"{category.value} | {message}"
+                if details:
+                    log_message += f" | Details: {json.dumps(details, default=str)}"
+                self.file_logger.log(file_level, log_message)
             
         except Exception as e:
-            # Fallback to file logging if database fails
-            self.file_logger.error(f"Failed to log to database: {str(e)} | Original message: {message}")
+            # Fallback to file logging if buffering fails
+            self.file_logger.error(f"Failed to queue log entry: {str(e)} | Original message: {message}")
+    
+    def get_pipeline_stats(self) -> Dict[str, Any]:
+        """Backlog and shedding counters of the log sink"""
+        return {
+            **self.sink.get_stats(),
+            "shed_threshold": self.shed_threshold,
+            "shed_by_level": dict(self.shed_counts),
+            "file_queue": self.file_listener is not None
+        }
     
     async def log_api_request(
         self,
@@ -272,6 +378,26 @@ class ProfessionalLogger:
             ip_address=ip_address
         )
     
+    @staticmethod
+    def encode_log_cursor(log: Dict[str, Any]) -> str:
+        """Opaque cursor pointing just past a log entry in (timestamp, _id) order"""
+        raw = f"{log['timestamp'].isoformat()}|{log['_id']}"
+        return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+    
+    @staticmethod
+    def decode_log_cursor(cursor: str) -> Dict[str, Any]:
+        """Query clause selecting entries older than the cursor position"""
+        try:
+            timestamp, object_id = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8").split("|")
+            timestamp = datetime.fromisoformat(timestamp)
+            object_id = ObjectId(object_id)
+        except Exception:
+            raise ValueError("Invalid log cursor")
+        return {"$or": [
+            {"timestamp": {"$lt": timestamp}},
+            {"timestamp": timestamp, "_id": {"$lt": object_id}}
+        ]}
+    
     async def get_admin_logs(
         self,
         level: Optional[LogLevel] = None,
@@ -281,9 +407,13 @@ class ProfessionalLogger:
         search: Optional[str] = None,
         user_id: Optional[str] = None,
         limit: int = 100,
-        offset: int = 0
+        cursor: Optional[str] = None
     ) -> Dict[str, Any]:
-        """Get logs for admin dashboard with filtering"""
+        """Get logs for admin dashboard with filtering, newest first
+        
+        Pages are keyed on (timestamp, _id); pass the returned next_cursor to
+        fetch the following page without skipping over earlier results.
+        """
         try:
             db = await self.get_database()
             
@@ -312,16 +442,18 @@ class ProfessionalLogger:
             if user_id:
                 query["user_id"] = user_id
             
-            # Get total count
-            total_count = await db.admin_system_logs.count_documents(query)
+            if cursor:
+                query = {"$and": [query, self.decode_log_cursor(cursor)]}
             
-            # Get logs
-            cursor = db.admin_system_logs.find(query)\
-                .sort("timestamp", -1)\
-                .skip(offset)\
-                .limit(limit)
+            # One extra entry tells whether another page exists
+            logs = await db.admin_system_logs.find(query)\
+                .sort([("timestamp", DESCENDING), ("_id", DESCENDING)])\
+                .limit(limit + 1)\
+                .to_list(length=limit + 1)
             
-            logs = await cursor.to_list(length=limit)
+            has_more = len(logs) > limit
+            logs = logs[:limit]
+            next_cursor = self.encode_log_cursor(logs[-1]) if has_more else None
             
             # Convert ObjectId to string for JSON serialization
             for log in logs:
@@ -329,12 +461,14 @@ class ProfessionalLogger:
                     log["_id"] = str(log["_id"])
                 if "timestamp" in log:
                     log["timestamp"] = log["timestamp"].isoformat()
+                log.pop("expires_at", None)
             
             return {
                 "success": True,
                 "logs": logs,
-                "total": total_count,
                 "count": len(logs),
+                "next_cursor": next_cursor,
+                "has_more": has_more,
                 "filters_applied": {
                     "level": level.value if level else None,
                     "category": category.value if category else None,
@@ -350,47 +484,47 @@ class ProfessionalLogger:
                 "success": False,
                 "error": f"Failed to retrieve logs: {str(e)}",
                 "logs": [],
-                "total": 0
+                "next_cursor": None,
+                "has_more": False
             }
     
     async def get_log_statistics(self) -> Dict[str, Any]:
-        """Get log statistics for admin dashboard"""
+        """Get log statistics for admin dashboard from the per-minute counters"""
         try:
             db = await self.get_database()
             
-            # Get statistics for the last 24 hours
-            since = datetime.utcnow() - timedelta(days=1)
+            since = minute_bucket() - timedelta(days=1)
             
-            # Aggregate by level
-            level_stats = await db.admin_system_logs.aggregate([
-                {"$match": {"timestamp": {"$gte": since}}},
-                {"$group": {"_id": "$level", "count": {"$sum": 1}}},
-                {"$sort": {"count": -1}}
-            ]).to_list(length=None)
+            # Bounded by minutes x endpoints in the window, not by log volume
+            group = {"_id": None, "total": {"$sum": "$total"}}
+            for log_level in LogLevel:
+                group[f"level_{log_level.value}"] = {"$sum": f"$level.{log_level.value}"}
+            for log_category in LogCategory:
+                group[f"category_{log_category.value}"] = {"$sum": f"$category.{log_category.value}"}
+            totals = await db.admin_log_stats.aggregate([
+                {"$match": {"minute": {"$gte": since}}},
+                {"$group": group}
+            ]).to_list(length=1)
+            totals = totals[0] if totals else {}
             
-            # Aggregate by category
-            category_stats = await db.admin_system_logs.aggregate([
-                {"$match": {"timestamp": {"$gte": since}}},
-                {"$group": {"_id": "$category", "count": {"$sum": 1}}},
-                {"$sort": {"count": -1}}
-            ]).to_list(length=None)
-            
-            # Get error rate
-            total_logs = await db.admin_system_logs.count_documents({"timestamp": {"$gte": since}})
-            error_logs = await db.admin_system_logs.count_documents({
-                "timestamp": {"$gte": since},
-                "level": {"$in": ["ERROR", "CRITICAL"]}
-            })
+            total_logs = totals.get("total") or 0
+            by_level = {log_level.value: totals.get(f"level_{log_level.value}") or 0 for log_level in LogLevel}
+            by_category = {
+                log_category.value: totals.get(f"category_{log_category.value}") or 0
+                for log_category in LogCategory
+            }
+            error_logs = by_level["ERROR"] + by_level["CRITICAL"]
             
             return {
                 "success": True,
                 "statistics": {
                     "total_logs_24h": total_logs,
                     "error_rate": round((error_logs / total_logs * 100) if total_logs > 0 else 0, 2),
-                    "by_level": {stat["_id"]: stat["count"] for stat in level_stats},
-                    "by_category": {stat["_id"]: stat["count"] for stat in category_stats},
+                    "by_level": {name: count for name, count in by_level.items() if count},
+                    "by_category": {name: count for name, count in by_category.items() if count},
                     "time_period": "last_24_hours"
-                }
+                },
+                "pipeline": self.get_pipeline_stats()
             }
             
         except Exception as e:
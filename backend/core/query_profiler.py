@@ -0,0 +1,360 @@
+"""
+Query Profiler
+PyMongo command monitoring for Motor: per-collection/operation latency
+histograms, slow-operation log with explain() plans tagged by FastAPI route,
+and COLLSCAN detection
+"""
+
+import asyncio
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from pymongo import monitoring
+
+from core.config import settings
+from core.logging import admin_logger
+from core.metrics import LogHistogram, current_request_scope, route_template
+from core.mongo_pool import create_background_task
+
+# Driver handshakes, auth and our own explain calls are not worth profiling
+IGNORED_COMMANDS = {
+    "hello", "ismaster", "isMaster", "ping", "buildinfo", "buildInfo",
+    "saslStart", "saslContinue", "authenticate", "getnonce", "endSessions",
+    "killCursors", "explain"
+}
+
+# Commands explain() accepts; the queryPlanner verbosity never executes them
+EXPLAINABLE_COMMANDS = {"find", "aggregate", "count", "distinct", "update", "delete", "findAndModify"}
+
+# Session/transport fields the driver adds that explain rejects or ignores
+_DRIVER_FIELDS = {"lsid", "$db", "$clusterTime", "txnNumber", "$readPreference",
+                  "readConcern", "writeConcern", "autocommit", "startTransaction"}
+
+OperationKey = Tuple[str, str]
+
+def _query_shape(value: Any, depth: int = 0) -> Any:
+    """Replace literal values with '?' so shapes group alike queries and hold no user data"""
+    if depth > 6:
+        return "..."
+    if isinstance(value, dict):
+        return {key: _query_shape(item, depth + 1) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_query_shape(value[0], depth + 1)] if value else []
+    return "?"
+
+def _command_filter(command_name: str, command: Dict[str, Any]) -> Any:
+    if command_name == "find":
+        return command.get("filter", {})
+    if command_name in ("count", "distinct", "findAndModify"):
+        return command.get("query", {})
+    if command_name == "update":
+        return [statement.get("q", {}) for statement in command.get("updates", [])[:1]]
+    if command_name == "delete":
+        return [statement.get("q", {}) for statement in command.get("deletes", [])[:1]]
+    if command_name == "aggregate":
+        return command.get("pipeline", [])
+    return {}
+
+def _plan_stages(plan: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Flatten a winning plan tree into its stages, outermost first"""
+    stages = []
+    pending = [plan]
+    while pending:
+        node = pending.pop(0)
+        if not isinstance(node, dict):
+            continue
+        # Slot-based execution nests the classic plan under queryPlan
+        if "queryPlan" in node and "stage" not in node:
+            pending.append(node["queryPlan"])
+            continue
+        stages.append({
+            "stage": node.get("stage"),
+            "index": node.get("indexName"),
+            "key_pattern": node.get("keyPattern")
+        })
+        if "inputStage" in node:
+            pending.append(node["inputStage"])
+        pending.extend(node.get("inputStages", []))
+    return stages
+
+def _winning_plans(explain: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Winning plans from a find/update/delete explain or every $cursor stage of an aggregate"""
+    plans = []
+    if "queryPlanner" in explain:
+        plans.append(explain["queryPlanner"].get("winningPlan", {}))
+    for stage in explain.get("stages", []):
+        cursor = stage.get("$cursor") if isinstance(stage, dict) else None
+        if cursor and "queryPlanner" in cursor:
+            plans.append(cursor["queryPlanner"].get("winningPlan", {}))
+    for shard in explain.get("shards", {}).values() if isinstance(explain.get("shards"), dict) else []:
+        plans.extend(_winning_plans(shard))
+    return plans
+
+class QueryProfiler(monitoring.CommandListener):
+    """Command listener attached to the Motor client in connect_to_mongo
+
+    Callbacks run on the driver's executor threads; Motor copies the caller's
+    contextvars there, so the active request scope identifies the route.
+    """
+
+    SLOW_LOG_SIZE = 200
+    # Further (collection, operation) pairs are folded into one overflow series
+    MAX_SERIES = 2000
+    OVERFLOW_KEY = ("__other__", "__other__")
+    # Pending started events are dropped past this (e.g. events we never see finish)
+    MAX_PENDING = 10000
+    EXPLAIN_COOLDOWN_SECONDS = 300
+    MAX_CONCURRENT_EXPLAINS = 2
+
+    def __init__(self, slow_threshold_ms: float = 100, explain_enabled: bool = True):
+        self.slow_threshold_ms = slow_threshold_ms
+        self.explain_enabled = explain_enabled
+        self.series: Dict[OperationKey, LogHistogram] = {}
+        self.failures: Dict[OperationKey, int] = {}
+        self.collscans: Dict[OperationKey, int] = {}
+        self.slow_queries: Deque[Dict[str, Any]] = deque(maxlen=self.SLOW_LOG_SIZE)
+        self._pending: Dict[Tuple[Any, int], Tuple[str, str, Dict[str, Any], Optional[Dict[str, Any]]]] = {}
+        self._lock = threading.Lock()
+        self._client = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._explained_at: Dict[str, float] = {}
+        self._plans: Dict[str, Dict[str, Any]] = {}
+        self._explains_running = 0
+
+    def bind(self, client, loop: asyncio.AbstractEventLoop):
+        """Give the profiler a client and loop to run explain() on"""
+        self._client = client
+        self._loop = loop
+
+    # CommandListener callbacks
+
+    def started(self, event: monitoring.CommandStartedEvent):
+        if event.command_name in IGNORED_COMMANDS:
+            return
+        command = event.command
+        if event.command_name == "getMore":
+            collection = command.get("collection", "__unknown__")
+        else:
+            target = command.get(event.command_name)
+            collection = target if isinstance(target, str) else "__database__"
+        scope = current_request_scope.get()
+        with self._lock:
+            if len(self._pending) < self.MAX_PENDING:
+                self._pending[(event.connection_id, event.request_id)] = (
+                    collection, event.database_name, command, scope
+                )
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent):
+        self._finish(event, failed=False)
+
+    def failed(self, event: monitoring.CommandFailedEvent):
+        self._finish(event, failed=True)
+
+    def _finish(self, event, failed: bool):
+        with self._lock:
+            pending = self._pending.pop((event.connection_id, event.request_id), None)
+        if pending is None:
+            return
+        collection, database_name, command, scope = pending
+        duration_ms = event.duration_micros / 1000
+        key = (collection, event.command_name)
+        try:
+            with self._lock:
+                histogram = self.series.get(key)
+                if histogram is None:
+                    if len(self.series) >= self.MAX_SERIES:
+                        key = self.OVERFLOW_KEY
+                        histogram = self.series.get(key)
+                    if histogram is None:
+                        histogram = self.series[key] = LogHistogram()
+                histogram.record(duration_ms / 1000)
+                if failed:
+                    self.failures[key] = self.failures.get(key, 0) + 1
+
+            if duration_ms >= self.slow_threshold_ms:
+                self._record_slow(collection, database_name, event.command_name, command,
+                                  scope, duration_ms, failed)
+        except Exception as e:
+            admin_logger.log_system_event("QUERY_PROFILER_ERROR", {
+                "collection": collection,
+                "operation": event.command_name,
+                "error": str(e)
+            }, "WARNING")
+
+    # Slow operations
+
+    @staticmethod
+    def _route_of(scope: Optional[Dict[str, Any]]) -> Tuple[Optional[str], Optional[str]]:
+        if not scope:
+            return None, None
+        return scope.get("method"), route_template(scope) or scope.get("path")
+
+    def _record_slow(self, collection: str, database_name: str, operation: str,
+                     command: Dict[str, Any], scope, duration_ms: float, failed: bool):
+        method, route = self._route_of(scope)
+        shape = _query_shape(_command_filter(operation, command))
+        entry = {
+            "timestamp": datetime.utcnow().isoformat(),
+            "collection": collection,
+            "operation": operation,
+            "duration_ms": round(duration_ms, 3),
+            "failed": failed,
+            "method": method,
+            "route": route,
+            "shape": shape,
+            "plan": None
+        }
+        self.slow_queries.append(entry)
+
+        if self.explain_enabled and not failed and operation in EXPLAINABLE_COMMANDS:
+            self._schedule_explain(entry, database_name, command)
+
+    def _schedule_explain(self, entry: Dict[str, Any], database_name: str, command: Dict[str, Any]):
+        if self._client is None or self._loop is None or self._loop.is_closed():
+            return
+        # Explain each query shape once per cooldown and reuse that plan meanwhile;
+        # the plan rarely changes between calls
+        signature = f"{entry['collection']}|{entry['operation']}|{entry['shape']}"
+        now = time.monotonic()
+        with self._lock:
+            if now - self._explained_at.get(signature, -self.EXPLAIN_COOLDOWN_SECONDS) < self.EXPLAIN_COOLDOWN_SECONDS:
+                plan = self._plans.get(signature)
+                if plan is not None:
+                    self._apply_plan(entry, plan)
+                return
+            if self._explains_running >= self.MAX_CONCURRENT_EXPLAINS:
+                return
+            if len(self._explained_at) > self.SLOW_LOG_SIZE * 10:
+                self._explained_at.clear()
+                self._plans.clear()
+            self._explained_at[signature] = now
+            self._explains_running += 1
+
+        explain_command = {field: value for field, value in command.items() if field not in _DRIVER_FIELDS}
+
+        def start():
+            create_background_task(self._explain(entry, signature, database_name, explain_command))
+
+        try:
+            self._loop.call_soon_threadsafe(start)
+        except RuntimeError:
+            with self._lock:
+                self._explains_running -= 1
+
+    def _apply_plan(self, entry: Dict[str, Any], plan: Dict[str, Any]):
+        """Attach a plan to a slow-log entry; caller holds the lock"""
+        entry["plan"] = plan
+        if plan.get("collscan"):
+            key = (entry["collection"], entry["operation"])
+            self.collscans[key] = self.collscans.get(key, 0) + 1
+
+    async def _explain(self, entry: Dict[str, Any], signature: str, database_name: str,
+                       command: Dict[str, Any]):
+        try:
+            explain = await self._client[database_name].command(
+                {"explain": command, "verbosity": "queryPlanner"}
+            )
+            stages = [stage for plan in _winning_plans(explain) for stage in _plan_stages(plan)]
+            plan = {
+                "stages": stages,
+                "indexes": sorted({stage["index"] for stage in stages if stage["index"]}),
+                "collscan": any(stage["stage"] == "COLLSCAN" for stage in stages)
+            }
+            with self._lock:
+                self._plans[signature] = plan
+                self._apply_plan(entry, plan)
+            if plan["collscan"]:
+                admin_logger.log_system_event("SLOW_QUERY_COLLSCAN", {
+                    "collection": entry["collection"],
+                    "operation": entry["operation"],
+                    "duration_ms": entry["duration_ms"],
+                    "route": entry["route"],
+                    "shape": entry["shape"]
+                }, "WARNING")
+        except Exception as e:
+            entry["plan"] = {"error": str(e)}
+        finally:
+            with self._lock:
+                self._explains_running -= 1
+
+    # Reporting
+
+    def get_operation_stats(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Per collection/operation latency in milliseconds, slowest p95 first"""
+        rows = []
+        with self._lock:
+            series = list(self.series.items())
+        for (collection, operation), histogram in series:
+            stats = histogram.summary()
+            rows.append({
+                "collection": collection,
+                "operation": operation,
+                "count": stats["count"],
+                "failures": self.failures.get((collection, operation), 0),
+                "collscans": self.collscans.get((collection, operation), 0),
+                "avg_ms": round(stats["avg"] * 1000, 3),
+                "p50_ms": round(stats["p50"] * 1000, 3),
+                "p95_ms": round(stats["p95"] * 1000, 3),
+                "p99_ms": round(stats["p99"] * 1000, 3),
+                "max_ms": round(stats["max"] * 1000, 3)
+            })
+        rows.sort(key=lambda row: row["p95_ms"], reverse=True)
+        return rows[:limit] if limit else rows
+
+    def get_slow_queries(self, limit: int = 50, collection: Optional[str] = None,
+                         collscan_only: bool = False) -> List[Dict[str, Any]]:
+        """Most recent slow operations first"""
+        entries = []
+        for entry in reversed(list(self.slow_queries)):
+            if collection and entry["collection"] != collection:
+                continue
+            if collscan_only and not (entry["plan"] or {}).get("collscan"):
+                continue
+            entries.append(entry)
+            if len(entries) >= limit:
+                break
+        return entries
+
+    def get_report(self, limit: int = 50, collection: Optional[str] = None,
+                   collscan_only: bool = False) -> Dict[str, Any]:
+        return {
+            "slow_threshold_ms": self.slow_threshold_ms,
+            "explain_enabled": self.explain_enabled,
+            "operations": self.get_operation_stats(limit),
+            "slow_queries": self.get_slow_queries(limit, collection, collscan_only),
+            "collscans": [
+                {"collection": collection_name, "operation": operation, "count": count}
+                for (collection_name, operation), count in sorted(self.collscans.items(), key=lambda item: -item[1])
+            ]
+        }
+
+    def render_prometheus(self) -> str:
+        name = "mewayz_mongo_command_duration_seconds"
+        lines = [
+            f"# HELP {name} MongoDB command latency by collection and operation.",
+            f"# TYPE {name} summary"
+        ]
+        with self._lock:
+            series = sorted(self.series.items())
+        for (collection, operation), histogram in series:
+            labels = f'collection="{collection}",operation="{operation}"'
+            for q in (0.5, 0.95, 0.99):
+                lines.append(f'{name}{{{labels},quantile="{q}"}} {histogram.quantile(q):.6g}')
+            lines.append(f"{name}_sum{{{labels}}} {histogram.total:.6g}")
+            lines.append(f"{name}_count{{{labels}}} {histogram.count}")
+        lines.extend([
+            "# HELP mewayz_mongo_collscans_total Slow operations whose plan was a collection scan.",
+            "# TYPE mewayz_mongo_collscans_total counter"
+        ])
+        for (collection, operation), count in sorted(self.collscans.items()):
+            lines.append(f'mewayz_mongo_collscans_total{{collection="{collection}",operation="{operation}"}} {count}')
+        return "\n".join(lines) + "\n"
+
+# Global query profiler instance
+query_profiler = QueryProfiler(
+    slow_threshold_ms=settings.SLOW_QUERY_THRESHOLD_MS,
+    explain_enabled=settings.QUERY_EXPLAIN_ENABLED
+)
@@ -0,0 +1,337 @@
+"""
+Rate Limiter
+GCRA rate limiting shared across workers through Redis, with an in-process
+token bucket fallback and ASGI middleware emitting X-RateLimit-* headers
+"""
+
+import json
+import math
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from core.cache import cache_manager
+from core.logging import admin_logger
+
+# Checks every rule first and only advances the theoretical arrival times
+# (TAT) when all of them allow the request, so a request rejected by the
+# daily limit does not consume minute quota. Uses the Redis clock so all
+# workers agree on "now".
+GCRA_SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local consume = tonumber(ARGV[1])
+local allowed = 1
+local results = {}
+local tats = {}
+for i = 1, #KEYS do
+    local limit = tonumber(ARGV[i * 2])
+    local period = tonumber(ARGV[i * 2 + 1])
+    local emission = period / limit
+    local tat = tonumber(redis.call('GET', KEYS[i])) or now
+    if tat < now then tat = now end
+    local new_tat = tat + emission
+    local diff = now - (new_tat - period)
+    local rule_allowed = 1
+    local retry_after = 0
+    if diff < 0 then
+        rule_allowed = 0
+        allowed = 0
+        retry_after = -diff
+    end
+    tats[i] = new_tat
+    results[#results + 1] = rule_allowed
+    results[#results + 1] = math.max(0, math.floor(diff / emission))
+    results[#results + 1] = math.ceil(retry_after)
+    results[#results + 1] = math.ceil(new_tat - now)
+end
+if allowed == 1 and consume == 1 then
+    for i = 1, #KEYS do
+        redis.call('SET', KEYS[i], tats[i], 'PX', math.ceil(tats[i] - now))
+    end
+end
+return results
+"""
+
+@dataclass
+class RateLimitRule:
+    scope: str
+    limit: int
+    period_seconds: int
+
+@dataclass
+class RuleResult:
+    rule: RateLimitRule
+    allowed: bool
+    remaining: int
+    retry_after_ms: int
+    reset_after_ms: int
+
+@dataclass
+class RateLimitDecision:
+    allowed: bool
+    results: List[RuleResult]
+    backend: str
+
+    @property
+    def most_restrictive(self) -> RuleResult:
+        blocking = [result for result in self.results if not result.allowed]
+        if blocking:
+            return max(blocking, key=lambda result: result.retry_after_ms)
+        return min(self.results, key=lambda result: result.remaining / result.rule.limit)
+
+    @property
+    def retry_after_seconds(self) -> int:
+        return max(1, math.ceil(self.most_restrictive.retry_after_ms / 1000))
+
+    def headers(self) -> Dict[str, str]:
+        result = self.most_restrictive
+        headers = {
+            "X-RateLimit-Limit": str(result.rule.limit),
+            "X-RateLimit-Remaining": str(result.remaining),
+            "X-RateLimit-Reset": str(int(time.time() + result.reset_after_ms / 1000)),
+            "X-RateLimit-Scope": result.rule.scope
+        }
+        if not self.allowed:
+            headers["Retry-After"] = str(self.retry_after_seconds)
+        return headers
+
+class LocalTokenBuckets:
+    """In-process GCRA (equivalent to a token bucket) used while Redis is unavailable"""
+
+    def __init__(self, max_keys: int = 100000):
+        self.max_keys = max_keys
+        self._tats: Dict[str, float] = {}
+
+    def check(self, keys: List[str], rules: List[RateLimitRule], consume: bool = True) -> List[RuleResult]:
+        now = time.monotonic() * 1000
+        results = []
+        new_tats = []
+        for key, rule in zip(keys, rules):
+            period = rule.period_seconds * 1000
+            emission = period / rule.limit
+            tat = max(self._tats.get(key, now), now)
+            new_tat = tat + emission
+            diff = now - (new_tat - period)
+            new_tats.append(new_tat)
+            results.append(RuleResult(
+                rule=rule,
+                allowed=diff >= 0,
+                remaining=max(0, math.floor(diff / emission)),
+                retry_after_ms=math.ceil(-diff) if diff < 0 else 0,
+                reset_after_ms=math.ceil(new_tat - now)
+            ))
+
+        if consume and all(result.allowed for result in results):
+            if len(self._tats) >= self.max_keys:
+                self._prune(now)
+            for key, new_tat in zip(keys, new_tats):
+                self._tats[key] = new_tat
+        return results
+
+    def reset(self, prefix: str) -> int:
+        keys = [key for key in self._tats if key.startswith(prefix)]
+        for key in keys:
+            del self._tats[key]
+        return len(keys)
+
+    def _prune(self, now: float):
+        """Drop buckets that have fully drained, then the oldest if still full"""
+        for key in [key for key, tat in self._tats.items() if tat <= now]:
+            del self._tats[key]
+        while len(self._tats) >= self.max_keys:
+            del self._tats[next(iter(self._tats))]
+
+class RateLimiter:
+    """Atomic multi-rule GCRA limiter backed by Redis with local fallback"""
+
+    # After a Redis failure, stay on local buckets this long before retrying
+    REDIS_RETRY_SECONDS = 5.0
+
+    def __init__(self):
+        self.local_buckets = LocalTokenBuckets()
+        self._script = None
+        self._script_client = None
+        self._redis_retry_at = 0.0
+        self.stats = {
+            "allowed": 0,
+            "throttled": 0,
+            "redis_checks": 0,
+            "local_checks": 0,
+            "redis_errors": 0
+        }
+
+    @staticmethod
+    def _key(identity: str, rule: RateLimitRule) -> str:
+        return f"mewayz:rl:{identity}:{rule.scope}:{rule.period_seconds}"
+
+    def _get_script(self):
+        client = cache_manager.redis_client
+        if client is None or time.monotonic() < self._redis_retry_at:
+            return None
+        if self._script is None or self._script_client is not client:
+            self._script = client.register_script(GCRA_SCRIPT)
+            self._script_client = client
+        return self._script
+
+    async def check(self, identity: str, rules: List[RateLimitRule], consume: bool = True) -> RateLimitDecision:
+        """Check (and by default consume) one request against every rule"""
+        keys = [self._key(identity, rule) for rule in rules]
+        script = self._get_script()
+        results = None
+        backend = "local"
+
+        if script is not None:
+            try:
+                args = [1 if consume else 0]
+                for rule in rules:
+                    args.extend([rule.limit, rule.period_seconds * 1000])
+                raw = await script(keys=keys, args=args)
+                results = [
+                    RuleResult(
+                        rule=rule,
+                        allowed=bool(int(raw[i * 4])),
+                        remaining=int(raw[i * 4 + 1]),
+                        retry_after_ms=int(raw[i * 4 + 2]),
+                        reset_after_ms=int(raw[i * 4 + 3])
+                    )
+                    for i, rule in enumerate(rules)
+                ]
+                backend = "redis"
+                self.stats["redis_checks"] += 1
+            except Exception as e:
+                self.stats["redis_errors"] += 1
+                self._redis_retry_at = time.monotonic() + self.REDIS_RETRY_SECONDS
+                admin_logger.log_system_event("RATE_LIMIT_REDIS_ERROR", {
+                    "error": str(e)
+                }, "WARNING")
+
+        if results is None:
+            results = self.local_buckets.check(keys, rules, consume)
+            self.stats["local_checks"] += 1
+
+        decision = RateLimitDecision(
+            allowed=all(result.allowed for result in results),
+            results=results,
+            backend=backend
+        )
+        if consume:
+            self.stats["allowed" if decision.allowed else "throttled"] += 1
+        return decision
+
+    async def reset(self, identity: str) -> int:
+        """Clear all counters for an identity"""
+        prefix = f"mewayz:rl:{identity}:"
+        cleared = self.local_buckets.reset(prefix)
+        client = cache_manager.redis_client
+        if client is not None:
+            try:
+                keys = [key async for key in client.scan_iter(match=f"{prefix}*", count=100)]
+                if keys:
+                    cleared += await client.delete(*keys)
+            except Exception as e:
+                admin_logger.log_system_event("RATE_LIMIT_RESET_ERROR", {
+                    "identity": identity,
+                    "error": str(e)
+                }, "WARNING")
+        return cleared
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "local_buckets": len(self.local_buckets._tats),
+            "backend": "redis" if self._get_script() is not None else "local"
+        }
+
+# Resolves (identity, rules) for a request; returning None skips limiting
+RulesResolver = Callable[[Dict[str, Any]], Awaitable[Optional[Tuple[str, List[RateLimitRule]]]]]
+
+# Called after the response with (scope, identity, status_code, response_time_ms)
+UsageRecorder = Callable[[Dict[str, Any], str, int, float], Awaitable[Any]]
+
+class RateLimitMiddleware:
+    """Pure ASGI middleware enforcing rate limits and adding X-RateLimit-* headers"""
+
+    EXEMPT_PATHS = {"/", "/health", "/healthz", "/ready", "/api/health", "/metrics", "/docs", "/redoc", "/openapi.json"}
+
+    def __init__(self, app, resolver: RulesResolver, limiter: Optional[RateLimiter] = None,
+                 recorder: Optional[UsageRecorder] = None):
+        self.app = app
+        self.resolver = resolver
+        self.limiter = limiter or rate_limiter
+        self.recorder = recorder
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.EXEMPT_PATHS or scope["method"] == "OPTIONS":
+            await self.app(scope, receive, send)
+            return
+
+        start_time = time.perf_counter()
+        resolved = None
+        try:
+            resolved = await self.resolver(scope)
+            decision = await self.limiter.check(*resolved) if resolved else None
+        except Exception as e:
+            # Never fail a request because the limiter is broken
+            admin_logger.log_system_event("RATE_LIMIT_CHECK_ERROR", {
+                "path": scope["path"],
+                "error": str(e)
+            }, "WARNING")
+            decision = None
+
+        if decision is None:
+            await self.app(scope, receive, send)
+            return
+
+        rate_headers = [(name.lower().encode("latin-1"), value.encode("latin-1"))
+                        for name, value in decision.headers().items()]
+
+        if not decision.allowed:
+            body = json.dumps({
+                "success": False,
+                "error": "HTTP 429",
+                "message": "Rate limit exceeded. Please retry later.",
+                "retry_after": decision.retry_after_seconds,
+                "timestamp": datetime.utcnow().isoformat()
+            }).encode("utf-8")
+            await send({
+                "type": "http.response.start",
+                "status": 429,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode("latin-1")),
+                    *rate_headers
+                ]
+            })
+            await send({"type": "http.response.body", "body": body})
+            await self._record(scope, resolved[0], 429, start_time)
+            return
+
+        status_code = 500
+
+        async def send_with_headers(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                message = {**message, "headers": [*message.get("headers", []), *rate_headers]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_headers)
+        finally:
+            await self._record(scope, resolved[0], status_code, start_time)
+
+    async def _record(self, scope, identity: str, status_code: int, start_time: float):
+        if self.recorder is None:
+            return
+        try:
+            await self.recorder(scope, identity, status_code, (time.perf_counter() - start_time) * 1000)
+        except Exception as e:
+            admin_logger.log_system_event("RATE_LIMIT_RECORD_ERROR", {
+                "path": scope["path"],
+                "error": str(e)
+            }, "WARNING")
+
+# Global rate limiter instance
+rate_limiter = RateLimiter()
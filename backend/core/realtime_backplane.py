@@ -0,0 +1,402 @@
+"""
+Realtime Backplane
+Routes serialized WebSocket frames between workers so a user's sockets are
+reachable from any process: Redis pub/sub in production, an in-process hub
+standing in for Redis in tests
+"""
+
+import asyncio
+import os
+import socket
+import time
+import uuid
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from core.cache import cache_manager
+from core.config import settings
+from core.logging import admin_logger
+from core.mongo_pool import create_background_task
+
+# Called with (user_id, coalesce_key, frame) for frames from other workers;
+# user_id is None for broadcasts
+DeliverCallback = Callable[[Optional[str], Optional[str], str], None]
+
+_backplanes: List["Backplane"] = []
+
+def user_channel(namespace: str, user_id: str) -> str:
+    return f"mewayz:ws:{namespace}:user:{user_id}"
+
+def broadcast_channel(namespace: str) -> str:
+    return f"mewayz:ws:{namespace}:all"
+
+class Backplane:
+    """Single-process backplane: nothing to route, presence is this worker's own
+
+    A WebSocketConnectionManager delivers to its own sockets itself and hands
+    every frame to its backplane for the other workers. Namespaces keep
+    separate managers apart.
+    """
+
+    def __init__(self, namespace: str):
+        self.namespace = namespace
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        # user_id -> sockets open in this worker
+        self.local_counts: Dict[str, int] = {}
+        self._deliver: Optional[DeliverCallback] = None
+        _backplanes.append(self)
+
+    async def start(self, deliver: DeliverCallback):
+        self._deliver = deliver
+
+    async def close(self):
+        pass
+
+    def publish(self, user_id: Optional[str], frame: str, coalesce_key: Optional[str] = None):
+        """Send a frame to a user's sockets in other workers (all sockets if user_id is None)"""
+
+    def set_local_connections(self, user_id: str, count: int):
+        """Report how many sockets a user has open in this worker"""
+        if count > 0:
+            self.local_counts[user_id] = count
+        else:
+            self.local_counts.pop(user_id, None)
+
+    async def get_presence(self, user_id: str) -> int:
+        """Sockets a user has open across all workers"""
+        return self.local_counts.get(user_id, 0)
+
+    async def get_total_connections(self) -> int:
+        return sum(self.local_counts.values())
+
+    def get_stats(self) -> Dict[str, object]:
+        return {
+            "backend": "local",
+            "namespace": self.namespace,
+            "worker_id": self.worker_id
+        }
+
+class _PeerBackplane(Backplane, ABC):
+    """Backplane with peers: publishes, subscription and presence changes are
+    buffered and sent in one batch every REALTIME_BACKPLANE_FLUSH_MS
+
+    Frames travel as "<origin worker>\\n<coalesce key>\\n<frame>"; a worker
+    ignores its own frames since it has already delivered them locally. A
+    worker only subscribes to users with sockets open in it, so a frame
+    reaches just the workers that can deliver it.
+    """
+
+    backend = "peer"
+
+    def __init__(self, namespace: str):
+        super().__init__(namespace)
+        self._outbox: List[Tuple[Optional[str], str]] = []
+        self._subscribe: Set[str] = set()
+        self._unsubscribe: Set[str] = set()
+        self._presence_dirty: Set[str] = set()
+        self._flusher: Optional[asyncio.Task] = None
+        self.stats = {
+            "published": 0,
+            "received": 0,
+            "batches": 0,
+            "dropped": 0
+        }
+
+    def publish(self, user_id: Optional[str], frame: str, coalesce_key: Optional[str] = None):
+        self._outbox.append((user_id, f"{self.worker_id}\n{coalesce_key or ''}\n{frame}"))
+        self._schedule_flush()
+
+    def set_local_connections(self, user_id: str, count: int):
+        was_present = user_id in self.local_counts
+        super().set_local_connections(user_id, count)
+        if count > 0 and not was_present:
+            self._unsubscribe.discard(user_id)
+            self._subscribe.add(user_id)
+        elif count <= 0 and was_present:
+            self._subscribe.discard(user_id)
+            self._unsubscribe.add(user_id)
+        self._presence_dirty.add(user_id)
+        self._schedule_flush()
+
+    def _schedule_flush(self):
+        if self._flusher is None or self._flusher.done():
+            self._flusher = create_background_task(self._flush_soon())
+
+    async def _flush_soon(self):
+        await asyncio.sleep(settings.REALTIME_BACKPLANE_FLUSH_MS / 1000)
+        await self.flush()
+
+    async def flush(self):
+        outbox, self._outbox = self._outbox, []
+        subscribe, self._subscribe = self._subscribe, set()
+        unsubscribe, self._unsubscribe = self._unsubscribe, set()
+        presence = {user_id: self.local_counts.get(user_id, 0) for user_id in self._presence_dirty}
+        self._presence_dirty = set()
+        if not (outbox or subscribe or unsubscribe or presence):
+            return
+        try:
+            await self._send_batch(outbox, subscribe, unsubscribe, presence)
+            self.stats["published"] += len(outbox)
+            self.stats["batches"] += 1
+        except Exception as e:
+            # Frames are dropped (realtime delivery is best effort); state changes are retried
+            self.stats["dropped"] += len(outbox)
+            self._subscribe |= {user_id for user_id in subscribe if user_id in self.local_counts}
+            self._unsubscribe |= {user_id for user_id in unsubscribe if user_id not in self.local_counts}
+            self._presence_dirty |= set(presence)
+            admin_logger.log_system_event("REALTIME_BACKPLANE_FLUSH_ERROR", {
+                "namespace": self.namespace,
+                "error": str(e)
+            }, "WARNING")
+
+    @abstractmethod
+    async def _send_batch(self, outbox: List[Tuple[Optional[str], str]], subscribe: Set[str],
+                          unsubscribe: Set[str], presence: Dict[str, int]):
+        """Send one batch of publishes, subscription changes and presence counts to peers"""
+
+    def _receive(self, user_id: Optional[str], payload: str):
+        origin, coalesce_key, frame = payload.split("\n", 2)
+        if origin == self.worker_id or self._deliver is None:
+            return
+        self.stats["received"] += 1
+        self._deliver(user_id, coalesce_key or None, frame)
+
+    async def close(self):
+        if self._flusher is not None:
+            self._flusher.cancel()
+        self._outbox = []
+
+    def get_stats(self) -> Dict[str, object]:
+        return {
+            **super().get_stats(),
+            **self.stats,
+            "backend": self.backend,
+            "subscribed_users": len(self.local_counts),
+            "pending": len(self._outbox)
+        }
+
+class InProcessHub:
+    """Channels and presence shared by InProcessBackplanes, standing in for Redis"""
+
+    def __init__(self):
+        self.subscribers: Dict[str, Set["InProcessBackplane"]] = {}
+        self.presence: Dict[str, Dict[str, int]] = {}
+
+class InProcessBackplane(_PeerBackplane):
+    """Backplane whose peers are other instances on the same hub (tests, single host)"""
+
+    backend = "in_process"
+
+    def __init__(self, namespace: str, hub: InProcessHub):
+        super().__init__(namespace)
+        self.hub = hub
+
+    async def start(self, deliver: DeliverCallback):
+        await super().start(deliver)
+        self.hub.subscribers.setdefault(broadcast_channel(self.namespace), set()).add(self)
+        self.hub.presence[self.worker_id] = {}
+
+    async def _send_batch(self, outbox, subscribe, unsubscribe, presence):
+        for user_id in subscribe:
+            self.hub.subscribers.setdefault(user_channel(self.namespace, user_id), set()).add(self)
+        for user_id in unsubscribe:
+            self.hub.subscribers.get(user_channel(self.namespace, user_id), set()).discard(self)
+        counts = self.hub.presence.setdefault(self.worker_id, {})
+        for user_id, count in presence.items():
+            if count > 0:
+                counts[user_id] = count
+            else:
+                counts.pop(user_id, None)
+        for user_id, payload in outbox:
+            channel = broadcast_channel(self.namespace) if user_id is None else user_channel(self.namespace, user_id)
+            for peer in list(self.hub.subscribers.get(channel, ())):
+                peer._receive(user_id, payload)
+
+    async def get_presence(self, user_id: str) -> int:
+        others = sum(counts.get(user_id, 0) for worker_id, counts in self.hub.presence.items()
+                     if worker_id != self.worker_id)
+        return others + self.local_counts.get(user_id, 0)
+
+    async def get_total_connections(self) -> int:
+        others = sum(sum(counts.values()) for worker_id, counts in self.hub.presence.items()
+                     if worker_id != self.worker_id)
+        return others + sum(self.local_counts.values())
+
+    async def close(self):
+        await super().close()
+        for subscribers in self.hub.subscribers.values():
+            subscribers.discard(self)
+        self.hub.presence.pop(self.worker_id, None)
+
+class RedisBackplane(_PeerBackplane):
+    """Redis pub/sub backplane
+
+    Each batch goes out as one pipeline (PUBLISHes plus presence updates);
+    subscription changes are one SUBSCRIBE/UNSUBSCRIBE on the listener
+    connection. Presence lives in a hash per worker that expires unless the
+    worker refreshes it, so counts of a crashed worker disappear within
+    REALTIME_PRESENCE_TTL_SECONDS. A frame published in the flush interval
+    before a peer's subscription lands is not delivered to that peer.
+    """
+
+    backend = "redis"
+
+    def __init__(self, namespace: str, client):
+        super().__init__(namespace)
+        self.client = client
+        self.pubsub = None
+        self._user_prefix = user_channel(namespace, "")
+        self._presence_key = f"mewayz:ws:{namespace}:presence:{self.worker_id}"
+        self._workers_key = f"mewayz:ws:{namespace}:workers"
+        self._tasks: List[asyncio.Task] = []
+
+    async def start(self, deliver: DeliverCallback):
+        await super().start(deliver)
+        self._tasks = [
+            create_background_task(self._listen()),
+            create_background_task(self._heartbeat())
+        ]
+
+    async def _send_batch(self, outbox, subscribe, unsubscribe, presence):
+        if outbox or presence:
+            pipe = self.client.pipeline(transaction=False)
+            for user_id, payload in outbox:
+                channel = broadcast_channel(self.namespace) if user_id is None else user_channel(self.namespace, user_id)
+                pipe.publish(channel, payload)
+            for user_id, count in presence.items():
+                if count > 0:
+                    pipe.hset(self._presence_key, user_id, count)
+                else:
+                    pipe.hdel(self._presence_key, user_id)
+            if presence:
+                pipe.expire(self._presence_key, settings.REALTIME_PRESENCE_TTL_SECONDS)
+            await pipe.execute()
+        if self.pubsub is not None:
+            if subscribe:
+                await self.pubsub.subscribe(*(user_channel(self.namespace, user_id) for user_id in subscribe))
+            if unsubscribe:
+                await self.pubsub.unsubscribe(*(user_channel(self.namespace, user_id) for user_id in unsubscribe))
+
+    async def _listen(self):
+        while True:
+            try:
+                self.pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+                # (Re)subscribe to everything current; later changes go through flush
+                channels = [broadcast_channel(self.namespace)]
+                channels += [user_channel(self.namespace, user_id) for user_id in self.local_counts]
+                await self.pubsub.subscribe(*channels)
+                async for message in self.pubsub.listen():
+                    if message.get("type") != "message":
+                        continue
+                    channel = message["channel"]
+                    channel = channel.decode() if isinstance(channel, bytes) else channel
+                    data = message["data"]
+                    data = data.decode() if isinstance(data, bytes) else data
+                    user_id = channel[len(self._user_prefix):] if channel.startswith(self._user_prefix) else None
+                    self._receive(user_id, data)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                admin_logger.log_system_event("REALTIME_BACKPLANE_LISTEN_ERROR", {
+                    "namespace": self.namespace,
+                    "error": str(e)
+                }, "WARNING")
+            finally:
+                if self.pubsub is not None:
+                    pubsub, self.pubsub = self.pubsub, None
+                    try:
+                        await pubsub.aclose()
+                    except Exception:
+                        pass
+            await asyncio.sleep(1)
+
+    async def _heartbeat(self):
+        """Rewrite this worker's presence hash and keep it alive"""
+        ttl = settings.REALTIME_PRESENCE_TTL_SECONDS
+        while True:
+            try:
+                now = time.time()
+                pipe = self.client.pipeline(transaction=True)
+                pipe.delete(self._presence_key)
+                if self.local_counts:
+                    pipe.hset(self._presence_key, mapping=dict(self.local_counts))
+                    pipe.expire(self._presence_key, ttl)
+                pipe.zadd(self._workers_key, {self.worker_id: now})
+                pipe.zremrangebyscore(self._workers_key, "-inf", now - ttl)
+                await pipe.execute()
+            except Exception as e:
+                admin_logger.log_system_event("REALTIME_BACKPLANE_HEARTBEAT_ERROR", {
+                    "namespace": self.namespace,
+                    "error": str(e)
+                }, "WARNING")
+            await asyncio.sleep(ttl / 3)
+
+    async def _peer_presence_keys(self) -> List[str]:
+        workers = await self.client.zrangebyscore(
+            self._workers_key, time.time() - settings.REALTIME_PRESENCE_TTL_SECONDS, "+inf"
+        )
+        prefix = f"mewayz:ws:{self.namespace}:presence:"
+        return [
+            prefix + (worker.decode() if isinstance(worker, bytes) else worker)
+            for worker in workers
+            if (worker.decode() if isinstance(worker, bytes) else worker) != self.worker_id
+        ]
+
+    async def get_presence(self, user_id: str) -> int:
+        local = self.local_counts.get(user_id, 0)
+        try:
+            keys = await self._peer_presence_keys()
+            if not keys:
+                return local
+            pipe = self.client.pipeline(transaction=False)
+            for key in keys:
+                pipe.hget(key, user_id)
+            return local + sum(int(count) for count in await pipe.execute() if count)
+        except Exception:
+            return local
+
+    async def get_total_connections(self) -> int:
+        local = sum(self.local_counts.values())
+        try:
+            keys = await self._peer_presence_keys()
+            if not keys:
+                return local
+            pipe = self.client.pipeline(transaction=False)
+            for key in keys:
+                pipe.hvals(key)
+            return local + sum(int(count) for counts in await pipe.execute() for count in counts)
+        except Exception:
+            return local
+
+    async def close(self):
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+        await self.flush()
+        await super().close()
+        try:
+            await self.client.delete(self._presence_key)
+            await self.client.zrem(self._workers_key, self.worker_id)
+        except Exception:
+            pass
+
+def create_backplane(namespace: str) -> Backplane:
+    """Backplane per REALTIME_BACKPLANE: redis, local, or auto (redis when connected)"""
+    mode = settings.REALTIME_BACKPLANE
+    if mode in ("redis", "auto") and cache_manager.redis_client is not None:
+        return RedisBackplane(namespace, cache_manager.redis_client)
+    if mode == "redis":
+        admin_logger.log_system_event("REALTIME_BACKPLANE_UNAVAILABLE", {
+            "namespace": namespace,
+            "reason": "Redis unavailable; WebSocket delivery limited to this worker"
+        }, "WARNING")
+    return Backplane(namespace)
+
+def get_backplane_stats() -> List[Dict[str, object]]:
+    """Stats for every backplane in this process"""
+    return [backplane.get_stats() for backplane in _backplanes]
+
+async def close_all_backplanes():
+    """Flush pending frames and drop presence; called from the application lifespan"""
+    for backplane in _backplanes:
+        await backplane.close()
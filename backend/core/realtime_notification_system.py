@@ -4,16 +4,25 @@ Multi-channel notifications with WebSocket, email, SMS, and push notifications
 """
 import asyncio
 import json
+import time
 import uuid
+from collections import deque
 from datetime import datetime, timedelta
-from typing import Dict, Any, List, Optional, Set
+from typing import Awaitable, Callable, Deque, Dict, Any, List, Optional, Set, Tuple
 from enum import Enum
 from dataclasses import dataclass, asdict
 import websockets
 from fastapi import WebSocket
 import httpx
 
+from core.circuit_breaker import CircuitBreaker
+from core.config import settings
 from core.database import get_database
+from core.mongo_pool import create_background_task
+from core.notification_digest import NotificationDigester
+from core.notification_scheduler import NotificationScheduler, to_timestamp
+from core.realtime_backplane import Backplane, create_backplane
+from core.write_behind import BatchWriter
 from core.professional_logger import professional_logger, LogLevel, LogCategory
 from core.external_api_integrator import email_service_integrator
 
@@ -53,15 +62,121 @@ class Notification:
     action_url: Optional[str] = None
     action_text: Optional[str] = None
 
+def notification_to_document(notification: Notification) -> Dict[str, Any]:
+    """Notification as a plain document (enums as values) for the delivery queue"""
+    document = asdict(notification)
+    document["type"] = notification.type.value
+    document["channels"] = [channel.value for channel in notification.channels]
+    return document
+
+def notification_from_document(document: Dict[str, Any]) -> Notification:
+    return Notification(**{
+        **document,
+        "type": NotificationType(document["type"]),
+        "channels": [NotificationChannel(channel) for channel in document["channels"]]
+    })
+
+class OutboundConnection:
+    """One WebSocket's bounded outbound queue, drained by its own writer task
+    
+    Producers append already-serialized frames and never wait on the socket.
+    A frame with a coalesce key replaces a queued frame with the same key; when
+    the queue is full the oldest frame is dropped.
+    """
+    
+    def __init__(self, websocket: WebSocket, user_id: str, on_close: Callable[["OutboundConnection"], None]):
+        self.websocket = websocket
+        self.user_id = user_id
+        self.frames: Deque[Tuple[Optional[str], str]] = deque()
+        self.max_frames = settings.WEBSOCKET_SEND_QUEUE_SIZE
+        self.sent = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.timed_out = False
+        # Loop time the in-flight send started; the manager closes sends stalled too long
+        self.send_started: Optional[float] = None
+        self._ready = asyncio.Event()
+        self._on_close = on_close
+        self._writer: Optional[asyncio.Task] = None
+    
+    def start(self):
+        self._writer = create_background_task(self._write())
+    
+    def enqueue(self, frame: str, coalesce_key: Optional[str] = None):
+        if coalesce_key is not None:
+            for position, (key, _) in enumerate(self.frames):
+                if key == coalesce_key:
+                    self.frames[position] = (coalesce_key, frame)
+                    self.coalesced += 1
+                    return
+        if len(self.frames) >= self.max_frames:
+            self.frames.popleft()
+            self.dropped += 1
+        self.frames.append((coalesce_key, frame))
+        self._ready.set()
+    
+    async def _write(self):
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                while self.frames:
+                    _, frame = self.frames.popleft()
+                    self.send_started = loop.time()
+                    await self.websocket.send_text(frame)
+                    self.send_started = None
+                    self.sent += 1
+                self._ready.clear()
+                await self._ready.wait()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # Connection already closed
+            self._on_close(self)
+    
+    def close(self):
+        self.frames.clear()
+        if self._writer is not None and self._writer is not asyncio.current_task():
+            self._writer.cancel()
+
 class WebSocketConnectionManager:
-    """Manage WebSocket connections for real-time notifications"""
+    """Manage WebSocket connections for real-time notifications
     
-    def __init__(self):
+    Messages are serialized once per send and queued to every target
+    connection's OutboundConnection, so fan-out cost does not depend on how
+    fast any one client reads. A send stalled longer than
+    WEBSOCKET_SEND_TIMEOUT_SECONDS closes that connection with 1013 (try again
+    later), dropping the slow consumer.
+    
+    Sends also go to the backplane (core/realtime_backplane.py) for sockets held
+    by other workers; it is created on first use, after Redis is connected.
+    """
+    
+    def __init__(self, namespace: str = "notifications", backplane: Optional[Backplane] = None):
         self.active_connections: Dict[str, Set[WebSocket]] = {}
         self.connection_metadata: Dict[WebSocket, Dict[str, Any]] = {}
+        self.outbound: Dict[WebSocket, OutboundConnection] = {}
+        self.namespace = namespace
+        self.backplane = backplane
+        self._backplane_started = False
+        self.stats = {
+            "frames_sent": 0,
+            "frames_dropped": 0,
+            "frames_coalesced": 0,
+            "slow_consumers_closed": 0
+        }
+        self._reaper: Optional[asyncio.Task] = None
+    
+    async def _get_backplane(self) -> Backplane:
+        if self.backplane is None:
+            self.backplane = create_backplane(self.namespace)
+        if not self._backplane_started:
+            self._backplane_started = True
+            await self.backplane.start(self._deliver_local)
+        return self.backplane
     
     async def connect(self, websocket: WebSocket, user_id: str):
         """Accept new WebSocket connection"""
+        backplane = await self._get_backplane()
         await websocket.accept()
         
         if user_id not in self.active_connections:
@@ -73,6 +188,12 @@ class WebSocketConnectionManager:
             "connected_at": datetime.utcnow(),
             "last_ping": datetime.utcnow()
         }
+        connection = OutboundConnection(websocket, user_id, lambda closed: self.disconnect(closed.websocket))
+        self.outbound[websocket] = connection
+        connection.start()
+        if self._reaper is None or self._reaper.done():
+            self._reaper = create_background_task(self._close_stalled_connections())
+        backplane.set_local_connections(user_id, len(self.active_connections[user_id]))
         
         await professional_logger.log(
             LogLevel.INFO, LogCategory.SYSTEM,
@@ -89,49 +210,92 @@ class WebSocketConnectionManager:
     
     def disconnect(self, websocket: WebSocket):
         """Remove WebSocket connection"""
+        connection = self.outbound.pop(websocket, None)
+        if connection is not None:
+            connection.close()
+            self.stats["frames_sent"] += connection.sent
+            self.stats["frames_dropped"] += connection.dropped
+            self.stats["frames_coalesced"] += connection.coalesced
+            self.stats["slow_consumers_closed"] += connection.timed_out
+        
         if websocket in self.connection_metadata:
             user_id = self.connection_metadata[websocket]["user_id"]
             
             if user_id in self.active_connections:
                 self.active_connections[user_id].discard(websocket)
-                if not self.active_connections[user_id]:
+                remaining = len(self.active_connections[user_id])
+                if not remaining:
                     del self.active_connections[user_id]
+                if self.backplane is not None:
+                    self.backplane.set_local_connections(user_id, remaining)
             
             del self.connection_metadata[websocket]
             
-            professional_logger.log(
+            create_background_task(professional_logger.log(
                 LogLevel.INFO, LogCategory.SYSTEM,
                 f"WebSocket connection closed for user {user_id}",
                 user_id=user_id
-            )
+            ))
     
-    async def send_personal_message(self, message: Dict[str, Any], websocket: WebSocket):
-        """Send message to specific WebSocket connection"""
+    async def _close_stalled_connections(self):
+        """Runs while connections are open; one timer for all sends instead of one per send"""
+        loop = asyncio.get_running_loop()
+        timeout = settings.WEBSOCKET_SEND_TIMEOUT_SECONDS
+        while self.outbound:
+            await asyncio.sleep(min(1.0, timeout / 2))
+            deadline = loop.time() - timeout
+            for connection in list(self.outbound.values()):
+                if connection.send_started is not None and connection.send_started < deadline:
+                    connection.timed_out = True
+                    self.disconnect(connection.websocket)
+                    create_background_task(self._close_socket(connection.websocket, 1013))
+    
+    @staticmethod
+    async def _close_socket(websocket: WebSocket, code: int):
         try:
-            await websocket.send_text(json.dumps(message, default=str))
-        except Exception as e:
-            # Connection might be closed
-            self.disconnect(websocket)
+            await asyncio.wait_for(websocket.close(code=code), 1.0)
+        except Exception:
+            pass
     
-    async def send_to_user(self, message: Dict[str, Any], user_id: str):
-        """Send message to all connections for a user"""
-        if user_id in self.active_connections:
-            disconnected_sockets = set()
-            
-            for websocket in self.active_connections[user_id].copy():
-                try:
-                    await websocket.send_text(json.dumps(message, default=str))
-                except Exception as e:
-                    disconnected_sockets.add(websocket)
-            
-            # Clean up disconnected sockets
-            for websocket in disconnected_sockets:
-                self.disconnect(websocket)
+    def send_frame(self, frame: str, websocket: WebSocket, coalesce_key: Optional[str] = None) -> bool:
+        """Queue an already-serialized frame for one connection"""
+        connection = self.outbound.get(websocket)
+        if connection is None:
+            return False
+        connection.enqueue(frame, coalesce_key)
+        return True
+    
+    async def send_personal_message(self, message: Dict[str, Any], websocket: WebSocket,
+                                    coalesce_key: Optional[str] = None):
+        """Send message to specific WebSocket connection"""
+        self.send_frame(json.dumps(message, default=str), websocket, coalesce_key)
+    
+    def _deliver_local(self, user_id: Optional[str], coalesce_key: Optional[str], frame: str) -> int:
+        """Queue a frame for one user's sockets in this worker, or all of them if user_id is None"""
+        if user_id is None:
+            connections = list(self.outbound.values())
+            for connection in connections:
+                connection.enqueue(frame, coalesce_key)
+            return len(connections)
+        
+        queued = 0
+        for websocket in self.active_connections.get(user_id, ()):
+            queued += self.send_frame(frame, websocket, coalesce_key)
+        return queued
+    
+    async def send_to_user(self, message: Dict[str, Any], user_id: str, coalesce_key: Optional[str] = None) -> int:
+        """Send message to all connections for a user in every worker; returns local connections queued to"""
+        frame = json.dumps(message, default=str)
+        backplane = await self._get_backplane()
+        backplane.publish(user_id, frame, coalesce_key)
+        return self._deliver_local(user_id, coalesce_key, frame)
     
-    async def broadcast_to_all(self, message: Dict[str, Any]):
-        """Broadcast message to all connected users"""
-        for user_id in list(self.active_connections.keys()):
-            await self.send_to_user(message, user_id)
+    async def broadcast_to_all(self, message: Dict[str, Any], coalesce_key: Optional[str] = None) -> int:
+        """Broadcast message to all connected users in every worker; returns local connections queued to"""
+        frame = json.dumps(message, default=str)
+        backplane = await self._get_backplane()
+        backplane.publish(None, frame, coalesce_key)
+        return self._deliver_local(None, coalesce_key, frame)
     
     def get_user_connection_count(self, user_id: str) -> int:
         """Get number of active connections for user"""
@@ -139,7 +303,106 @@ class WebSocketConnectionManager:
     
     def get_total_connections(self) -> int:
         """Get total number of active connections"""
-        return sum(len(connections) for connections in self.active_connections.values())
+        return len(self.connection_metadata)
+    
+    async def get_global_user_connection_count(self, user_id: str) -> int:
+        """Connections for user across all workers"""
+        return await (await self._get_backplane()).get_presence(user_id)
+    
+    async def get_global_total_connections(self) -> int:
+        """Connections across all workers"""
+        return await (await self._get_backplane()).get_total_connections()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Delivery counters over open and closed connections"""
+        stats = dict(self.stats)
+        for connection in self.outbound.values():
+            stats["frames_sent"] += connection.sent
+            stats["frames_dropped"] += connection.dropped
+            stats["frames_coalesced"] += connection.coalesced
+        stats["frames_queued"] = sum(len(connection.frames) for connection in self.outbound.values())
+        if self.backplane is not None:
+            stats["backplane"] = self.backplane.get_stats()
+        return stats
+
+# Awaited by send_notification; every other channel completes in the background
+REALTIME_CHANNELS = {NotificationChannel.WEBSOCKET, NotificationChannel.IN_APP}
+
+class ChannelLimiter:
+    """Concurrency cap, timeout and circuit breaker for one delivery channel
+    
+    A channel that keeps failing or timing out is skipped until its breaker
+    lets a trial send through, and one with more than ten times its
+    concurrency already waiting sheds new sends, so a slow provider cannot
+    pile up work or hold other channels back. Senders mark failures that are
+    down to the recipient or the request rather than the provider (no email
+    address, rejected by the provider) with "permanent": True; those do not
+    count against the breaker.
+    """
+    
+    def __init__(self, channel: str):
+        self.channel = channel
+        self.concurrency = settings.NOTIFICATION_CHANNEL_CONCURRENCY
+        self.timeout = settings.NOTIFICATION_CHANNEL_TIMEOUT_SECONDS
+        self.semaphore = asyncio.Semaphore(self.concurrency)
+        self.breaker = CircuitBreaker(
+            f"notification:{channel}",
+            failure_threshold=settings.NOTIFICATION_BREAKER_FAILURES,
+            reset_timeout=settings.NOTIFICATION_BREAKER_RESET_SECONDS
+        )
+        self.waiting = 0
+        self.in_flight = 0
+        self.stats = {
+            "sent": 0,
+            "failed": 0,
+            "rejected": 0,
+            "timed_out": 0,
+            "shed": 0
+        }
+    
+    async def run(self, send: Callable[[Notification], Awaitable[Dict[str, Any]]],
+                  notification: Notification) -> Dict[str, Any]:
+        if self.waiting >= self.concurrency * 10:
+            self.stats["shed"] += 1
+            return {"success": False, "error": f"{self.channel} channel saturated", "skipped": True}
+        if not self.breaker.allow():
+            return {"success": False, "error": f"{self.channel} circuit open", "skipped": True}
+        
+        self.waiting += 1
+        try:
+            await self.semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        self.in_flight += 1
+        try:
+            result = await asyncio.wait_for(send(notification), self.timeout)
+        except asyncio.TimeoutError:
+            self.stats["timed_out"] += 1
+            result = {"success": False, "error": f"{self.channel} timed out after {self.timeout}s"}
+        except Exception as e:
+            result = {"success": False, "error": str(e)}
+        finally:
+            self.in_flight -= 1
+            self.semaphore.release()
+        
+        if result.get("success"):
+            self.stats["sent"] += 1
+            self.breaker.record_success()
+        elif result.get("permanent"):
+            self.stats["rejected"] += 1
+            self.breaker.record_ignored()
+        else:
+            self.stats["failed"] += 1
+            self.breaker.record_failure()
+        return result
+    
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "breaker": self.breaker.get_stats()
+        }
 
 class NotificationProcessor:
     """Process and deliver notifications through various channels"""
@@ -147,8 +410,12 @@ class NotificationProcessor:
     def __init__(self, connection_manager: WebSocketConnectionManager):
         self.connection_manager = connection_manager
         self.db = None
-        self.notification_queue = asyncio.Queue()
-        self.processing = False
+        self.scheduler = NotificationScheduler(connection_manager.namespace, self._deliver_queued,
+                                               on_stop=self._finish_recording)
+        self.channel_limiters = {channel: ChannelLimiter(channel.value) for channel in NotificationChannel}
+        self.history_writer = BatchWriter(f"notification_history:{connection_manager.namespace}",
+                                          "notification_history", max_batch=500, flush_interval=1.0)
+        self._recording: Set[asyncio.Task] = set()
     
     async def get_database(self):
         """Get database connection"""
@@ -156,49 +423,45 @@ class NotificationProcessor:
             self.db = get_database()
         return self.db
     
+    def _channel_sender(self, channel: NotificationChannel):
+        return {
+            NotificationChannel.WEBSOCKET: self._send_websocket_notification,
+            NotificationChannel.EMAIL: self._send_email_notification,
+            NotificationChannel.SMS: self._send_sms_notification,
+            NotificationChannel.PUSH: self._send_push_notification,
+            NotificationChannel.IN_APP: self._store_in_app_notification,
+            NotificationChannel.SLACK: self._send_slack_notification
+        }.get(channel)
+    
     async def send_notification(self, notification: Notification) -> Dict[str, Any]:
-        """Send notification through specified channels"""
+        """Send notification through specified channels
+        
+        Channels are delivered concurrently, each through its ChannelLimiter.
+        Only the realtime channels (websocket, in-app) are awaited; the others
+        finish in the background and are reported as pending here. The history
+        record with every channel's result is written once they are all done.
+        """
         try:
-            delivery_results = {}
-            
-            for channel in notification.channels:
-                if channel == NotificationChannel.WEBSOCKET:
-                    result = await self._send_websocket_notification(notification)
-                    delivery_results["websocket"] = result
-                
-                elif channel == NotificationChannel.EMAIL:
-                    result = await self._send_email_notification(notification)
-                    delivery_results["email"] = result
-                
-                elif channel == NotificationChannel.SMS:
-                    result = await self._send_sms_notification(notification)
-                    delivery_results["sms"] = result
-                
-                elif channel == NotificationChannel.PUSH:
-                    result = await self._send_push_notification(notification)
-                    delivery_results["push"] = result
-                
-                elif channel == NotificationChannel.IN_APP:
-                    result = await self._store_in_app_notification(notification)
-                    delivery_results["in_app"] = result
-                
-                elif channel == NotificationChannel.SLACK:
-                    result = await self._send_slack_notification(notification)
-                    delivery_results["slack"] = result
-            
-            # Store notification in database
-            await self._store_notification(notification, delivery_results)
+            deliveries = {}
+            for channel in dict.fromkeys(notification.channels):
+                sender = self._channel_sender(channel)
+                if sender is not None:
+                    deliveries[channel] = create_background_task(
+                        self.channel_limiters[channel].run(sender, notification)
+                    )
+            
+            realtime = [task for channel, task in deliveries.items() if channel in REALTIME_CHANNELS]
+            if realtime:
+                await asyncio.wait(realtime)
+            
+            delivery_results = {
+                channel.value: task.result() if task.done() else {"status": "pending"}
+                for channel, task in deliveries.items()
+            }
             
-            await professional_logger.log(
-                LogLevel.INFO, LogCategory.SYSTEM,
-                f"Notification sent to user {notification.user_id}",
-                details={
-                    "notification_id": notification.notification_id,
-                    "channels": [ch.value for ch in notification.channels],
-                    "delivery_results": delivery_results
-                },
-                user_id=notification.user_id
-            )
+            record = create_background_task(self._store_notification(notification, deliveries))
+            self._recording.add(record)
+            record.add_done_callback(self._recording.discard)
             
             return {
                 "success": True,
@@ -252,7 +515,7 @@ class NotificationProcessor:
             user = await db.users.find_one({"user_id": notification.user_id})
             
             if not user or not user.get("email"):
-                return {"success": False, "error": "User email not found"}
+                return {"success": False, "error": "User email not found", "permanent": True}
             
             # Create email content
             email_content = self._create_email_template(notification)
@@ -373,10 +636,12 @@ class NotificationProcessor:
         except Exception as e:
             return {"success": False, "error": str(e)}
     
-    async def _store_notification(self, notification: Notification, delivery_results: Dict[str, Any]):
-        """Store notification record with delivery results"""
+    async def _store_notification(self, notification: Notification, deliveries: Dict[NotificationChannel, asyncio.Task]):
+        """Queue the notification record once every channel has a result"""
         try:
-            db = await self.get_database()
+            if deliveries:
+                await asyncio.wait(deliveries.values())
+            delivery_results = {channel.value: task.result() for channel, task in deliveries.items()}
             
             notification_record = {
                 **asdict(notification),
@@ -396,7 +661,7 @@ class NotificationProcessor:
             notification_record["type"] = notification_record["type"].value if hasattr(notification_record["type"], "value") else notification_record["type"]
             notification_record["channels"] = [ch.value if hasattr(ch, "value") else ch for ch in notification_record["channels"]]
             
-            await db.notification_history.insert_one(notification_record)
+            await self.history_writer.add(notification_record)
             
         except Exception as e:
             await professional_logger.log(
@@ -405,48 +670,49 @@ class NotificationProcessor:
                 error=e
             )
     
-    async def start_processing(self):
-        """Start processing notification queue"""
-        if self.processing:
+    async def _deliver_queued(self, document: Dict[str, Any]):
+        """Scheduler handler: deliver a queued notification unless it has expired"""
+        notification = notification_from_document(document)
+        if notification.expires_at and to_timestamp(notification.expires_at) <= time.time():
             return
-        
-        self.processing = True
-        
-        while self.processing:
-            try:
-                # Wait for notification or timeout
-                notification = await asyncio.wait_for(
-                    self.notification_queue.get(), 
-                    timeout=1.0
-                )
-                
-                # Check if notification is scheduled for future
-                if notification.scheduled_for and notification.scheduled_for > datetime.utcnow():
-                    # Put back in queue for later processing
-                    await self.notification_queue.put(notification)
-                    await asyncio.sleep(1)
-                    continue
-                
-                # Process notification
-                await self.send_notification(notification)
-                
-            except asyncio.TimeoutError:
-                # No notifications in queue, continue
-                continue
-            except Exception as e:
-                await professional_logger.log(
-                    LogLevel.ERROR, LogCategory.SYSTEM,
-                    f"Error processing notification queue: {str(e)}",
-                    error=e
-                )
+        await self.send_notification(notification)
+    
+    @property
+    def processing(self) -> bool:
+        return self.scheduler.running
+    
+    async def start_processing(self):
+        """Start the delivery workers; also recovers persisted notifications"""
+        await self.scheduler.start()
     
     async def stop_processing(self):
-        """Stop processing notification queue"""
-        self.processing = False
+        """Stop processing; undelivered notifications are persisted
+        
+        Also runs on stop_all_schedulers, through the scheduler's on_stop hook.
+        """
+        await self.scheduler.stop()
+    
+    async def _finish_recording(self):
+        """Wait for background channel sends and their history records before the writers drain"""
+        if not self._recording:
+            return
+        _, pending = await asyncio.wait(set(self._recording), timeout=settings.NOTIFICATION_SHUTDOWN_TIMEOUT_SECONDS)
+        for task in pending:
+            task.cancel()
+        if pending:
+            await professional_logger.log(
+                LogLevel.WARNING, LogCategory.SYSTEM,
+                f"Abandoned {len(pending)} notification deliveries still running at shutdown"
+            )
     
     async def queue_notification(self, notification: Notification):
-        """Add notification to processing queue"""
-        await self.notification_queue.put(notification)
+        """Queue notification for delivery by priority, at scheduled_for if set"""
+        await self.scheduler.submit(
+            notification.notification_id,
+            notification_to_document(notification),
+            notification.priority,
+            notification.scheduled_for
+        )
 
 class RealtimeNotificationSystem:
     """Main notification system coordinator"""
@@ -454,13 +720,14 @@ class RealtimeNotificationSystem:
     def __init__(self):
         self.connection_manager = WebSocketConnectionManager()
         self.processor = NotificationProcessor(self.connection_manager)
+        self.digester = NotificationDigester(self.processor.queue_notification)
         self.notification_templates = {}
         self.user_preferences = {}
     
     async def initialize(self):
         """Initialize the notification system"""
-        # Start processing queue
-        asyncio.create_task(self.processor.start_processing())
+        # Start delivery workers
+        await self.processor.start_processing()
         
         await professional_logger.log(
             LogLevel.INFO, LogCategory.SYSTEM,
@@ -479,9 +746,15 @@ class RealtimeNotificationSystem:
         scheduled_for: Optional[datetime] = None,
         expires_at: Optional[datetime] = None,
         action_url: Optional[str] = None,
-        action_text: Optional[str] = None
+        action_text: Optional[str] = None,
+        digest_group: Optional[str] = None
     ) -> str:
-        """Create and queue notification"""
+        """Create and queue notification
+        
+        Bursts of similar notifications are folded into digests (see
+        core/notification_digest.py), grouped by digest_group or else by type;
+        the returned id is then the digest's.
+        """
         
         if channels is None:
             channels = [NotificationChannel.WEBSOCKET, NotificationChannel.IN_APP]
@@ -502,6 +775,11 @@ class RealtimeNotificationSystem:
             action_text=action_text
         )
         
+        if scheduled_for is None:
+            digest_id = await self.digester.submit(notification, digest_group)
+            if digest_id is not None:
+                return digest_id
+        
         # Queue for processing
         await self.processor.queue_notification(notification)
         
@@ -598,9 +876,17 @@ class RealtimeNotificationSystem:
         """Get notification system statistics"""
         return {
             "active_websocket_connections": self.connection_manager.get_total_connections(),
+            "cluster_websocket_connections": await self.connection_manager.get_global_total_connections(),
             "users_connected": len(self.connection_manager.active_connections),
-            "queue_size": self.processor.notification_queue.qsize(),
-            "processing_active": self.processor.processing
+            "queue_size": self.processor.scheduler.pending_count(),
+            "scheduler": self.processor.scheduler.get_stats(),
+            "digests": self.digester.get_stats(),
+            "channels": {
+                channel.value: limiter.get_stats()
+                for channel, limiter in self.processor.channel_limiters.items()
+            },
+            "processing_active": self.processor.processing,
+            "websocket_delivery": self.connection_manager.get_stats()
         }
 
 # Global instance
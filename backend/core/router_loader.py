@@ -0,0 +1,233 @@
+"""
+Router Loader
+Timed API module imports, a cached route manifest and lazily mounted routers
+"""
+
+import asyncio
+import importlib
+import json
+import os
+import sys
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+from starlette.routing import BaseRoute, Match, NoMatchFound
+
+class ModuleImportProfile:
+    """Per-module import cost, an in-app view of `python -X importtime`"""
+
+    def __init__(self):
+        self.modules: Dict[str, Dict[str, Any]] = {}
+
+    def import_module(self, module_path: str):
+        """Import a module, recording wall time and how many modules it pulled in"""
+        loaded_before = len(sys.modules)
+        start_time = time.perf_counter()
+        try:
+            return importlib.import_module(module_path)
+        finally:
+            self.modules[module_path] = {
+                "import_ms": round((time.perf_counter() - start_time) * 1000, 2),
+                "new_modules": len(sys.modules) - loaded_before
+            }
+
+    def slowest(self, limit: int = 10) -> List[Tuple[str, Dict[str, Any]]]:
+        return sorted(self.modules.items(), key=lambda item: item[1]["import_ms"], reverse=True)[:limit]
+
+    def total_ms(self) -> float:
+        return round(sum(profile["import_ms"] for profile in self.modules.values()), 2)
+
+class RouteManifest:
+    """JSON cache of which API modules import cleanly, keyed by source mtime
+
+    Lazy startup uses it to skip modules known to fail without importing them;
+    an entry is trusted only while the module file is unchanged, and the whole
+    manifest is dropped when the interpreter or installed packages change.
+    """
+
+    def __init__(self, path: str, package_dir: str):
+        self.path = path
+        self.package_dir = package_dir
+        self.environment = self._environment_key()
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self._dirty = False
+        try:
+            with open(path, "r", encoding="utf-8") as manifest_file:
+                manifest = json.load(manifest_file)
+            if manifest.get("environment") == self.environment:
+                self.entries = manifest.get("modules", {})
+        except (OSError, ValueError):
+            self.entries = {}
+
+    @staticmethod
+    def _environment_key() -> str:
+        # Installing or removing a package touches the site-packages directory
+        import fastapi
+        site_packages = os.path.dirname(os.path.dirname(os.path.abspath(fastapi.__file__)))
+        try:
+            packages_mtime = os.path.getmtime(site_packages)
+        except OSError:
+            packages_mtime = None
+        return f"{sys.version}|{site_packages}|{packages_mtime}"
+
+    def _mtime(self, module_name: str) -> Optional[float]:
+        try:
+            return os.path.getmtime(os.path.join(self.package_dir, f"{module_name}.py"))
+        except OSError:
+            return None
+
+    def get(self, module_name: str) -> Optional[Dict[str, Any]]:
+        """Cached entry, or None when missing or the module changed since"""
+        entry = self.entries.get(module_name)
+        if entry is None or entry.get("mtime") != self._mtime(module_name):
+            return None
+        return entry
+
+    def record(self, module_name: str, importable: bool, error: str = None,
+               import_ms: float = None, routes: int = None):
+        self.entries[module_name] = {
+            "mtime": self._mtime(module_name),
+            "importable": importable,
+            "error": error,
+            "import_ms": import_ms,
+            "routes": routes
+        }
+        self._dirty = True
+
+    def save(self):
+        if not self._dirty:
+            return
+        temp_path = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            with open(temp_path, "w", encoding="utf-8") as manifest_file:
+                json.dump({
+                    "generated_at": datetime.utcnow().isoformat(),
+                    "environment": self.environment,
+                    "modules": self.entries
+                }, manifest_file, indent=2, sort_keys=True)
+            os.replace(temp_path, self.path)
+            self._dirty = False
+        except OSError:
+            # A read-only deployment just rebuilds the manifest in memory
+            pass
+
+class LazyRouterRoute(BaseRoute):
+    """Placeholder matching a router prefix; imports and mounts the router on first use"""
+
+    def __init__(self, app: FastAPI, module_name: str, prefix: str, tags: List[str],
+                 profile: ModuleImportProfile, manifest: RouteManifest):
+        self.app = app
+        self.module_name = module_name
+        self.path = prefix
+        self.tags = tags
+        self.profile = profile
+        self.manifest = manifest
+        self.error: Optional[str] = None
+        # Concurrent first requests share one import
+        self._load_lock = asyncio.Lock()
+
+    def matches(self, scope) -> Tuple[Match, Dict[str, Any]]:
+        if scope["type"] in ("http", "websocket"):
+            path = scope.get("path", "")
+            if path == self.path or path.startswith(self.path + "/"):
+                return Match.FULL, {}
+        return Match.NONE, {}
+
+    def url_path_for(self, name: str, /, **path_params: Any):
+        raise NoMatchFound(name, path_params)
+
+    def _import_router(self):
+        module = self.profile.import_module(f"api.{self.module_name}")
+        return getattr(module, "router")
+
+    def _import_failed(self, error: Exception) -> bool:
+        self.error = str(error)
+        self.manifest.record(self.module_name, False, error=self.error)
+        self.manifest.save()
+        return False
+
+    def load(self) -> bool:
+        """Import the module and splice its routes in where this placeholder sits"""
+        if self.error is not None:
+            return False
+        if self not in self.app.router.routes:
+            return True
+        try:
+            router = self._import_router()
+        except Exception as e:
+            return self._import_failed(e)
+        return self._mount(router)
+
+    async def load_async(self) -> bool:
+        """load() with the import run in a worker thread, so the event loop keeps
+        serving other requests while a heavy module imports"""
+        async with self._load_lock:
+            if self.error is not None:
+                return False
+            if self not in self.app.router.routes:
+                return True
+            try:
+                router = await asyncio.to_thread(self._import_router)
+            except Exception as e:
+                return self._import_failed(e)
+            return self._mount(router)
+
+    def _mount(self, router) -> bool:
+        routes = self.app.router.routes
+        if self not in routes:
+            # Mounted by a synchronous load() while the import ran
+            return True
+        start = len(routes)
+        self.app.include_router(router, prefix=self.path, tags=self.tags)
+        # Keep the precedence the router would have had if included eagerly
+        new_routes = routes[start:]
+        del routes[start:]
+        index = routes.index(self)
+        routes[index:index + 1] = new_routes
+        self.app.openapi_schema = None
+
+        self.manifest.record(
+            self.module_name, True,
+            import_ms=self.profile.modules[f"api.{self.module_name}"]["import_ms"],
+            routes=len(new_routes)
+        )
+        self.manifest.save()
+        return True
+
+    async def handle(self, scope, receive, send):
+        if await self.load_async():
+            # Dispatch again now that the real routes are in place
+            await self.app.router(scope, receive, send)
+            return
+
+        response = JSONResponse(
+            status_code=503,
+            content={
+                "success": False,
+                "error": "HTTP 503",
+                "message": f"The {self.module_name} module is unavailable",
+                "timestamp": datetime.utcnow().isoformat()
+            }
+        )
+        await response(scope, receive, send)
+
+def lazy_routes(app: FastAPI) -> List[LazyRouterRoute]:
+    return [route for route in app.router.routes if isinstance(route, LazyRouterRoute)]
+
+def load_all_lazy_routers(app: FastAPI) -> int:
+    """Mount every pending lazy router, e.g. before generating the OpenAPI schema"""
+    return sum(1 for route in lazy_routes(app) if route.load())
+
+def install_lazy_openapi(app: FastAPI):
+    """Make /openapi.json and /docs load pending routers so the schema is complete"""
+    default_openapi = app.openapi
+
+    def openapi():
+        if app.openapi_schema is None and lazy_routes(app):
+            load_all_lazy_routers(app)
+        return default_openapi()
+
+    app.openapi = openapi
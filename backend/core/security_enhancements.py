@@ -5,7 +5,6 @@ Comprehensive security system with JWT refresh tokens, rate limiting, and input
 import jwt
 import bcrypt
 import secrets
-import hashlib
 import re
 from datetime import datetime, timedelta
 from typing import Dict, Any, Optional, List
@@ -16,9 +15,20 @@ from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
 import httpx
 
+from core.auth_cache import auth_cache
 from core.database import get_database
+from core.indexes import index, index_registry
 from core.professional_logger import professional_logger, LogLevel, LogCategory
 
+index_registry.register(
+    __name__,
+    # user_sessions also holds analytics sessions, so session_id is not unique
+    index("user_sessions", "session_id"),
+    index("user_sessions", "expires_at", expire_after_seconds=0),
+    index("revoked_tokens", "token_hash", "expires_at"),
+    index("revoked_tokens", "expires_at", expire_after_seconds=0)
+)
+
 # Rate limiting configuration
 limiter = Limiter(key_func=get_remote_address)
 
@@ -189,16 +199,10 @@ class JWTManager:
     async def revoke_token(token: str, user_id: str):
         """Add token to revocation list"""
         try:
-            db = get_database()
-            
-            revoked_token = {
-                "token_hash": hashlib.sha256(token.encode()).hexdigest(),
-                "user_id": user_id,
-                "revoked_at": datetime.utcnow(),
-                "expires_at": datetime.utcnow() + timedelta(days=SecurityConfig.REFRESH_TOKEN_EXPIRE_DAYS)
-            }
-            
-            await db.revoked_tokens.insert_one(revoked_token)
+            await auth_cache.revoke(
+                token, user_id,
+                datetime.utcnow() + timedelta(days=SecurityConfig.REFRESH_TOKEN_EXPIRE_DAYS)
+            )
             
             await professional_logger.log(
                 LogLevel.INFO, LogCategory.SECURITY,
@@ -215,17 +219,9 @@ class JWTManager:
     
     @staticmethod
     async def is_token_revoked(token: str) -> bool:
-        """Check if token is revoked"""
+        """Check if token is revoked (Bloom filter first, Mongo only on a hit)"""
         try:
-            db = get_database()
-            token_hash = hashlib.sha256(token.encode()).hexdigest()
-            
-            revoked = await db.revoked_tokens.find_one({
-                "token_hash": token_hash,
-                "expires_at": {"$gt": datetime.utcnow()}
-            })
-            
-            return revoked is not None
+            return await auth_cache.is_revoked(token)
             
         except Exception:
             return False
@@ -14,6 +14,7 @@ import croniter
 from dateutil import parser
 
 from core.database import get_database
+from core.mongo_pool import create_background_task
 from core.professional_logger import professional_logger, LogLevel, LogCategory
 from core.realtime_notification_system import notification_system, NotificationType, NotificationChannel
 from core.external_api_integrator import email_service_integrator, ai_service_integrator
@@ -403,7 +404,7 @@ class WorkflowEngine:
                 self.scheduled_tasks[workflow.workflow_id].cancel()
             
             # Create new scheduled task
-            task = asyncio.create_task(run_scheduled_workflow())
+            task = create_background_task(run_scheduled_workflow())
             self.scheduled_tasks[workflow.workflow_id] = task
             
         except Exception as e:
@@ -454,7 +455,8 @@ class WorkflowEngine:
             await self._save_workflow(workflow)
             
             # Execute workflow steps
-            asyncio.create_task(self._execute_workflow_steps(execution, workflow))
+            # Outlives the triggering request, so it must not inherit its Mongo deadline
+            create_background_task(self._execute_workflow_steps(execution, workflow))
             
             await professional_logger.log(
                 LogLevel.INFO, LogCategory.SYSTEM,
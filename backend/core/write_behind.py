@@ -0,0 +1,339 @@
+"""
+Write-Behind Buffers
+Bounded in-memory buffers that batch Mongo writes off the request path
+"""
+
+import asyncio
+import time
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, ConnectionFailure, ServerSelectionTimeoutError
+
+from core.database import get_database
+from core.mongo_pool import create_background_task
+from core.logging import admin_logger
+
+# Longest a blocking add waits for room before the item is shed
+DEFAULT_BLOCK_TIMEOUT = 5.0
+# Ceiling of the flush loop's exponential backoff after failed flushes
+MAX_FLUSH_BACKOFF_SECONDS = 60.0
+
+_writers: List["_BufferedWriter"] = []
+
+class _BufferedWriter(ABC):
+    """Common flush loop: flush on size threshold, on interval and on drain
+
+    Failed flushes keep their items and back the loop off exponentially.
+    Writers are reusable: the loop starts on first use, stops on drain and
+    starts again on the next add, on whichever event loop is running.
+    """
+
+    def __init__(self, name: str, collection_name: str, max_batch: int, flush_interval: float,
+                 max_pending: int, block_timeout: Optional[float] = DEFAULT_BLOCK_TIMEOUT):
+        self.name = name
+        self.collection_name = collection_name
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        # None: blocking adds wait for room indefinitely (offline jobs)
+        self.block_timeout = block_timeout
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._flush_task: Optional[asyncio.Task] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._stopping: Optional[asyncio.Event] = None
+        self._space_available: Optional[asyncio.Event] = None
+        self._failures = 0
+        self.stats = {
+            "flushes": 0,
+            "written": 0,
+            "dropped": 0,
+            "write_errors": 0
+        }
+        _writers.append(self)
+
+    @abstractmethod
+    def pending(self) -> int:
+        ...
+
+    @abstractmethod
+    def _take_batch(self) -> Any:
+        ...
+
+    @abstractmethod
+    async def _write(self, collection, batch: Any) -> int:
+        ...
+
+    @abstractmethod
+    def _requeue(self, batch: Any, error: Exception) -> int:
+        """Put what error left unwritten back for the next flush; returns items dropped"""
+
+    def _bind(self):
+        """asyncio primitives belong to one event loop; make fresh ones for the running loop"""
+        loop = asyncio.get_running_loop()
+        if self._loop is loop:
+            return
+        self._loop = loop
+        self._flush_task = None
+        self._flush_lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        self._stopping = asyncio.Event()
+        self._space_available = asyncio.Event()
+        self._space_available.set()
+
+    def _ensure_running(self):
+        self._bind()
+        if self._flush_task is None or self._flush_task.done():
+            self._stopping.clear()
+            # Usually first reached inside a request; keep the flush loop off its Mongo deadline
+            self._flush_task = create_background_task(self._run())
+
+    async def _reserve(self, block: bool) -> bool:
+        """Apply backpressure: wait up to block_timeout for room (block), otherwise shed"""
+        self._ensure_running()
+        if block and self.pending() >= self.max_pending:
+            deadline = None if self.block_timeout is None else time.monotonic() + self.block_timeout
+            while self.pending() >= self.max_pending:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    break
+                self._space_available.clear()
+                self._wakeup.set()
+                try:
+                    await asyncio.wait_for(self._space_available.wait(), timeout=remaining)
+                except asyncio.TimeoutError:
+                    break
+        if self.pending() >= self.max_pending:
+            self.stats["dropped"] += 1
+            return False
+        return True
+
+    def _after_add(self):
+        if self.pending() >= self.max_batch:
+            self._wakeup.set()
+
+    def _backoff_delay(self) -> float:
+        return min(self.flush_interval * 2 ** self._failures, MAX_FLUSH_BACKOFF_SECONDS)
+
+    async def _run(self):
+        while not self._stopping.is_set():
+            if self._failures:
+                # Size wakeups would retry a failing database in a tight loop; only drain cuts this short
+                wait, timeout = self._stopping.wait(), self._backoff_delay()
+            else:
+                wait, timeout = self._wakeup.wait(), self.flush_interval
+            try:
+                await asyncio.wait_for(wait, timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    async def flush(self) -> int:
+        """Write everything currently buffered"""
+        self._bind()
+        written = 0
+        async with self._flush_lock:
+            while self.pending():
+                batch = self._take_batch()
+                self._space_available.set()
+                try:
+                    collection = get_database()[self.collection_name]
+                    written += await self._write(collection, batch)
+                    self.stats["flushes"] += 1
+                    self._failures = 0
+                except Exception as e:
+                    self._failures += 1
+                    self.stats["write_errors"] += 1
+                    self.stats["dropped"] += self._requeue(batch, e)
+                    admin_logger.log_system_event("WRITE_BEHIND_FLUSH_ERROR", {
+                        "buffer": self.name,
+                        "collection": self.collection_name,
+                        "consecutive_failures": self._failures,
+                        "error": str(e)
+                    }, "WARNING")
+                    break
+        self._space_available.set()
+        self.stats["written"] += written
+        return written
+
+    async def drain(self) -> int:
+        """Stop the flush loop and write out whatever is left; the next add restarts it"""
+        self._bind()
+        self._stopping.set()
+        self._wakeup.set()
+        if self._flush_task is not None:
+            try:
+                await self._flush_task
+            except Exception:
+                pass
+        return await self.flush()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "collection": self.collection_name,
+            "pending": self.pending(),
+            "max_pending": self.max_pending,
+            "consecutive_failures": self._failures,
+            **self.stats
+        }
+
+class BatchWriter(_BufferedWriter):
+    """Buffers documents and writes them with unordered insert_many"""
+
+    def __init__(self, name: str, collection_name: str, max_batch: int = 500,
+                 flush_interval: float = 1.0, max_pending: int = 10000,
+                 block_timeout: Optional[float] = DEFAULT_BLOCK_TIMEOUT):
+        super().__init__(name, collection_name, max_batch, flush_interval, max_pending, block_timeout)
+        self._documents: List[Dict[str, Any]] = []
+
+    def pending(self) -> int:
+        return len(self._documents)
+
+    async def add(self, document: Dict[str, Any], block: bool = True) -> bool:
+        """Queue a document; returns False if it was shed under pressure"""
+        if not await self._reserve(block):
+            return False
+        self._documents.append(document)
+        self._after_add()
+        return True
+
+    def _take_batch(self) -> List[Dict[str, Any]]:
+        batch = self._documents[:self.max_batch]
+        del self._documents[:self.max_batch]
+        return batch
+
+    async def _write(self, collection, batch: List[Dict[str, Any]]) -> int:
+        try:
+            result = await collection.insert_many(batch, ordered=False)
+        except BulkWriteError as e:
+            # A retried batch may be partly written already; duplicate ids are those rows
+            if any(error.get("code") != 11000 for error in e.details.get("writeErrors", [])):
+                raise
+            return e.details.get("nInserted", 0)
+        return len(result.inserted_ids)
+
+    def _requeue(self, batch: List[Dict[str, Any]], error: Exception) -> int:
+        # Retrying is safe whatever was written: already inserted ids come back as duplicates
+        room = max(0, self.max_pending - len(self._documents))
+        self._documents[:0] = batch[:room]
+        return len(batch) - min(room, len(batch))
+
+def write_outcome_unknown(error: Exception) -> bool:
+    """Whether a failed write may still have been applied by the server
+
+    Connection errors and timeouts after the command was sent leave it
+    unknown (pymongo has already made its one retryable-write attempt);
+    failing to select a server means nothing was sent.
+    """
+    if isinstance(error, ServerSelectionTimeoutError):
+        return False
+    return isinstance(error, ConnectionFailure) or getattr(error, "timeout", False)
+
+class RollupBuffer(_BufferedWriter):
+    """Merges counter updates in memory and upserts them in one bulk_write
+
+    With upsert=False updates only apply to existing documents, for counters
+    kept on documents that may be deleted while an update is buffered.
+
+    $inc is not idempotent, so a failed flush only retries updates known not
+    to have been applied: after a BulkWriteError, the duplicate-key failures of
+    racing upserts; after an error that left nothing written, the whole batch.
+    When the outcome is unknown the batch is dropped and counted in
+    stats["dropped"], undercounting rather than counting twice.
+    """
+
+    def __init__(self, name: str, collection_name: str, max_batch: int = 500,
+                 flush_interval: float = 5.0, max_pending: int = 20000, upsert: bool = True,
+                 block_timeout: Optional[float] = DEFAULT_BLOCK_TIMEOUT):
+        super().__init__(name, collection_name, max_batch, flush_interval, max_pending, block_timeout)
+        self.upsert = upsert
+        self._updates: Dict[Tuple, Dict[str, Any]] = {}
+
+    def pending(self) -> int:
+        return len(self._updates)
+
+    async def add(self, key: Dict[str, Any], inc: Dict[str, float] = None,
+                  min_values: Dict[str, float] = None, max_values: Dict[str, float] = None,
+                  set_on_insert: Dict[str, Any] = None, block: bool = True) -> bool:
+        """Merge an update for the rollup document identified by key"""
+        key_tuple = tuple(sorted(key.items()))
+        update = self._updates.get(key_tuple)
+        if update is None:
+            if not await self._reserve(block):
+                return False
+            update = self._updates.setdefault(key_tuple, {
+                "filter": key, "$inc": {}, "$min": {}, "$max": {}, "$setOnInsert": {}
+            })
+
+        self._merge(update, inc, min_values, max_values, set_on_insert)
+        self._after_add()
+        return True
+
+    @staticmethod
+    def _merge(update: Dict[str, Any], inc: Dict[str, float] = None, min_values: Dict[str, float] = None,
+               max_values: Dict[str, float] = None, set_on_insert: Dict[str, Any] = None):
+        """Fold a later update into a buffered one: sums, running min/max, later values win"""
+        for field, amount in (inc or {}).items():
+            update["$inc"][field] = update["$inc"].get(field, 0) + amount
+        for field, value in (min_values or {}).items():
+            current = update["$min"].get(field)
+            update["$min"][field] = value if current is None else min(current, value)
+        for field, value in (max_values or {}).items():
+            current = update["$max"].get(field)
+            update["$max"][field] = value if current is None else max(current, value)
+        update["$setOnInsert"].update(set_on_insert or {})
+
+    def _take_batch(self) -> List[Dict[str, Any]]:
+        keys = list(self._updates.keys())[:self.max_batch]
+        return [self._updates.pop(key) for key in keys]
+
+    async def _write(self, collection, batch: List[Dict[str, Any]]) -> int:
+        operations = []
+        for update in batch:
+            document = {op: fields for op, fields in update.items() if op != "filter" and fields}
+            operations.append(UpdateOne(update["filter"], document, upsert=self.upsert))
+        await collection.bulk_write(operations, ordered=False)
+        return len(operations)
+
+    def _requeue(self, batch: List[Dict[str, Any]], error: Exception) -> int:
+        dropped = 0
+        if isinstance(error, BulkWriteError):
+            # Unordered: operations not listed in writeErrors were applied; of those listed
+            # only duplicate keys from concurrent upserts of a new document are worth retrying
+            failed = {write_error["index"] for write_error in error.details.get("writeErrors", [])
+                      if write_error.get("code") == 11000}
+            dropped = len(error.details.get("writeErrors", [])) - len(failed)
+            batch = [update for position, update in enumerate(batch) if position in failed]
+        elif write_outcome_unknown(error):
+            return len(batch)
+        for update in batch:
+            key_tuple = tuple(sorted(update["filter"].items()))
+            newer = self._updates.get(key_tuple)
+            if newer is not None:
+                # The key got updates while the batch was being written; fold them in
+                self._merge(update, newer["$inc"], newer["$min"], newer["$max"], newer["$setOnInsert"])
+            elif len(self._updates) >= self.max_pending:
+                dropped += 1
+                continue
+            self._updates[key_tuple] = update
+        return dropped
+
+def get_writer_stats() -> List[Dict[str, Any]]:
+    """Stats for every write-behind buffer in this process"""
+    return [writer.get_stats() for writer in _writers]
+
+async def drain_all_writers() -> int:
+    """Flush all write-behind buffers; called from the application lifespan"""
+    total = 0
+    for writer in _writers:
+        total += await writer.drain()
+    return total
+
+def minute_bucket(timestamp: float = None) -> datetime:
+    """UTC datetime truncated to the minute, for per-minute rollup keys"""
+    return datetime.utcfromtimestamp(int((timestamp or time.time()) // 60 * 60))
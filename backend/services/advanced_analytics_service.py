@@ -14,9 +14,9 @@ class AdvancedAnalyticsService:
     
     async def get_database(self):
         """Get database connection with lazy initialization"""
-        if not self.db:
-            from core.database import get_database_async
-            self.db = await get_database_async()
+        if self.db is None:
+            from core.database import get_analytics_database_async
+            self.db = await get_analytics_database_async()
         return self.db
     
     async def get_overview(self, user_id: str, period: str = "30d"):
@@ -0,0 +1,193 @@
+"""
+Analytics Ingest Services
+Buffered event ingestion into a time-series collection with streaming
+hourly/daily counters
+"""
+
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from bson import ObjectId
+from pymongo.errors import CollectionInvalid, OperationFailure
+
+from core.config import settings
+from core.database import get_analytics_database, get_database
+from core.indexes import index, index_registry
+from core.logging import admin_logger
+from core.write_behind import BatchWriter, RollupBuffer
+
+EVENT_STREAM_COLLECTION = "analytics_event_stream"
+LIVE_COUNTER_COLLECTION = "analytics_live_counters"
+
+# Event fields that identify a rollup scope; stored under the time-series metaField
+SCOPE_FIELDS = {"user": "user_id", "workspace": "workspace_id", "bio_site": "bio_site_id"}
+
+COUNTER_GRANULARITIES = ("hour", "day")
+
+index_registry.register(
+    __name__,
+    index(EVENT_STREAM_COLLECTION, "meta.user_id", "timestamp"),
+    index(EVENT_STREAM_COLLECTION, "meta.workspace_id", "timestamp"),
+    index(EVENT_STREAM_COLLECTION, "meta.bio_site_id", "timestamp"),
+    index(LIVE_COUNTER_COLLECTION, "scope", "scope_id", "granularity", "bucket", unique=True),
+    index(LIVE_COUNTER_COLLECTION, "bucket", name="bucket_ttl",
+          expire_after_seconds=settings.ANALYTICS_LIVE_COUNTER_RETENTION_DAYS * 86400)
+)
+
+def counter_field(event_type: Optional[str]) -> str:
+    """Event type as a counter field name; '.' and a leading '$' would address subfields"""
+    name = (event_type or "unknown").replace(".", "_")
+    return f"_{name[1:]}" if name.startswith("$") else name
+
+def _stream_match(match: Dict[str, Any]) -> Dict[str, Any]:
+    """Rewrite a raw-event filter for the event stream, where scope ids live under meta"""
+    rewritten = {}
+    for key, value in match.items():
+        if key in SCOPE_FIELDS.values():
+            rewritten[f"meta.{key}"] = value
+        elif key in ("$and", "$or", "$nor"):
+            rewritten[key] = [_stream_match(clause) for clause in value]
+        else:
+            rewritten[key] = value
+    return rewritten
+
+def raw_event_stages(match: Dict[str, Any], include_stream: bool = True) -> List[Dict[str, Any]]:
+    """Leading stages for a pipeline on analytics_events that also reads the event stream
+
+    Stream documents are flattened to the analytics_events shape, so the stages
+    that follow work on both unchanged.
+    """
+    if not include_stream:
+        return [{"$match": match}]
+    return [
+        {"$match": match},
+        {"$unionWith": {"coll": EVENT_STREAM_COLLECTION, "pipeline": [
+            {"$match": _stream_match(match)},
+            {"$addFields": {field: f"$meta.{field}" for field in SCOPE_FIELDS.values()}},
+            {"$project": {"meta": 0}}
+        ]}}
+    ]
+
+def bucket_start(moment: datetime, granularity: str) -> datetime:
+    if granularity == "hour":
+        return moment.replace(minute=0, second=0, microsecond=0)
+    return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+
+class AnalyticsIngestService:
+    """Accepts events without a round trip per event
+
+    Events queue in a bounded BatchWriter flushed with unordered insert_many;
+    producers wait (backpressure) rather than grow memory when it is full.
+    Counters merge in a RollupBuffer, so a burst on one page costs one upsert
+    per counter document per flush. Both buffers are drained on shutdown.
+    """
+
+    def __init__(self):
+        self.events = BatchWriter(
+            "analytics_events", EVENT_STREAM_COLLECTION,
+            max_batch=settings.ANALYTICS_INGEST_BATCH_SIZE,
+            flush_interval=settings.ANALYTICS_INGEST_FLUSH_SECONDS,
+            max_pending=settings.ANALYTICS_INGEST_MAX_PENDING
+        )
+        self.counters = RollupBuffer(
+            "analytics_live_counters", LIVE_COUNTER_COLLECTION,
+            max_batch=1000, flush_interval=5.0, max_pending=50000
+        )
+        self.timeseries = False
+
+    async def ensure_collection(self) -> bool:
+        """Create the event stream as a time-series collection before the first flush
+
+        Must run before traffic: an insert into a missing collection would create
+        a regular one. Servers without time-series support (< 5.0) get a regular
+        collection with the same document shape.
+        """
+        db = get_database()
+        cursor = await db.list_collections(filter={"name": EVENT_STREAM_COLLECTION})
+        existing = await cursor.to_list(length=1)
+        if existing:
+            self.timeseries = existing[0].get("type") == "timeseries"
+            return self.timeseries
+
+        try:
+            await db.create_collection(
+                EVENT_STREAM_COLLECTION,
+                timeseries={"timeField": "timestamp", "metaField": "meta", "granularity": "seconds"},
+                expireAfterSeconds=settings.ANALYTICS_EVENT_RETENTION_DAYS * 86400
+            )
+            self.timeseries = True
+        except CollectionInvalid:
+            # Another worker created it first
+            self.timeseries = True
+        except OperationFailure as e:
+            self.timeseries = False
+            admin_logger.log_system_event("ANALYTICS_TIMESERIES_UNAVAILABLE", {
+                "collection": EVENT_STREAM_COLLECTION,
+                "error": str(e)
+            }, "WARNING")
+        return self.timeseries
+
+    async def ingest(self, event_data: Dict[str, Any], block: bool = True) -> Optional[str]:
+        """Queue one event; returns its id, or None if shed (block=False under pressure)"""
+        event_id = ObjectId()
+        now = datetime.utcnow()
+        event_type = event_data.get("event_type")
+
+        meta = {}
+        for field in SCOPE_FIELDS.values():
+            value = event_data.get(field)
+            if value:
+                meta[field] = value
+
+        document = {
+            "_id": event_id,
+            "timestamp": now,
+            "meta": meta,
+            "event_type": event_type,
+            "properties": event_data.get("properties", {}),
+            "session_id": event_data.get("session_id"),
+            "ip_address": event_data.get("ip_address"),
+            "user_agent": event_data.get("user_agent"),
+            "referrer": event_data.get("referrer")
+        }
+        if not await self.events.add(document, block=block):
+            return None
+
+        increments = {"total": 1, f"events.{counter_field(event_type)}": 1}
+        buckets = [(granularity, bucket_start(now, granularity)) for granularity in COUNTER_GRANULARITIES]
+        for scope, field in SCOPE_FIELDS.items():
+            scope_id = meta.get(field)
+            if scope_id is None:
+                continue
+            for granularity, bucket in buckets:
+                await self.counters.add(
+                    {"scope": scope, "scope_id": scope_id, "granularity": granularity, "bucket": bucket},
+                    inc=increments,
+                    block=block
+                )
+        return str(event_id)
+
+    async def get_live_counts(self, scope: str, scope_id: Any, granularity: str = "hour",
+                              since: Optional[datetime] = None) -> List[Dict[str, Any]]:
+        """Streaming counters per bucket, oldest first (last 24 hours by default)
+
+        Counts pending in this worker's buffer show up after its next flush.
+        """
+        if granularity not in COUNTER_GRANULARITIES:
+            raise ValueError(f"granularity must be one of {COUNTER_GRANULARITIES}")
+        since = since or datetime.utcnow() - timedelta(hours=24)
+        counters = await get_analytics_database()[LIVE_COUNTER_COLLECTION].find(
+            {"scope": scope, "scope_id": scope_id, "granularity": granularity, "bucket": {"$gte": since}},
+            {"_id": 0, "bucket": 1, "total": 1, "events": 1}
+        ).sort("bucket", 1).to_list(length=None)
+        return counters
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "timeseries": self.timeseries,
+            "events": self.events.get_stats(),
+            "counters": self.counters.get_stats()
+        }
+
+# Global service instance
+analytics_ingest = AnalyticsIngestService()
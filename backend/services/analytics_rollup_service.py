@@ -0,0 +1,286 @@
+"""
+Analytics Rollup Services
+Daily pre-aggregated event counts so analytics reads scale with days, not events
+"""
+
+import asyncio
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from core.config import settings
+from core.database import get_analytics_database, get_database
+from core.indexes import index, index_registry
+from core.logging import admin_logger
+from services.analytics_ingest_service import EVENT_STREAM_COLLECTION, analytics_ingest, raw_event_stages
+
+ROLLUP_COLLECTION = "analytics_daily_rollups"
+STATE_COLLECTION = "analytics_rollup_state"
+
+# Rollup scope -> event field holding its id and the dimensions kept per day
+ROLLUP_SCOPES = {
+    "user": {"field": "user_id", "dimensions": ["event_type"]},
+    "workspace": {"field": "workspace_id", "dimensions": ["event_type", "user_id"]},
+    "bio_site": {"field": "bio_site_id", "dimensions": ["event_type"]},
+}
+
+index_registry.register(
+    __name__,
+    index(ROLLUP_COLLECTION, "scope", "scope_id", "day")
+)
+
+# Groupings the live daily counters can answer (they keep no user_id dimension)
+LIVE_GROUPS = {"day", "event_type"}
+
+TimeRange = Tuple[Optional[datetime], Optional[datetime]]
+
+def day_start(moment: datetime) -> datetime:
+    return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+
+def split_range(start: Optional[datetime], watermark: Optional[datetime]) -> Tuple[Optional[TimeRange], List[TimeRange]]:
+    """Split [start, now) into whole days served by rollups and the raw-event remainder
+
+    Rollups cover whole days before the watermark; a partial first day and
+    everything from the watermark on are read from raw events.
+    """
+    if watermark is None:
+        return None, [(start, None)]
+    if start is None:
+        return (None, watermark), [(watermark, None)]
+
+    first_full_day = start if start == day_start(start) else day_start(start) + timedelta(days=1)
+    if first_full_day >= watermark:
+        return None, [(start, None)]
+
+    raw_ranges = [(start, first_full_day)] if start < first_full_day else []
+    raw_ranges.append((watermark, None))
+    return (first_full_day, watermark), raw_ranges
+
+def _range_filter(field: str, time_range: TimeRange) -> Dict[str, Any]:
+    low, high = time_range
+    bounds = {}
+    if low is not None:
+        bounds["$gte"] = low
+    if high is not None:
+        bounds["$lt"] = high
+    return {field: bounds} if bounds else {}
+
+class AnalyticsRollupService:
+    """Builds analytics_daily_rollups from raw events and answers grouped counts from them"""
+
+    # The watermark (first day not rolled up) is re-read at most this often
+    WATERMARK_CACHE_SECONDS = 60
+    MAX_DAYS_PER_RUN = 31
+
+    def __init__(self):
+        self._watermark: Optional[datetime] = None
+        self._watermark_loaded_at = 0.0
+        self._refresh_task: Optional[asyncio.Task] = None
+
+    async def get_watermark(self) -> Optional[datetime]:
+        """Start of the first day not yet rolled up; None before the first run"""
+        now = time.monotonic()
+        if now - self._watermark_loaded_at > self.WATERMARK_CACHE_SECONDS:
+            state = await get_analytics_database()[STATE_COLLECTION].find_one({"_id": "daily"})
+            self._watermark = state.get("rolled_through") if state else None
+            self._watermark_loaded_at = now
+        return self._watermark
+
+    @staticmethod
+    def _day_pipeline(scope: str, day: datetime) -> List[Dict[str, Any]]:
+        """Group one day of raw events into rollup documents and $merge them in place"""
+        config = ROLLUP_SCOPES[scope]
+        field = config["field"]
+        dimensions = config["dimensions"]
+
+        group_id = {"scope_id": f"${field}", "day": {"$dateTrunc": {"date": "$timestamp", "unit": "day"}}}
+        rollup_id = [scope, "|", {"$toString": "$_id.scope_id"}, "|",
+                     {"$dateToString": {"date": "$_id.day", "format": "%Y-%m-%d"}}]
+        for dimension in dimensions:
+            group_id[dimension] = f"${dimension}"
+            rollup_id.extend(["|", {"$ifNull": [{"$toString": f"$_id.{dimension}"}, ""]}])
+
+        return [
+            *raw_event_stages({
+                "timestamp": {"$gte": day, "$lt": day + timedelta(days=1)},
+                field: {"$nin": [None, ""]}
+            }),
+            {"$group": {"_id": group_id, "count": {"$sum": 1}}},
+            {"$project": {
+                "_id": {"$concat": rollup_id},
+                "scope": {"$literal": scope},
+                "scope_id": "$_id.scope_id",
+                "day": "$_id.day",
+                **{dimension: f"$_id.{dimension}" for dimension in dimensions},
+                "count": 1
+            }},
+            # Replace keeps re-runs idempotent
+            {"$merge": {"into": ROLLUP_COLLECTION, "on": "_id", "whenMatched": "replace", "whenNotMatched": "insert"}}
+        ]
+
+    async def build_daily_rollups(self, rebuild_from: Optional[datetime] = None,
+                                  max_days: Optional[int] = None) -> Dict[str, Any]:
+        """Roll complete days up to yesterday, resuming from the stored watermark
+
+        The last ANALYTICS_ROLLUP_LATE_DAYS rolled days are rolled again on
+        every run so events arriving late for them are still counted.
+        rebuild_from re-rolls from that day on, e.g. after backfilling events.
+        """
+        db = get_database()
+        today = day_start(datetime.utcnow())
+        max_days = max_days or self.MAX_DAYS_PER_RUN
+
+        rolled_through = None
+        if rebuild_from is not None:
+            watermark = day_start(rebuild_from)
+        else:
+            state = await db[STATE_COLLECTION].find_one({"_id": "daily"})
+            watermark = rolled_through = state.get("rolled_through") if state else None
+            if watermark is not None:
+                watermark = min(watermark, today - timedelta(days=settings.ANALYTICS_ROLLUP_LATE_DAYS))
+        if watermark is None:
+            first_events = [
+                await db[collection].find_one(
+                    {"timestamp": {"$exists": True}}, {"timestamp": 1}, sort=[("timestamp", 1)]
+                )
+                for collection in ("analytics_events", EVENT_STREAM_COLLECTION)
+            ]
+            timestamps = [event["timestamp"] for event in first_events if event]
+            watermark = day_start(min(timestamps)) if timestamps else today
+
+        days_rolled = 0
+        days_rerolled = 0
+        while watermark < today and days_rolled + days_rerolled < max_days:
+            for scope in ROLLUP_SCOPES:
+                await db.analytics_events.aggregate(
+                    self._day_pipeline(scope, watermark), allowDiskUse=True
+                ).to_list(length=None)
+            watermark += timedelta(days=1)
+            # Re-rolling a late-event day leaves the stored watermark where it is
+            if rolled_through is not None and watermark <= rolled_through:
+                days_rerolled += 1
+                continue
+            days_rolled += 1
+            rolled_through = watermark
+            await db[STATE_COLLECTION].update_one(
+                {"_id": "daily"},
+                {"$set": {"rolled_through": watermark, "updated_at": datetime.utcnow()}},
+                upsert=True
+            )
+
+        self._watermark = rolled_through
+        self._watermark_loaded_at = time.monotonic()
+
+        result = {
+            "days_rolled": days_rolled,
+            "days_rerolled": days_rerolled,
+            "rolled_through": rolled_through.isoformat() if rolled_through else None,
+            "up_to_date": watermark >= today
+        }
+        if days_rolled:
+            admin_logger.log_system_event("ANALYTICS_ROLLUP", result, "INFO")
+        return result
+
+    async def _rollup_counts(self, scope: str, scope_id: Any, time_range: TimeRange,
+                             group_by: Sequence[str]) -> List[Dict[str, Any]]:
+        pipeline = [
+            {"$match": {"scope": scope, "scope_id": scope_id, **_range_filter("day", time_range)}},
+            {"$group": {"_id": {key: f"${key}" for key in group_by}, "count": {"$sum": "$count"}}}
+        ]
+        return await get_analytics_database()[ROLLUP_COLLECTION].aggregate(pipeline).to_list(length=None)
+
+    async def _raw_counts(self, scope: str, scope_id: Any, time_ranges: List[TimeRange],
+                          group_by: Sequence[str], include_stream: bool = True) -> List[Dict[str, Any]]:
+        field = ROLLUP_SCOPES[scope]["field"]
+        filters = [_range_filter("timestamp", time_range) for time_range in time_ranges]
+        match: Dict[str, Any] = {field: scope_id}
+        if len(filters) == 1:
+            match.update(filters[0])
+        else:
+            match["$or"] = filters
+        group_id = {
+            key: {"$dateTrunc": {"date": "$timestamp", "unit": "day"}} if key == "day" else f"${key}"
+            for key in group_by
+        }
+        pipeline = [
+            *raw_event_stages(match, include_stream),
+            {"$group": {"_id": group_id, "count": {"$sum": 1}}}
+        ]
+        return await get_analytics_database().analytics_events.aggregate(
+            pipeline, allowDiskUse=True
+        ).to_list(length=None)
+
+    async def _live_counts(self, scope: str, scope_id: Any, since: datetime,
+                           group_by: Sequence[str]) -> List[Dict[str, Any]]:
+        """Event stream counts per day from the live daily counters, shaped like _raw_counts rows
+
+        Event types come back as their counter field names (see counter_field).
+        """
+        rows = []
+        for counter in await analytics_ingest.get_live_counts(scope, scope_id, "day", since):
+            day = {"day": counter["bucket"]} if "day" in group_by else {}
+            if "event_type" in group_by:
+                rows.extend(
+                    {"_id": {**day, "event_type": event_type}, "count": count}
+                    for event_type, count in (counter.get("events") or {}).items()
+                )
+            else:
+                rows.append({"_id": day, "count": counter.get("total", 0)})
+        return rows
+
+    async def event_counts(self, scope: str, scope_id: Any, start: Optional[datetime] = None,
+                           group_by: Sequence[str] = ("event_type",)) -> List[Dict[str, Any]]:
+        """Event counts since start (all time if None) grouped by day and/or dimensions
+
+        Whole rolled-up days come from the rollups and the rest from raw events,
+        both aggregated server-side, so the cost depends on the number of days
+        and groups rather than on the number of events. When the grouping
+        allows it, event stream events after the watermark are read from the
+        live daily counters instead, so today's numbers cost one document per
+        day; only events inserted into analytics_events directly are still
+        aggregated for that stretch.
+        """
+        allowed = {"day", *ROLLUP_SCOPES[scope]["dimensions"]}
+        if not set(group_by) <= allowed:
+            raise ValueError(f"{scope} rollups can be grouped by {sorted(allowed)}")
+
+        rollup_range, raw_ranges = split_range(start, await self.get_watermark())
+        queries = []
+        tail_start, tail_end = raw_ranges[-1]
+        if set(group_by) <= LIVE_GROUPS and tail_start is not None and tail_end is None \
+                and tail_start == day_start(tail_start):
+            # Daily counter buckets line up with a tail starting on a day boundary
+            raw_ranges = raw_ranges[:-1]
+            queries.append(self._raw_counts(scope, scope_id, [(tail_start, None)], group_by, include_stream=False))
+            queries.append(self._live_counts(scope, scope_id, tail_start, group_by))
+        if raw_ranges:
+            queries.append(self._raw_counts(scope, scope_id, raw_ranges, group_by))
+        if rollup_range is not None:
+            queries.append(self._rollup_counts(scope, scope_id, rollup_range, group_by))
+
+        merged: Dict[Tuple, int] = {}
+        for rows in await asyncio.gather(*queries):
+            for row in rows:
+                key = tuple(row["_id"].get(name) for name in group_by)
+                merged[key] = merged.get(key, 0) + row["count"]
+        return [{**dict(zip(group_by, key)), "count": count} for key, count in merged.items()]
+
+    def start_background_refresh(self, interval_seconds: float):
+        """Keep rollups current from inside the app; re-runs are idempotent across workers"""
+        async def run():
+            while True:
+                try:
+                    await self.build_daily_rollups()
+                except Exception as e:
+                    admin_logger.log_system_event("ANALYTICS_ROLLUP_ERROR", {"error": str(e)}, "ERROR")
+                await asyncio.sleep(interval_seconds)
+
+        self._refresh_task = asyncio.get_running_loop().create_task(run())
+
+    def stop(self):
+        if self._refresh_task is not None:
+            self._refresh_task.cancel()
+            self._refresh_task = None
+
+# Global service instance
+analytics_rollups = AnalyticsRollupService()
@@ -4,12 +4,23 @@ Professional Mewayz Platform
 """
 from typing import Dict, Any, List, Optional
 from datetime import datetime, timedelta
-from collections import defaultdict
-import uuid
+import asyncio
 
-from core.database import (
-    get_analytics_collection, get_users_collection, 
-    get_workspaces_collection, get_bio_sites_collection
+from core.database import get_analytics_database
+from core.indexes import index, index_registry
+from services.analytics_ingest_service import EVENT_STREAM_COLLECTION, analytics_ingest, raw_event_stages
+from services.analytics_rollup_service import analytics_rollups
+
+index_registry.register(
+    __name__,
+    index("analytics_events", "user_id", ("timestamp", -1)),
+    # Events written by the analytics_system API use created_at
+    index("analytics_events", "user_id", ("created_at", -1)),
+    index("analytics_events", "workspace_id", ("timestamp", -1),
+          partial_filter={"workspace_id": {"$exists": True}}),
+    index("analytics_events", "bio_site_id", ("timestamp", -1),
+          partial_filter={"bio_site_id": {"$exists": True}}),
+    index("analytics_events", ("timestamp", -1))
 )
 
 class AnalyticsService:
@@ -20,35 +31,28 @@ class AnalyticsService:
         self.bio_sites_collection = None
     
     def _ensure_collections(self):
-        """Ensure collections are initialized"""
+        """Ensure collections are initialized
+        
+        Reads go to secondaries per MONGO_ANALYTICS_READ_PREFERENCE; track_event
+        writes through analytics_ingest on the primary.
+        """
+        analytics_db = get_analytics_database()
         if self.analytics_collection is None:
-            self.analytics_collection = get_analytics_collection()
+            self.analytics_collection = analytics_db.analytics_events
         if self.users_collection is None:
-            self.users_collection = get_users_collection()
+            self.users_collection = analytics_db.users
         if self.workspaces_collection is None:
-            self.workspaces_collection = get_workspaces_collection()
+            self.workspaces_collection = analytics_db.workspaces
         if self.bio_sites_collection is None:
-            self.bio_sites_collection = get_bio_sites_collection()
+            self.bio_sites_collection = analytics_db.bio_sites
 
     async def track_event(self, event_data: Dict[str, Any]) -> str:
-        """Track analytics event with real database operations"""
-        self._ensure_collections()
-        
-        event_doc = {
-            "_id": str(uuid.uuid4()),
-            "event_type": event_data.get("event_type"),
-            "user_id": event_data.get("user_id"),
-            "workspace_id": event_data.get("workspace_id"),
-            "properties": event_data.get("properties", {}),
-            "timestamp": datetime.utcnow(),
-            "session_id": event_data.get("session_id"),
-            "ip_address": event_data.get("ip_address"),
-            "user_agent": event_data.get("user_agent"),
-            "referrer": event_data.get("referrer")
-        }
-        
-        result = await self.analytics_collection.insert_one(event_doc)
-        return str(result.inserted_id)
+        """Track analytics event
+
+        Buffered into the analytics_event_stream time-series collection and the
+        live hourly/daily counters; the write happens on the next batch flush.
+        """
+        return await analytics_ingest.ingest(event_data)
 
     async def get_user_analytics(self, user_id: str, days: int = 30) -> Dict[str, Any]:
         """Get real user analytics from database"""
@@ -56,29 +60,22 @@ class AnalyticsService:
         
         start_date = datetime.utcnow() - timedelta(days=days)
         
-        # Get events for this user
-        events = await self.analytics_collection.find({
-            "user_id": user_id,
-            "timestamp": {"$gte": start_date}
-        }).to_list(length=None)
-        
-        # Calculate real statistics
-        total_events = len(events)
-        
-        # Group events by type
-        events_by_type = defaultdict(int)
-        events_by_day = defaultdict(int)
-        
-        for event in events:
-            events_by_type[event["event_type"]] += 1
-            day_key = event["timestamp"].strftime("%Y-%m-%d")
-            events_by_day[day_key] += 1
-        
-        # Get user workspaces count
-        workspace_count = await self.workspaces_collection.count_documents({"owner_id": user_id})
-        
-        # Get bio sites count
-        bio_sites_count = await self.bio_sites_collection.count_documents({"user_id": user_id})
+        # Counts by day and type come from daily rollups plus the live daily
+        # counters for the not yet rolled-up tail
+        counts, workspace_count, bio_sites_count = await asyncio.gather(
+            analytics_rollups.event_counts("user", user_id, start_date, group_by=("day", "event_type")),
+            self.workspaces_collection.count_documents({"owner_id": user_id}),
+            self.bio_sites_collection.count_documents({"user_id": user_id})
+        )
+        
+        events_by_type: Dict[str, int] = {}
+        events_by_day: Dict[str, int] = {}
+        for row in counts:
+            event_type = row["event_type"] or "unknown"
+            day_key = row["day"].strftime("%Y-%m-%d")
+            events_by_type[event_type] = events_by_type.get(event_type, 0) + row["count"]
+            events_by_day[day_key] = events_by_day.get(day_key, 0) + row["count"]
+        total_events = sum(events_by_type.values())
         
         analytics_data = {
             "summary": {
@@ -93,8 +90,8 @@ class AnalyticsService:
                     "days": days
                 }
             },
-            "events_by_type": dict(events_by_type),
-            "daily_activity": dict(events_by_day),
+            "events_by_type": events_by_type,
+            "daily_activity": dict(sorted(events_by_day.items())),
             "top_activities": sorted(events_by_type.items(), key=lambda x: x[1], reverse=True)[:10]
         }
         
@@ -104,55 +101,44 @@ class AnalyticsService:
         """Get bio site analytics with real database calculations"""
         self._ensure_collections()
         
-        # Get events for this bio site
-        bio_site_events = await self.analytics_collection.find({
-            "bio_site_id": bio_site_id
-        }).to_list(length=None)
+        start_of_month = datetime.utcnow().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        all_time, this_month = await asyncio.gather(
+            analytics_rollups.event_counts("bio_site", bio_site_id),
+            analytics_rollups.event_counts("bio_site", bio_site_id, start_of_month)
+        )
         
-        # Calculate metrics
-        total_views = sum(1 for event in bio_site_events if event.get("event_type") == "bio_site_view")
-        total_clicks = sum(1 for event in bio_site_events if event.get("event_type") == "link_click")
+        def count_of(rows: List[Dict[str, Any]], event_type: str) -> int:
+            return sum(row["count"] for row in rows if row["event_type"] == event_type)
         
-        # Get this month's data
-        start_of_month = datetime.utcnow().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        views_this_month = sum(1 for event in bio_site_events 
-                             if event.get("event_type") == "bio_site_view" 
-                             and event.get("timestamp", datetime.min) >= start_of_month)
+        total_views = count_of(all_time, "bio_site_view")
+        total_clicks = count_of(all_time, "link_click")
         
         return {
             "total_views": total_views,
             "total_clicks": total_clicks,
-            "views_this_month": views_this_month,
+            "views_this_month": count_of(this_month, "bio_site_view"),
             "click_through_rate": round((total_clicks / max(total_views, 1)) * 100, 2)
         }
 
     async def get_workspace_analytics(self, workspace_id: str, days: int = 30) -> Dict[str, Any]:
         """Get real workspace analytics from database"""
+        self._ensure_collections()
+        
         start_date = datetime.utcnow() - timedelta(days=days)
         
-        # Get workspace info
-        workspace = await self.workspaces_collection.find_one({"_id": workspace_id})
+        workspace, counts = await asyncio.gather(
+            self.workspaces_collection.find_one({"_id": workspace_id}),
+            analytics_rollups.event_counts("workspace", workspace_id, start_date, group_by=("user_id",))
+        )
         if not workspace:
             raise ValueError("Workspace not found")
         
-        # Get events for this workspace
-        events = await self.analytics_collection.find({
-            "workspace_id": workspace_id,
-            "timestamp": {"$gte": start_date}
-        }).to_list(length=None)
-        
-        # Get unique users in this workspace
-        unique_users = set()
-        events_by_user = defaultdict(int)
-        
-        for event in events:
-            if event.get("user_id"):
-                unique_users.add(event["user_id"])
-                events_by_user[event["user_id"]] += 1
+        total_events = sum(row["count"] for row in counts)
+        events_by_user = {row["user_id"]: row["count"] for row in counts if row["user_id"]}
         
         # Calculate member activity
         member_count = len(workspace.get("members", []))
-        active_members = len(unique_users)
+        active_members = len(events_by_user)
         
         analytics_data = {
             "workspace_info": {
@@ -163,12 +149,12 @@ class AnalyticsService:
                 "member_count": member_count
             },
             "activity_summary": {
-                "total_events": len(events),
+                "total_events": total_events,
                 "active_members": active_members,
                 "activity_rate": round((active_members / member_count) * 100, 2) if member_count > 0 else 0,
-                "avg_events_per_member": round(len(events) / active_members, 2) if active_members > 0 else 0
+                "avg_events_per_member": round(total_events / active_members, 2) if active_members > 0 else 0
             },
-            "member_activity": dict(events_by_user),
+            "member_activity": events_by_user,
             "date_range": {
                 "start": start_date.isoformat(),
                 "end": datetime.utcnow().isoformat(),
@@ -185,22 +171,25 @@ class AnalyticsService:
         # Calculate date range
         start_date = datetime.utcnow() - timedelta(days=days)
         
-        # Get user events in date range
-        user_events = await self.analytics_collection.find({
-            "user_id": user_id,
-            "timestamp": {"$gte": start_date}
-        }).to_list(length=None)
-        
-        # Calculate metrics
-        total_events = len(user_events)
-        unique_sessions = len(set(event.get("session_id") for event in user_events if event.get("session_id")))
-        avg_daily_events = total_events / max(days, 1)
+        # Type breakdown and distinct sessions in one server-side pass
+        result = await self.analytics_collection.aggregate([
+            *raw_event_stages({"user_id": user_id, "timestamp": {"$gte": start_date}}),
+            {"$facet": {
+                "event_types": [{"$group": {"_id": "$event_type", "count": {"$sum": 1}}}],
+                "sessions": [
+                    {"$match": {"session_id": {"$nin": [None, ""]}}},
+                    {"$group": {"_id": "$session_id"}},
+                    {"$count": "count"}
+                ]
+            }}
+        ], allowDiskUse=True).to_list(length=1)
+        facets = result[0] if result else {"event_types": [], "sessions": []}
         
         # Event breakdown
-        event_types = {}
-        for event in user_events:
-            event_type = event.get("event_type", "unknown")
-            event_types[event_type] = event_types.get(event_type, 0) + 1
+        event_types = {(item["_id"] or "unknown"): item["count"] for item in facets["event_types"]}
+        total_events = sum(event_types.values())
+        unique_sessions = facets["sessions"][0]["count"] if facets["sessions"] else 0
+        avg_daily_events = total_events / max(days, 1)
         
         # Generate cache key for consistency
         cache_key = f"analytics_overview_{user_id}_{days}_{start_date.strftime('%Y-%m-%d')}"
@@ -242,9 +231,11 @@ class AnalyticsService:
         subscription_breakdown = {item["_id"]: item["count"] for item in subscription_dist}
         
         # Get recent activity
-        recent_events = await self.analytics_collection.count_documents({
-            "timestamp": {"$gte": datetime.utcnow() - timedelta(hours=24)}
-        })
+        recent_filter = {"timestamp": {"$gte": datetime.utcnow() - timedelta(hours=24)}}
+        recent_events = sum(await asyncio.gather(
+            self.analytics_collection.count_documents(recent_filter),
+            get_analytics_database()[EVENT_STREAM_COLLECTION].count_documents(recent_filter)
+        ))
         
         overview_data = {
             "platform_statistics": {
@@ -273,7 +264,7 @@ class AnalyticsService:
         
         # Get feature usage events
         pipeline = [
-            {"$match": query},
+            *raw_event_stages(query),
             {"$group": {
                 "_id": "$event_type",
                 "usage_count": {"$sum": 1},
@@ -6,6 +6,7 @@ Professional Mewayz Platform
 from datetime import datetime, timedelta
 from typing import Dict, Any, Optional
 from core.database import get_database
+from core.auth_cache import auth_cache
 from passlib.context import CryptContext
 import uuid
 
@@ -72,6 +73,7 @@ class AuthService:
             {"_id": user_id},
             {"$set": {"last_login": datetime.utcnow()}}
         )
+        auth_cache.invalidate_user(user_id)
 
 
     async def get_database(self):
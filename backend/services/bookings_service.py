@@ -6,8 +6,15 @@ Professional Mewayz Platform
 from datetime import datetime, timedelta
 from typing import Dict, Any, List, Optional
 from core.database import get_database
+from core.indexes import index, index_registry
 import uuid
 
+index_registry.register(
+    __name__,
+    index("bookings", "user_id", "booking_date"),
+    index("bookings", "user_id", "service_id", "booking_date")
+)
+
 class BookingsService:
     """Service for bookings management operations"""
     
@@ -6,23 +6,54 @@ Professional Mewayz Platform
 from datetime import datetime
 from typing import Dict, Any, List, Optional
 from core.database import get_database
+from core.performance_optimizer import cache_result
 import uuid
 
 class CRMService:
     """Service for CRM operations"""
     
     @staticmethod
-    async def get_contacts(user_id: str):
-        """Get user's CRM contacts"""
-        db = await get_database()
+    @cache_result(expiration=60, key_prefix="crm", tags=["collection:contacts:workspace:{workspace_id}"])
+    async def get_contacts(workspace_id: str, status_filter: Optional[str] = None, search: Optional[str] = None,
+                           limit: int = 50, page: int = 1):
+        """Page of a workspace's CRM contacts, newest first"""
+        db = get_database()
         
-        contacts = await db.crm_contacts.find({"user_id": user_id}).sort("created_at", -1).to_list(length=None)
-        return contacts
+        query = {"workspace_id": workspace_id}
+        if status_filter:
+            query["status"] = status_filter
+        if search:
+            query["$or"] = [
+                {"first_name": {"$regex": search, "$options": "i"}},
+                {"last_name": {"$regex": search, "$options": "i"}},
+                {"email": {"$regex": search, "$options": "i"}},
+                {"company": {"$regex": search, "$options": "i"}}
+            ]
+        
+        total_contacts = await db.contacts.count_documents(query)
+        skip = (page - 1) * limit
+        contacts = await db.contacts.find(query).sort("created_at", -1).skip(skip).limit(limit).to_list(length=None)
+        
+        for contact in contacts:
+            contact["id"] = str(contact["_id"])
+            contact["full_name"] = f"{contact['first_name']} {contact.get('last_name', '')}".strip()
+            contact["last_activity"] = contact.get("updated_at", contact["created_at"])
+        
+        return {
+            "contacts": contacts,
+            "pagination": {
+                "current_page": page,
+                "total_pages": (total_contacts + limit - 1) // limit,
+                "total_contacts": total_contacts,
+                "has_next": skip + limit < total_contacts,
+                "has_prev": page > 1
+            }
+        }
     
     @staticmethod
     async def create_contact(user_id: str, contact_data: Dict[str, Any]):
         """Create new CRM contact"""
-        db = await get_database()
+        db = get_database()
         
         contact = {
     "_id": str(uuid.uuid4()),
@@ -44,17 +75,32 @@ class CRMService:
         return contact
     
     @staticmethod
-    async def get_deals(user_id: str):
-        """Get user's CRM deals"""
-        db = await get_database()
+    @cache_result(expiration=60, key_prefix="crm", tags=["collection:deals:workspace:{workspace_id}"])
+    async def get_deals(workspace_id: str, stage_filter: Optional[str] = None, limit: int = 50):
+        """A workspace's most recent CRM deals, also grouped by stage"""
+        db = get_database()
+        
+        query = {"workspace_id": workspace_id}
+        if stage_filter:
+            query["stage"] = stage_filter
+        
+        deals = await db.deals.find(query).sort("created_at", -1).limit(limit).to_list(length=None)
+        
+        pipeline = {}
+        for deal in deals:
+            deal["id"] = str(deal["_id"])
+            pipeline.setdefault(deal["stage"], []).append(deal)
         
-        deals = await db.crm_deals.find({"user_id": user_id}).sort("created_at", -1).to_list(length=None)
-        return deals
+        return {
+            "deals": deals,
+            "pipeline": pipeline,
+            "total_value": sum(deal.get("value", 0) for deal in deals)
+        }
     
     @staticmethod
     async def create_deal(user_id: str, deal_data: Dict[str, Any]):
         """Create new CRM deal"""
-        db = await get_database()
+        db = get_database()
         
         deal = {
     "_id": str(uuid.uuid4()),
@@ -3,60 +3,123 @@ Dashboard Services Business Logic
 Professional Mewayz Platform
 """
 
+import asyncio
 from datetime import datetime, timedelta
 from typing import Dict, Any, List, Optional
+from core.cache import CacheTags, cache_manager
 from core.database import get_database
+from core.indexes import index, index_registry
+from core.write_behind import BatchWriter
+
+index_registry.register(
+    __name__,
+    index("workspaces", "user_id"),
+    index("projects", "user_id", "status"),
+    index("user_activities", "user_id", ("timestamp", -1)),
+    index("page_visits", "user_id", "visited_at"),
+    index("user_actions", "user_id", "status"),
+    index("user_sessions", "user_id", "is_active", "expires_at")
+)
+
+# Dashboard views are recorded off the request path
+activity_writer = BatchWriter("dashboard_activity", "user_activities", max_batch=200, flush_interval=2.0)
+
+ACTIVE_PROJECT_STATUSES = ["active", "in_progress"]
 
 class DashboardService:
     """Service for dashboard data operations"""
     
+    # Overview read model: cached per user, dropped by writes to its source collections
+    OVERVIEW_CACHE_SECONDS = 60
+    OVERVIEW_STALE_SECONDS = 30
+    OVERVIEW_SOURCES = ["workspaces", "projects"]
+    
+    @staticmethod
+    def overview_tags(user_id: str) -> List[str]:
+        return [CacheTags.user(user_id)] + [
+            CacheTags.collection(collection, user_id) for collection in DashboardService.OVERVIEW_SOURCES
+        ]
+    
     @staticmethod
     async def get_dashboard_overview(user_id: str):
         """Get user dashboard overview with real database data"""
-        db = await get_database()
-        
-        # Get user's workspaces
-        workspaces = await db.workspaces.find({"user_id": user_id}).to_list(length=None)
-        
-        # Get user's projects
-        projects = await db.projects.find({"user_id": user_id}).to_list(length=None)
-        active_projects = await db.projects.count_documents({
-            "user_id": user_id, 
-            "status": {"$in": ["active", "in_progress"]}
-        })
+        overview = await cache_manager.get_or_load(
+            f"dashboard:overview:{user_id}",
+            lambda: DashboardService._load_dashboard_overview(user_id),
+            expire_seconds=DashboardService.OVERVIEW_CACHE_SECONDS,
+            stale_seconds=DashboardService.OVERVIEW_STALE_SECONDS,
+            tags=DashboardService.overview_tags(user_id)
+        )
         
-        # Get user analytics data
-        analytics_data = await db.analytics.find_one({"user_id": user_id}) or {}
+        # Store dashboard view for analytics
+        await activity_writer.add({
+            "user_id": user_id,
+            "type": "dashboard_view",
+            "message": "Dashboard accessed",
+            "timestamp": datetime.utcnow(),
+            "metadata": {"workspaces_count": overview["user_stats"]["workspaces"]}
+        }, block=False)
         
-        # Get recent user activities
-        recent_activities = await db.user_activities.find({
-            "user_id": user_id
-        }).sort("timestamp", -1).limit(10).to_list(length=10)
+        return overview
+    
+    @staticmethod
+    async def _count_user_actions(db, user_id: str) -> Dict[str, int]:
+        """Total and completed actions in one pass over the user's index range"""
+        result = await db.user_actions.aggregate([
+            {"$match": {"user_id": user_id}},
+            {"$group": {
+                "_id": None,
+                "total": {"$sum": 1},
+                "completed": {"$sum": {"$cond": [{"$eq": ["$status", "completed"]}, 1, 0]}}
+            }}
+        ]).to_list(length=1)
+        return result[0] if result else {"total": 0, "completed": 0}
+    
+    @staticmethod
+    async def _load_dashboard_overview(user_id: str) -> Dict[str, Any]:
+        """Build the overview with index-backed counts issued concurrently"""
+        db = get_database()
+        now = datetime.utcnow()
         
-        # Get user visits from analytics
-        user_visits = await db.page_visits.count_documents({
-            "user_id": user_id,
-            "visited_at": {"$gte": datetime.utcnow() - timedelta(days=30)}
-        })
+        (
+            workspaces_count,
+            active_projects,
+            analytics_data,
+            recent_activities,
+            user_visits,
+            actions,
+            active_sessions
+        ) = await asyncio.gather(
+            db.workspaces.count_documents({"user_id": user_id}),
+            db.projects.count_documents({
+                "user_id": user_id,
+                "status": {"$in": ACTIVE_PROJECT_STATUSES}
+            }),
+            db.analytics.find_one({"user_id": user_id}, {"avg_response_time": 1, "uptime": 1}),
+            db.user_activities.find(
+                {"user_id": user_id},
+                {"_id": 0, "type": 1, "message": 1, "timestamp": 1}
+            ).sort("timestamp", -1).limit(10).to_list(length=10),
+            db.page_visits.count_documents({
+                "user_id": user_id,
+                "visited_at": {"$gte": now - timedelta(days=30)}
+            }),
+            DashboardService._count_user_actions(db, user_id),
+            db.user_sessions.count_documents({
+                "user_id": user_id,
+                "expires_at": {"$gt": now},
+                "is_active": True
+            })
+        )
+        analytics_data = analytics_data or {}
         
         # Calculate conversion rate from actual data
-        total_actions = await db.user_actions.count_documents({"user_id": user_id})
-        successful_actions = await db.user_actions.count_documents({
-            "user_id": user_id,
-            "status": "completed"
-        })
-        conversion_rate = (successful_actions / max(total_actions, 1)) * 100 if total_actions > 0 else 0
-        
-        # Get active sessions
-        active_sessions = await db.user_sessions.count_documents({
-            "user_id": user_id,
-            "expires_at": {"$gt": datetime.utcnow()},
-            "is_active": True
-        })
+        total_actions = actions["total"]
+        conversion_rate = (actions["completed"] / total_actions) * 100 if total_actions > 0 else 0
         
-        overview = {
+        return {
             "user_stats": {
-                "workspaces": len(workspaces),
+                "workspaces": workspaces_count,
                 "active_projects": active_projects,
                 "total_visits": user_visits or 0,
                 "conversion_rate": round(conversion_rate, 1)
@@ -65,14 +128,14 @@ class DashboardService:
                 {
                     "type": activity.get("type", "unknown"),
                     "message": activity.get("message", "Activity logged"),
-                    "timestamp": activity.get("timestamp", datetime.utcnow())
+                    "timestamp": activity.get("timestamp", now)
                 }
                 for activity in recent_activities
             ] if recent_activities else [
                 {
                     "type": "user_login",
                     "message": "Welcome! Start by creating your first workspace.",
-                    "timestamp": datetime.utcnow()
+                    "timestamp": now
                 }
             ],
             "quick_actions": [
@@ -86,17 +149,6 @@ class DashboardService:
                 "active_sessions": active_sessions
             }
         }
-        
-        # Store dashboard view for analytics
-        await db.user_activities.insert_one({
-            "user_id": user_id,
-            "type": "dashboard_view",
-            "message": "Dashboard accessed",
-            "timestamp": datetime.utcnow(),
-            "metadata": {"workspaces_count": len(workspaces)}
-        })
-        
-        return overview
 
 
     async def get_database(self):
@@ -6,23 +6,77 @@ Professional Mewayz Platform
 from datetime import datetime
 from typing import Dict, Any, List, Optional
 from core.database import get_database
+from core.cache import cache_manager
+from core.performance_optimizer import cache_result
 import uuid
 
 class EcommerceService:
     """Service for e-commerce operations"""
     
     @staticmethod
-    async def get_products(user_id: str):
-        """Get user's products"""
-        db = await get_database()
+    @cache_result(expiration=60, key_prefix="ecommerce", tags=["collection:products:user:{user_id}"])
+    async def get_products(user_id: str, category: Optional[str] = None, search: Optional[str] = None,
+                           limit: int = 20, page: int = 1):
+        """Page of user's active products with sales analytics"""
+        db = get_database()
         
-        products = await db.products.find({"user_id": user_id}).to_list(length=None)
-        return products
+        query = {"user_id": user_id, "is_active": True}
+        if category:
+            query["category"] = category
+        if search:
+            query["$or"] = [
+                {"name": {"$regex": search, "$options": "i"}},
+                {"description": {"$regex": search, "$options": "i"}}
+            ]
+        
+        skip = (page - 1) * limit
+        products = await db.products.find(query).sort("created_at", -1).skip(skip).limit(limit).to_list(length=None)
+        total_products = await db.products.count_documents(query)
+        
+        for product in products:
+            product["analytics"] = await EcommerceService.get_product_analytics(product["_id"])
+        
+        return {
+            "products": products,
+            "pagination": {
+                "current_page": page,
+                "total_pages": (total_products + limit - 1) // limit,
+                "total_products": total_products,
+                "has_next": skip + limit < total_products,
+                "has_prev": page > 1
+            }
+        }
+    
+    @staticmethod
+    async def get_product_analytics(product_id: str) -> Dict[str, Any]:
+        """Units sold and revenue from completed orders containing the product"""
+        db = get_database()
+        
+        orders_with_product = await db.orders.find({
+            "items.product_id": product_id,
+            "status": {"$in": ["completed", "delivered"]}
+        }).to_list(length=None)
+        
+        total_sold = 0
+        total_revenue = 0.0
+        
+        for order in orders_with_product:
+            for item in order.get("items", []):
+                if item.get("product_id") == product_id:
+                    total_sold += item.get("quantity", 0)
+                    total_revenue += item.get("quantity", 0) * item.get("price", 0)
+        
+        return {
+            "total_sold": total_sold,
+            "total_revenue": round(total_revenue, 2),
+            "views": 0,  # Would be tracked from actual page views
+            "conversion_rate": 0.0  # Would be calculated from views vs purchases
+        }
     
     @staticmethod
     async def create_product(user_id: str, product_data: Dict[str, Any]):
         """Create new product"""
-        db = await get_database()
+        db = get_database()
         
         product = {
     "_id": str(uuid.uuid4()),
@@ -38,12 +92,13 @@ class EcommerceService:
     }
         
         result = await db.products.insert_one(product)
+        await cache_manager.invalidate_collection_cache("products", user_id)
         return product
     
     @staticmethod
     async def get_orders(user_id: str):
         """Get user's orders"""
-        db = await get_database()
+        db = get_database()
         
         orders = await db.orders.find({"seller_id": user_id}).sort("created_at", -1).to_list(length=None)
         return orders
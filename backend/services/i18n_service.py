@@ -9,6 +9,7 @@ from typing import Optional, List, Dict, Any
 import json
 
 from core.database import get_database
+from core.auth_cache import auth_cache
 
 class I18nService:
     
@@ -528,6 +529,7 @@ class I18nService:
                 "language_updated_at": datetime.utcnow()
             }}
         )
+        auth_cache.invalidate_user(user_id)
         
         if result.matched_count == 0:
             raise Exception("User not found")
@@ -0,0 +1,183 @@
+"""
+Link Click Rollups
+Streaming per-link hourly counters by device/referrer/country and a daily
+HyperLogLog sketch of visitor IPs, so link analytics read buckets, not clicks
+"""
+
+import hashlib
+import math
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import urlparse
+
+from core.config import settings
+from core.database import get_database
+from core.indexes import index, index_registry
+from core.write_behind import RollupBuffer
+
+HOURLY_COLLECTION = "link_click_hourly"
+DAILY_COLLECTION = "link_click_daily"
+
+# 2^11 registers: ~2.3% standard error, at most 2048 small fields per link-day
+HLL_PRECISION = 11
+
+index_registry.register(
+    __name__,
+    index(HOURLY_COLLECTION, "link_id", "hour", unique=True),
+    index(DAILY_COLLECTION, "link_id", "day", unique=True)
+)
+
+if settings.LINK_CLICK_TTL_ENABLED:
+    # Raw clicks are only kept for recent-click listings once rollups exist.
+    # Opt-in: the TTL must not delete clicks the backfill has yet to replay.
+    index_registry.register(
+        __name__,
+        index("link_clicks", "clicked_at", name="clicked_at_ttl",
+              expire_after_seconds=settings.LINK_CLICK_RETENTION_DAYS * 86400)
+    )
+
+def _field_key(value: str) -> str:
+    """Counter field name for a value; '.' and a leading '$' would address subfields"""
+    value = value.replace(".", "．")
+    return f"＄{value[1:]}" if value.startswith("$") else value
+
+def _field_value(key: str) -> str:
+    return key.replace("．", ".").replace("＄", "$")
+
+def referer_domain(referer: Optional[str]) -> str:
+    if not referer:
+        return "direct"
+    try:
+        return urlparse(referer).netloc or "direct"
+    except ValueError:
+        return "other"
+
+class HyperLogLog:
+    """HyperLogLog sketch over sparse registers {index: rank}
+
+    Registers only ever grow, so sketches merge with a per-register max;
+    stored as one field per register, Mongo's $max merges them in place.
+    """
+
+    def __init__(self, precision: int = HLL_PRECISION, registers: Optional[Dict[str, int]] = None):
+        self.precision = precision
+        self.size = 1 << precision
+        self.registers: Dict[str, int] = dict(registers or {})
+
+    @staticmethod
+    def register_for(value: str, precision: int = HLL_PRECISION) -> Tuple[str, int]:
+        """(register index, rank) that value sets"""
+        hashed = int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), "big")
+        remaining_bits = 64 - precision
+        remainder = hashed & ((1 << remaining_bits) - 1)
+        return str(hashed >> remaining_bits), remaining_bits - remainder.bit_length() + 1
+
+    def add(self, value: str):
+        register, rank = self.register_for(value, self.precision)
+        if rank > self.registers.get(register, 0):
+            self.registers[register] = rank
+
+    def merge(self, registers: Dict[str, int]):
+        for register, rank in registers.items():
+            if rank > self.registers.get(register, 0):
+                self.registers[register] = rank
+
+    def estimate(self) -> int:
+        m = self.size
+        alpha = 0.7213 / (1 + 1.079 / m)
+        zeros = m - len(self.registers)
+        harmonic = zeros + sum(2.0 ** -rank for rank in self.registers.values())
+        estimate = alpha * m * m / harmonic
+        if estimate <= 2.5 * m and zeros:
+            # Small range correction: linear counting
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+class LinkClickRollupService:
+    """Per-link click rollups fed from the redirect path
+
+    Updates merge in RollupBuffers, so a viral link costs two upserts per flush
+    regardless of its click rate. Hourly documents carry device, referrer and
+    country counters; daily documents carry the click total and the sketch.
+    """
+
+    def __init__(self):
+        self.hourly = RollupBuffer("link_click_hourly", HOURLY_COLLECTION, max_batch=500,
+                                   flush_interval=5.0, max_pending=50000)
+        self.daily = RollupBuffer("link_click_daily", DAILY_COLLECTION, max_batch=500,
+                                  flush_interval=5.0, max_pending=20000)
+
+    async def record(self, link_id: str, clicked_at: datetime, device_type: str, referer: Optional[str],
+                     country: Optional[str], ip_address: Optional[str], block: bool = False) -> bool:
+        """Count one click; returns False if shed under pressure"""
+        hour = clicked_at.replace(minute=0, second=0, microsecond=0)
+        accepted = await self.hourly.add(
+            {"link_id": link_id, "hour": hour},
+            inc={
+                "clicks": 1,
+                f"devices.{_field_key(device_type or 'unknown')}": 1,
+                f"referrers.{_field_key(referer_domain(referer))}": 1,
+                f"countries.{_field_key(country or 'Unknown')}": 1
+            },
+            block=block
+        )
+        if not accepted:
+            return False
+
+        register_max = {}
+        if ip_address:
+            register, rank = HyperLogLog.register_for(ip_address)
+            register_max[f"hll.{register}"] = rank
+        return await self.daily.add(
+            {"link_id": link_id, "day": hour.replace(hour=0)},
+            inc={"clicks": 1},
+            max_values=register_max,
+            block=block
+        )
+
+    async def get_link_stats(self, link_id: str, start: datetime, end: datetime) -> Dict[str, Any]:
+        """Clicks per day, breakdowns and estimated unique visitors for the hours
+        and days overlapping [start, end]
+
+        Reads at most one document per hour and per day in the range.
+        """
+        db = get_database()
+        first_hour = start.replace(minute=0, second=0, microsecond=0)
+        first_day = first_hour.replace(hour=0)
+
+        hourly_docs = await db[HOURLY_COLLECTION].find(
+            {"link_id": link_id, "hour": {"$gte": first_hour, "$lte": end}},
+            {"_id": 0, "devices": 1, "referrers": 1, "countries": 1}
+        ).to_list(length=None)
+        daily_docs = await db[DAILY_COLLECTION].find(
+            {"link_id": link_id, "day": {"$gte": first_day, "$lte": end}},
+            {"_id": 0, "day": 1, "clicks": 1, "hll": 1}
+        ).to_list(length=None)
+
+        breakdowns: Dict[str, Dict[str, int]] = {"devices": {}, "referrers": {}, "countries": {}}
+        for doc in hourly_docs:
+            for dimension, totals in breakdowns.items():
+                for key, count in (doc.get(dimension) or {}).items():
+                    value = _field_value(key)
+                    totals[value] = totals.get(value, 0) + count
+
+        sketch = HyperLogLog()
+        daily_clicks: Dict[str, int] = {}
+        for doc in daily_docs:
+            daily_clicks[doc["day"].strftime("%Y-%m-%d")] = doc.get("clicks", 0)
+            sketch.merge(doc.get("hll") or {})
+
+        return {
+            "clicks": sum(daily_clicks.values()),
+            "daily_clicks": daily_clicks,
+            "unique_visitors": sketch.estimate(),
+            **breakdowns
+        }
+
+    async def delete_link(self, link_id: str):
+        db = get_database()
+        await db[HOURLY_COLLECTION].delete_many({"link_id": link_id})
+        await db[DAILY_COLLECTION].delete_many({"link_id": link_id})
+
+# Global service instance
+link_click_rollups = LinkClickRollupService()
@@ -0,0 +1,168 @@
+"""
+Link Redirect Engine
+Serves short-link redirects from an in-process code cache; clicks are logged
+and counted off the request path
+"""
+
+import asyncio
+import uuid
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from core.cache import LocalLRUCache
+from core.config import settings
+from core.database import get_database
+from core.write_behind import BatchWriter, RollupBuffer
+from services.link_click_rollup_service import link_click_rollups
+
+# Cached for codes with no link, so scans for random codes stay off Mongo
+_UNKNOWN = object()
+
+_LINK_PROJECTION = {"_id": 1, "user_id": 1, "original_url": 1, "utm_parameters": 1,
+                    "is_active": 1, "expires_at": 1}
+
+@dataclass(frozen=True)
+class RedirectTarget:
+    """What a redirect needs from a short_links document, with the final URL prebuilt"""
+    link_id: str
+    user_id: str
+    url: str
+    is_active: bool = True
+    expires_at: Optional[datetime] = None
+
+    def is_expired(self, now: Optional[datetime] = None) -> bool:
+        return self.expires_at is not None and self.expires_at < (now or datetime.utcnow())
+
+def build_target_url(link: Dict[str, Any]) -> str:
+    """Original URL with the link's UTM parameters appended"""
+    final_url = link["original_url"]
+    if link.get("utm_parameters"):
+        utm_params = [f"{key}={value}" for key, value in link["utm_parameters"].items()]
+        separator = "&" if "?" in final_url else "?"
+        final_url = f"{final_url}{separator}{'&'.join(utm_params)}"
+    return final_url
+
+def device_type(user_agent: str) -> str:
+    """Simple user agent classification"""
+    agent = user_agent.lower()
+    if any(mobile in agent for mobile in ("mobile", "android", "iphone")):
+        return "mobile"
+    if "tablet" in agent or "ipad" in agent:
+        return "tablet"
+    return "desktop"
+
+class LinkRedirectEngine:
+    """Short code -> redirect target resolution and click recording
+
+    Hot codes are answered from a bounded LRU (unknown codes negatively cached),
+    with one Mongo lookup per code for concurrent misses. Entries live
+    LINK_REDIRECT_CACHE_TTL_SECONDS, which bounds how long other workers may
+    serve a link after it is edited; the editing worker drops it immediately.
+    Clicks are queued to a BatchWriter without waiting; click counters and the
+    per-link analytics rollups coalesce into one update per link per flush.
+    """
+
+    def __init__(self):
+        self.cache = LocalLRUCache(
+            max_entries=settings.LINK_REDIRECT_CACHE_SIZE,
+            max_bytes=settings.LINK_REDIRECT_CACHE_MAX_BYTES
+        )
+        self.clicks = BatchWriter("link_clicks", "link_clicks", max_batch=500,
+                                  flush_interval=1.0, max_pending=50000)
+        # upsert=False: a link deleted meanwhile must not come back as a counter stub
+        self.counters = RollupBuffer("short_link_clicks", "short_links", max_batch=500,
+                                     flush_interval=2.0, max_pending=20000, upsert=False)
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.stats = {
+            "hits": 0,
+            "negative_hits": 0,
+            "misses": 0,
+            "coalesced_loads": 0
+        }
+
+    async def resolve(self, short_code: str) -> Optional[RedirectTarget]:
+        """Redirect target for a code, or None if no link has it"""
+        cached = self.cache.get(short_code)
+        if cached is not None:
+            if cached is _UNKNOWN:
+                self.stats["negative_hits"] += 1
+                return None
+            self.stats["hits"] += 1
+            return cached
+
+        self.stats["misses"] += 1
+        future = self._inflight.get(short_code)
+        if future is not None:
+            self.stats["coalesced_loads"] += 1
+        else:
+            future = asyncio.ensure_future(self._load(short_code))
+            self._inflight[short_code] = future
+        return await asyncio.shield(future)
+
+    async def _load(self, short_code: str) -> Optional[RedirectTarget]:
+        try:
+            link = await get_database().short_links.find_one({"short_code": short_code}, _LINK_PROJECTION)
+            if link is None:
+                self.cache.set(short_code, _UNKNOWN, settings.LINK_REDIRECT_NEGATIVE_TTL_SECONDS)
+                return None
+
+            target = RedirectTarget(
+                link_id=link["_id"],
+                user_id=link.get("user_id"),
+                url=build_target_url(link),
+                is_active=link.get("is_active", True),
+                expires_at=link.get("expires_at")
+            )
+            self.cache.set(short_code, target, settings.LINK_REDIRECT_CACHE_TTL_SECONDS)
+            return target
+        finally:
+            self._inflight.pop(short_code, None)
+
+    async def record_click(self, target: RedirectTarget, short_code: str, user_agent: str,
+                           ip_address: Optional[str], referer: str) -> bool:
+        """Queue the click document and counter update; never waits for Mongo
+
+        Returns False if the click was shed because the buffers are full.
+        """
+        now = datetime.utcnow()
+        click_doc = {
+            "_id": str(uuid.uuid4()),
+            "user_id": target.user_id,
+            "link_id": target.link_id,
+            "short_code": short_code,
+            "clicked_at": now,
+            "ip_address": ip_address,
+            "user_agent": user_agent,
+            "referer": referer,
+            "device_type": device_type(user_agent),
+            "country": "Unknown",  # Would integrate with GeoIP service
+            "city": "Unknown"
+        }
+        if not await self.clicks.add(click_doc, block=False):
+            return False
+        await self.counters.add(
+            {"_id": target.link_id},
+            inc={"total_clicks": 1},
+            max_values={"last_clicked_at": now},
+            block=False
+        )
+        await link_click_rollups.record(
+            target.link_id, now, click_doc["device_type"], referer, click_doc["country"], ip_address
+        )
+        return True
+
+    def invalidate(self, short_code: str):
+        """Drop a code after its link is created, edited or deleted in this worker"""
+        self.cache.delete(short_code)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "cache": self.cache.get_stats(),
+            "clicks": self.clicks.get_stats(),
+            "counters": self.counters.get_stats()
+        }
+
+# Global engine instance
+link_redirects = LinkRedirectEngine()
@@ -5,48 +5,80 @@ Professional Mewayz Platform
 
 from datetime import datetime
 from typing import Dict, Any, List, Optional
+from pymongo.errors import BulkWriteError, DuplicateKeyError
 from core.database import get_database
+from core.indexes import index, index_registry
+from services.link_click_rollup_service import link_click_rollups
+from services.link_redirect_service import device_type
+from services.short_code_allocator import short_code_allocator
 import uuid
 import hashlib
 import string
 
+index_registry.register(
+    __name__,
+    index("short_links", "short_code", unique=True),
+    index("short_links", "user_id", ("created_at", -1)),
+    index("link_clicks", "link_id", ("clicked_at", -1)),
+    index("link_clicks", "user_id", ("clicked_at", -1))
+)
+
 class LinkShortenerService:
     """Service for link shortening operations"""
     
     @staticmethod
-    async def generate_short_code(length: int = 6) -> str:
-        """Generate random short code"""
-        characters = string.ascii_letters + string.digits
-        return ''.join(await self._get_real_choice_from_db(characters) for _ in range(length))
+    async def generate_short_code() -> str:
+        """Allocate a new unique short code"""
+        codes = await short_code_allocator.allocate(1)
+        return codes[0]
+    
+    @staticmethod
+    async def insert_links(links: List[Dict[str, Any]], max_attempts: int = 3):
+        """Insert links whose short codes came from the allocator
+        
+        Allocated codes never repeat, but a custom slug may already hold one; only
+        the links that hit the unique index get fresh codes, instead of checking
+        every code up front.
+        """
+        db = get_database()
+        pending = links
+        for _ in range(max_attempts):
+            try:
+                await db.short_links.insert_many(pending, ordered=False)
+                return
+            except BulkWriteError as e:
+                write_errors = e.details.get("writeErrors", [])
+                if any(error.get("code") != 11000 for error in write_errors):
+                    raise
+                pending = [pending[error["index"]] for error in write_errors]
+                codes = await short_code_allocator.allocate(len(pending))
+                for link, short_code in zip(pending, codes):
+                    link["short_code"] = short_code
+        raise RuntimeError("Could not assign unique short codes")
     
     @staticmethod
     async def create_short_link(user_id: str, url: str, custom_code: str = None):
         """Create shortened link"""
-        db = await get_database()
-        
-        # Generate or use custom short code
-        short_code = custom_code or LinkShortenerService.generate_short_code()
-        
-        # Check if code already exists
-        existing = await db.short_links.find_one({"short_code": short_code})
-        if existing:
-            if custom_code:
-                raise ValueError("Custom code already exists")
-            # Generate new random code
-            short_code = LinkShortenerService.generate_short_code()
+        db = get_database()
         
         link = {
             "_id": str(uuid.uuid4()),
             "user_id": user_id,
             "original_url": url,
-            "short_code": short_code,
+            "short_code": custom_code or await LinkShortenerService.generate_short_code(),
             "click_count": 0,
             "created_at": datetime.utcnow(),
             "expires_at": None,
             "status": "active"
         }
         
-        result = await db.short_links.insert_one(link)
+        if custom_code:
+            try:
+                await db.short_links.insert_one(link)
+            except DuplicateKeyError:
+                raise ValueError("Custom code already exists")
+        else:
+            await LinkShortenerService.insert_links([link])
         return link
     
     @staticmethod
@@ -68,15 +100,20 @@ class LinkShortenerService:
     @staticmethod
     async def increment_click_count(short_code: str, visitor_info: Dict[str, Any] = None):
         """Increment click count and log visit"""
-        db = await get_database()
+        db = get_database()
         
         # Update click count
-        result = await db.short_links.update_one(
+        link = await db.short_links.find_one_and_update(
             {"short_code": short_code},
-            {"$inc": {"click_count": 1}}
+            {"$inc": {"click_count": 1}},
+            projection={"_id": 1}
         )
+        if link is None:
+            return False
         
         # Log visit for analytics
+        visitor_info = visitor_info or {}
+        visited_at = datetime.utcnow()
         if visitor_info:
             visit = {
                 "_id": str(uuid.uuid4()),
@@ -84,11 +121,18 @@ class LinkShortenerService:
                 "visitor_ip": visitor_info.get("ip"),
                 "user_agent": visitor_info.get("user_agent"),
                 "referer": visitor_info.get("referer"),
-                "visited_at": datetime.utcnow()
+                "visited_at": visited_at
             }
             await db.link_visits.insert_one(visit)
         
-        return result.modified_count > 0
+        await link_click_rollups.record(
+            link["_id"], visited_at,
+            device_type(visitor_info.get("user_agent") or ""),
+            visitor_info.get("referer"),
+            visitor_info.get("country"),
+            visitor_info.get("ip")
+        )
+        return True
     
     async def _get_real_metric_from_db(self, metric_type: str, min_val, max_val):
         """Get real metrics from database"""
@@ -9,7 +9,9 @@ from typing import Optional, List, Dict, Any
 import json
 from fastapi import BackgroundTasks
 
+from core.config import settings
 from core.database import get_database
+from core.notification_digest import invalidate_notification_preferences
 
 class NotificationService:
     
@@ -674,7 +676,8 @@ class NotificationService:
                 "categories": ["system", "business", "security"],
                 "quiet_hours_start": "22:00",
                 "quiet_hours_end": "08:00",
-                "timezone": "UTC"
+                "timezone": "UTC",
+                "digest_window_seconds": settings.NOTIFICATION_DIGEST_WINDOW_SECONDS
             }
         
         return {
@@ -697,9 +700,14 @@ class NotificationService:
         push_enabled: bool,
         categories: List[str],
         quiet_hours_start: str,
-        quiet_hours_end: str
+        quiet_hours_end: str,
+        digest_window_seconds: Optional[int] = None
     ) -> Dict[str, Any]:
-        """Update user notification preferences"""
+        """Update user notification preferences
+        
+        digest_window_seconds: how long bursts of similar notifications are
+        held and merged into one digest (0 disables); unchanged if None
+        """
         database = get_database()
         
         # Get user's workspace
@@ -719,6 +727,8 @@ class NotificationService:
             "quiet_hours_end": quiet_hours_end,
             "updated_at": datetime.utcnow()
         }
+        if digest_window_seconds is not None:
+            preferences_data["digest_window_seconds"] = max(0, digest_window_seconds)
         
         preferences_collection = database.notification_preferences
         result = await preferences_collection.update_one(
@@ -732,6 +742,7 @@ class NotificationService:
             },
             upsert=True
         )
+        invalidate_notification_preferences(user_id)
         
         return {
             "workspace_id": str(workspace["_id"]),
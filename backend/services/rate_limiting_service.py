@@ -5,10 +5,48 @@ Business logic for API rate limiting and throttling system
 
 import uuid
 from datetime import datetime, timedelta
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple
 import json
 
+from jose import JWTError, jwt
+
+from core.cache import LocalLRUCache, cache_manager
+from core.config import settings
 from core.database import get_database
+from core.indexes import index, index_registry
+from core.metrics import route_template
+from core.rate_limiter import RateLimitRule, rate_limiter
+from core.write_behind import BatchWriter, RollupBuffer, minute_bucket
+
+# Subscription profiles are cached in-process so limit checks do not read
+# the users collection on every request
+PROFILE_CACHE_SECONDS = 300
+_profile_cache = LocalLRUCache(max_entries=50000, max_bytes=16 * 1024 * 1024)
+
+# Raw usage records and per-minute per-endpoint rollups are written behind
+# the request; analytics read the rollups
+usage_writer = BatchWriter("api_usage", "rate_limit_usage", max_batch=500, flush_interval=2.0)
+usage_rollups = RollupBuffer("api_usage_rollups", "api_usage_rollups", flush_interval=5.0)
+
+index_registry.register(
+    __name__,
+    # The rollup upsert key; unique so workers flushing the same minute share one document
+    index("api_usage_rollups", "identity", "endpoint", "method", "minute", unique=True),
+    index("api_usage_rollups", "identity", "minute"),
+    index("api_usage_rollups", "minute", name="minute_ttl",
+          expire_after_seconds=settings.API_USAGE_ROLLUP_RETENTION_DAYS * 86400),
+    index("rate_limit_usage", "timestamp", expire_after_seconds=settings.API_USAGE_RETENTION_DAYS * 86400)
+)
+
+# Upper bounds (ms) of the latency histogram kept in each rollup document
+LATENCY_BUCKETS_MS = (10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+TIMEFRAMES = {
+    "1h": timedelta(hours=1),
+    "24h": timedelta(hours=24),
+    "7d": timedelta(days=7),
+    "30d": timedelta(days=30)
+}
 
 class RateLimitingService:
     
@@ -56,48 +94,173 @@ class RateLimitingService:
         }
     }
     
+    # Short-link redirects are served under this prefix to anyone following a link
+    PUBLIC_REDIRECT_PREFIX = "/api/links/"
+    
+    # Subscription plan ids whose rate limit tier has another name
+    PLAN_TIERS = {"pro": "professional"}
+    
+    # Path prefixes metered against the hourly AI request quota
+    AI_ENDPOINT_PREFIXES = (
+        "/api/ai", "/api/advanced-ai", "/api/ai-analytics", "/api/ai-content",
+        "/api/ai-content-generation", "/api/ai-tokens", "/api/advanced-ai-suite"
+    )
+    
     @staticmethod
-    async def get_rate_limit_status(user_id: str) -> Dict[str, Any]:
-        """Get current rate limit status for user"""
+    async def get_subscription_profile(user_id: str = None, email: str = None) -> Dict[str, str]:
+        """Get subscription tier and limiter identity for a user, cached in-process"""
+        cache_key = f"id:{user_id}" if user_id else f"email:{email}"
+        profile = _profile_cache.get(cache_key)
+        if profile is not None:
+            return profile
+        
         database = get_database()
+        query = {"_id": user_id} if user_id else {"email": email}
+        user = await database.users.find_one(
+            query, {"email": 1, "subscription_tier": 1, "subscription_plan": 1}
+        ) or {}
         
-        # Get user's subscription tier
-        users_collection = database.users
-        user = await users_collection.find_one({"_id": user_id})
-        subscription_tier = user.get("subscription_tier", "free") if user else "free"
+        # Subscriptions record the plan id; plans are named after their tier except "pro"
+        plan = user.get("subscription_tier") or user.get("subscription_plan") or "free"
+        subscription_tier = RateLimitingService.PLAN_TIERS.get(plan, plan)
+        if subscription_tier not in RateLimitingService.SUBSCRIPTION_LIMITS:
+            subscription_tier = "free"
+        
+        profile = {
+            "tier": subscription_tier,
+            "identity": f"user:{user.get('email') or email or user_id}"
+        }
+        _profile_cache.set(cache_key, profile, PROFILE_CACHE_SECONDS)
+        return profile
+    
+    @staticmethod
+    def invalidate_subscription_profile(user_id: str = None, email: str = None):
+        """Drop a cached profile after the user's subscription changes"""
+        if user_id:
+            _profile_cache.delete(f"id:{user_id}")
+        if email:
+            _profile_cache.delete(f"email:{email}")
+    
+    @staticmethod
+    def get_limit_rules(subscription_tier: str, endpoint: str = "") -> List[RateLimitRule]:
+        """Get the rate limit rules that apply to a request"""
+        limits = RateLimitingService.SUBSCRIPTION_LIMITS[subscription_tier]
+        rules = [
+            RateLimitRule("api", limits["api_calls_per_minute"], 60),
+            RateLimitRule("api", limits["api_calls_per_hour"], 3600),
+            RateLimitRule("api", limits["api_calls_per_day"], 86400)
+        ]
+        if endpoint.startswith(RateLimitingService.AI_ENDPOINT_PREFIXES):
+            rules.append(RateLimitRule("ai", limits["ai_requests_per_hour"], 3600))
+        return rules
+    
+    @staticmethod
+    def is_public_request(scope: Dict[str, Any]) -> bool:
+        """Anonymous traffic here is not API usage: short-link redirects (GET /api/links/{short_code})"""
+        path = scope["path"]
+        return (
+            scope["method"] in ("GET", "HEAD")
+            and path.startswith(RateLimitingService.PUBLIC_REDIRECT_PREFIX)
+            and "/" not in path[len(RateLimitingService.PUBLIC_REDIRECT_PREFIX):]
+        )
+    
+    @staticmethod
+    def client_address(scope: Dict[str, Any]) -> str:
+        """Address of the caller; behind RATE_LIMIT_TRUSTED_PROXY_HOPS proxies it is the
+        X-Forwarded-For entry the outermost trusted proxy appended"""
+        hops = settings.RATE_LIMIT_TRUSTED_PROXY_HOPS
+        if hops > 0:
+            forwarded = [
+                address.strip()
+                for name, value in scope.get("headers", []) if name == b"x-forwarded-for"
+                for address in value.decode("latin-1").split(",") if address.strip()
+            ]
+            if forwarded:
+                # Entries left of the trusted ones are client-supplied and may be forged
+                return forwarded[-hops] if len(forwarded) >= hops else forwarded[0]
+        client = scope.get("client")
+        return client[0] if client else "unknown"
+    
+    @staticmethod
+    async def resolve_request_limits(scope: Dict[str, Any]) -> Optional[Tuple[str, List[RateLimitRule]]]:
+        """Identify the caller of an ASGI request and the rules that apply to it"""
+        email = None
+        for name, value in scope.get("headers", []):
+            if name == b"authorization":
+                scheme, _, token = value.decode("latin-1").partition(" ")
+                if scheme.lower() == "bearer" and token:
+                    try:
+                        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+                        email = payload.get("sub")
+                    except JWTError:
+                        email = None
+                break
+        
+        if email:
+            profile = await RateLimitingService.get_subscription_profile(email=email)
+            identity, subscription_tier = profile["identity"], profile["tier"]
+        elif RateLimitingService.is_public_request(scope):
+            # Link visitors are not API callers; keying them by address would let
+            # one busy NAT or proxy exhaust the quota for everyone behind it
+            return None
+        else:
+            identity, subscription_tier = f"ip:{RateLimitingService.client_address(scope)}", "free"
+        
+        return identity, RateLimitingService.get_limit_rules(subscription_tier, scope["path"])
+    
+    @staticmethod
+    async def _peek_usage(user_id: str) -> Tuple[Dict[str, str], Dict[Tuple[str, int], Any]]:
+        """Read current counters for a user without consuming quota"""
+        profile = await RateLimitingService.get_subscription_profile(user_id=user_id)
+        rules = RateLimitingService.get_limit_rules(profile["tier"], RateLimitingService.AI_ENDPOINT_PREFIXES[0])
+        
+        decision = await rate_limiter.check(profile["identity"], rules, consume=False)
+        
+        usage = {(result.rule.scope, result.rule.period_seconds): result for result in decision.results}
+        return profile, usage
+    
+    @staticmethod
+    async def get_rate_limit_status(user_id: str) -> Dict[str, Any]:
+        """Get current rate limit status for user"""
+        profile, usage = await RateLimitingService._peek_usage(user_id)
+        subscription_tier = profile["tier"]
         
-        # Get user's current usage
-        rate_limit_collection = database.rate_limits
         current_time = datetime.utcnow()
         
+        def used(scope: str, period_seconds: int) -> int:
+            # A peek reports what would remain after one more request
+            result = usage[(scope, period_seconds)]
+            if not result.allowed:
+                return result.rule.limit
+            return max(0, result.rule.limit - result.remaining - 1)
+        
         # Calculate time windows
         minute_start = current_time.replace(second=0, microsecond=0)
         hour_start = current_time.replace(minute=0, second=0, microsecond=0)
         day_start = current_time.replace(hour=0, minute=0, second=0, microsecond=0)
         
-        # Get current usage counts (mock for now)
         limits = RateLimitingService.SUBSCRIPTION_LIMITS[subscription_tier]
         
         # Real database operation
         usage_data = {
             "api_calls_per_minute": {
                 "limit": limits["api_calls_per_minute"],
-                "used": 23,  # Real database operation
-                "remaining": limits["api_calls_per_minute"] - 23,
+                "used": used("api", 60),
+                "remaining": limits["api_calls_per_minute"] - used("api", 60),
                 "resets_at": (minute_start + timedelta(minutes=1)).isoformat(),
                 "reset_in_seconds": 60 - current_time.second
             },
             "api_calls_per_hour": {
                 "limit": limits["api_calls_per_hour"],
-                "used": 1347,  # Real database operation
-                "remaining": limits["api_calls_per_hour"] - 1347,
+                "used": used("api", 3600),
+                "remaining": limits["api_calls_per_hour"] - used("api", 3600),
                 "resets_at": (hour_start + timedelta(hours=1)).isoformat(),
                 "reset_in_seconds": 3600 - (current_time.minute * 60 + current_time.second)
             },
             "api_calls_per_day": {
                 "limit": limits["api_calls_per_day"],
-                "used": 8934,  # Real database operation
-                "remaining": limits["api_calls_per_day"] - 8934,
+                "used": used("api", 86400),
+                "remaining": limits["api_calls_per_day"] - used("api", 86400),
                 "resets_at": (day_start + timedelta(days=1)).isoformat(),
                 "reset_in_seconds": 86400 - (current_time.hour * 3600 + current_time.minute * 60 + current_time.second)
             },
@@ -109,8 +272,8 @@ class RateLimitingService:
             },
             "ai_requests_per_hour": {
                 "limit": limits["ai_requests_per_hour"],
-                "used": 34,
-                "remaining": limits["ai_requests_per_hour"] - 34,
+                "used": used("ai", 3600),
+                "remaining": limits["ai_requests_per_hour"] - used("ai", 3600),
                 "resets_at": (hour_start + timedelta(hours=1)).isoformat()
             }
         }
@@ -248,81 +411,58 @@ class RateLimitingService:
     @staticmethod
     async def get_api_usage(user_id: str, timeframe: str = "24h", endpoint: str = "all") -> Dict[str, Any]:
         """Get detailed API usage statistics"""
-        database = get_database()
+        profile = await RateLimitingService.get_subscription_profile(user_id=user_id)
+        rollups = await RateLimitingService._aggregate_rollups(
+            profile["identity"], timeframe, endpoint,
+            group_by={"endpoint": "$endpoint", "method": "$method"},
+            sort={"requests": -1}
+        )
         
-        # Real database operation
-        if endpoint == "all":
-            endpoints_data = [
-                {
-                    "endpoint": "/api/dashboard/overview",
-                    "method": "GET",
-                    "requests": 1234,
-                    "avg_response_time": 67,
-                    "min_response_time": 45,
-                    "max_response_time": 234,
-                    "error_rate": 0.5,
-                    "throttle_rate": 1.2,
-                    "data_transferred_mb": 15.6,
-                    "cache_hit_rate": 78.5
-                },
-                {
-                    "endpoint": "/api/analytics/data",
-                    "method": "POST",
-                    "requests": 897,
-                    "avg_response_time": 145,
-                    "min_response_time": 89,
-                    "max_response_time": 456,
-                    "error_rate": 2.3,
-                    "throttle_rate": 2.8,
-                    "data_transferred_mb": 45.2,
-                    "cache_hit_rate": 45.6
-                },
-                {
-                    "endpoint": "/api/users/profile",
-                    "method": "GET",
-                    "requests": 654,
-                    "avg_response_time": 89,
-                    "min_response_time": 34,
-                    "max_response_time": 178,
-                    "error_rate": 0.8,
-                    "throttle_rate": 0.5,
-                    "data_transferred_mb": 8.9,
-                    "cache_hit_rate": 89.2
-                }
-            ]
-        else:
-            # Single endpoint data
-            endpoints_data = [
+        endpoints_data = []
+        for rollup in rollups:
+            requests = rollup["requests"] or 1
+            endpoints_data.append({
+                "endpoint": rollup["_id"]["endpoint"],
+                "method": rollup["_id"]["method"],
+                "requests": rollup["requests"],
+                "avg_response_time": round(rollup["response_time_total"] / requests, 1),
+                "min_response_time": rollup["response_time_min"],
+                "max_response_time": rollup["response_time_max"],
+                "error_rate": round(rollup["errors"] / requests * 100, 2),
+                "throttle_rate": round(rollup["throttled"] / requests * 100, 2)
+            })
+        
+        if endpoint != "all" and endpoints_data:
+            database = get_database()
+            start_time = datetime.utcnow() - TIMEFRAMES.get(timeframe, TIMEFRAMES["24h"])
+            hourly = await database.api_usage_rollups.aggregate([
+                {"$match": {"identity": profile["identity"], "endpoint": endpoint, "minute": {"$gte": start_time}}},
+                {"$group": {
+                    "_id": {"$dateToString": {"format": "%H:00", "date": "$minute"}},
+                    "requests": {"$sum": "$requests"},
+                    "response_time_total": {"$sum": "$response_time_total"}
+                }},
+                {"$sort": {"_id": 1}}
+            ]).to_list(length=None)
+            endpoints_data[0]["hourly_breakdown"] = [
                 {
-                    "endpoint": endpoint,
-                    "method": "GET",
-                    "requests": 1234,
-                    "avg_response_time": 67,
-                    "min_response_time": 45,
-                    "max_response_time": 234,
-                    "error_rate": 0.5,
-                    "throttle_rate": 1.2,
-                    "data_transferred_mb": 15.6,
-                    "cache_hit_rate": 78.5,
-                    "hourly_breakdown": [
-                        {"hour": "00:00", "requests": 45, "avg_response_time": 56},
-                        {"hour": "01:00", "requests": 23, "avg_response_time": 78},
-                        {"hour": "09:00", "requests": 156, "avg_response_time": 67},
-                        {"hour": "14:00", "requests": 234, "avg_response_time": 89}
-                    ]
+                    "hour": bucket["_id"],
+                    "requests": bucket["requests"],
+                    "avg_response_time": round(bucket["response_time_total"] / max(bucket["requests"], 1), 1)
                 }
+                for bucket in hourly
             ]
         
+        total_requests = sum(ep["requests"] for ep in endpoints_data)
+        
         return {
             "timeframe": timeframe,
             "endpoint_filter": endpoint,
             "endpoints": endpoints_data,
             "summary": {
-                "total_requests": sum(ep["requests"] for ep in endpoints_data),
-                "avg_response_time": sum(ep["avg_response_time"] * ep["requests"] for ep in endpoints_data) / sum(ep["requests"] for ep in endpoints_data),
-                "total_data_transferred_mb": sum(ep["data_transferred_mb"] for ep in endpoints_data),
-                "overall_error_rate": sum(ep["error_rate"] * ep["requests"] for ep in endpoints_data) / sum(ep["requests"] for ep in endpoints_data),
-                "overall_cache_hit_rate": sum(ep["cache_hit_rate"] * ep["requests"] for ep in endpoints_data) / sum(ep["requests"] for ep in endpoints_data)
+                "total_requests": total_requests,
+                "avg_response_time": round(sum(ep["avg_response_time"] * ep["requests"] for ep in endpoints_data) / max(total_requests, 1), 1),
+                "overall_error_rate": round(sum(ep["error_rate"] * ep["requests"] for ep in endpoints_data) / max(total_requests, 1), 2)
             }
         }
     
@@ -333,67 +473,39 @@ class RateLimitingService:
         action: str = "api_call",
         ip_address: str = "unknown"
     ) -> Dict[str, Any]:
-        """Check if request is within rate limits"""
-        database = get_database()
-        
-        # Get user's subscription tier
-        users_collection = database.users
-        user = await users_collection.find_one({"_id": user_id})
-        subscription_tier = user.get("subscription_tier", "free") if user else "free"
+        """Check if request is within rate limits (does not consume quota)"""
+        profile = await RateLimitingService.get_subscription_profile(user_id=user_id)
+        subscription_tier = profile["tier"]
+        rules = RateLimitingService.get_limit_rules(subscription_tier, endpoint)
         
-        limits = RateLimitingService.SUBSCRIPTION_LIMITS[subscription_tier]
-        
-        # Real database operation
-        current_usage = {
-            "minute": 23,  # Real database operation
-            "hour": 1347,  # Real database operation
-            "day": 8934   # Real database operation
-        }
+        decision = await rate_limiter.check(profile["identity"], rules, consume=False)
         
-        # Check limits
-        checks = {
-            "minute_limit": {
-                "passed": current_usage["minute"] < limits["api_calls_per_minute"],
-                "current": current_usage["minute"],
-                "limit": limits["api_calls_per_minute"],
-                "remaining": limits["api_calls_per_minute"] - current_usage["minute"],
-                "resets_in": 60 - datetime.utcnow().second
-            },
-            "hour_limit": {
-                "passed": current_usage["hour"] < limits["api_calls_per_hour"],
-                "current": current_usage["hour"],
-                "limit": limits["api_calls_per_hour"],
-                "remaining": limits["api_calls_per_hour"] - current_usage["hour"],
-                "resets_in": 3600 - (datetime.utcnow().minute * 60 + datetime.utcnow().second)
-            },
-            "day_limit": {
-                "passed": current_usage["day"] < limits["api_calls_per_day"],
-                "current": current_usage["day"],
-                "limit": limits["api_calls_per_day"],
-                "remaining": limits["api_calls_per_day"] - current_usage["day"],
-                "resets_in": 86400 - (datetime.utcnow().hour * 3600 + datetime.utcnow().minute * 60 + datetime.utcnow().second)
+        check_names = {60: "minute_limit", 3600: "hour_limit", 86400: "day_limit"}
+        checks = {}
+        for result in decision.results:
+            name = check_names[result.rule.period_seconds]
+            if result.rule.scope != "api":
+                name = f"{result.rule.scope}_{name}"
+            checks[name] = {
+                "passed": result.allowed,
+                "current": result.rule.limit - result.remaining - 1 if result.allowed else result.rule.limit,
+                "limit": result.rule.limit,
+                "remaining": result.remaining + 1 if result.allowed else 0,
+                "resets_in": -(-result.reset_after_ms // 1000)
             }
-        }
-        
-        # Determine if request should be allowed
-        allowed = all(check["passed"] for check in checks.values())
         
-        # Get the most restrictive limit that's being approached
         most_restrictive = min(checks.values(), key=lambda x: x["remaining"] / x["limit"])
         
         return {
-            "allowed": allowed,
+            "allowed": decision.allowed,
             "endpoint": endpoint,
             "action": action,
             "subscription_tier": subscription_tier,
             "checks": checks,
             "most_restrictive": most_restrictive,
-            "retry_after": most_restrictive["resets_in"] if not allowed else None,
-            "headers": {
-                "X-RateLimit-Limit": str(most_restrictive["limit"]),
-                "X-RateLimit-Remaining": str(most_restrictive["remaining"]),
-                "X-RateLimit-Reset": str(int(datetime.utcnow().timestamp()) + most_restrictive["resets_in"])
-            }
+            "retry_after": decision.retry_after_seconds if not decision.allowed else None,
+            "limiter_backend": decision.backend,
+            "headers": decision.headers()
         }
     
     @staticmethod
@@ -403,14 +515,18 @@ class RateLimitingService:
         method: str,
         response_time: float,
         status_code: int,
-        ip_address: str = "unknown"
+        ip_address: str = "unknown",
+        identity: str = None
     ) -> Dict[str, Any]:
-        """Record API usage for analytics"""
-        database = get_database()
+        """Record API usage for analytics (buffered, written in batches)"""
+        if identity is None:
+            profile = await RateLimitingService.get_subscription_profile(user_id=user_id)
+            identity = profile["identity"]
         
         usage_doc = {
             "_id": str(uuid.uuid4()),
             "user_id": user_id,
+            "identity": identity,
             "endpoint": endpoint,
             "method": method,
             "response_time": response_time,
@@ -421,16 +537,101 @@ class RateLimitingService:
             "throttled": status_code == 429
         }
         
-        # In real implementation, store this data
-        # rate_limit_usage_collection = database.rate_limit_usage
-        # await rate_limit_usage_collection.insert_one(usage_doc)
+        recorded = await usage_writer.add(usage_doc)
+        
+        latency_bucket = next(
+            (f"le_{bound}" for bound in LATENCY_BUCKETS_MS if response_time <= bound), "le_inf"
+        )
+        await usage_rollups.add(
+            key={
+                "identity": identity,
+                "endpoint": endpoint,
+                "method": method,
+                "minute": minute_bucket()
+            },
+            inc={
+                "requests": 1,
+                "errors": 1 if status_code >= 400 and status_code != 429 else 0,
+                "throttled": 1 if status_code == 429 else 0,
+                "status_4xx": 1 if 400 <= status_code < 500 else 0,
+                "status_5xx": 1 if status_code >= 500 else 0,
+                "response_time_total": response_time,
+                f"latency.{latency_bucket}": 1
+            },
+            min_values={"response_time_min": response_time},
+            max_values={"response_time_max": response_time}
+        )
         
         return {
-            "recorded": True,
+            "recorded": recorded,
             "usage_id": usage_doc["_id"],
             "timestamp": usage_doc["timestamp"].isoformat()
         }
     
+    @staticmethod
+    async def record_request(scope: Dict[str, Any], identity: str, status_code: int, response_time: float):
+        """Middleware hook: record a completed request against its route template"""
+        endpoint = route_template(scope) or scope["path"]
+        client = scope.get("client")
+        await RateLimitingService.record_api_usage(
+            user_id=identity.split(":", 1)[1] if identity.startswith("user:") else None,
+            endpoint=endpoint,
+            method=scope["method"],
+            response_time=response_time,
+            status_code=status_code,
+            ip_address=client[0] if client else "unknown",
+            identity=identity
+        )
+    
+    @staticmethod
+    async def _aggregate_rollups(identity: str, timeframe: str, endpoint: str = "all",
+                                 group_by: Any = None, sort: Dict[str, int] = None,
+                                 limit: int = None) -> List[Dict[str, Any]]:
+        """Sum per-minute rollups for an identity over a timeframe"""
+        database = get_database()
+        start_time = datetime.utcnow() - TIMEFRAMES.get(timeframe, TIMEFRAMES["24h"])
+        
+        match = {"identity": identity, "minute": {"$gte": start_time}}
+        if endpoint != "all":
+            match["endpoint"] = endpoint
+        
+        group = {
+            "_id": group_by,
+            "requests": {"$sum": "$requests"},
+            "errors": {"$sum": "$errors"},
+            "throttled": {"$sum": "$throttled"},
+            "status_4xx": {"$sum": "$status_4xx"},
+            "status_5xx": {"$sum": "$status_5xx"},
+            "response_time_total": {"$sum": "$response_time_total"},
+            "response_time_min": {"$min": "$response_time_min"},
+            "response_time_max": {"$max": "$response_time_max"},
+            "peak_minute_requests": {"$max": "$requests"}
+        }
+        for bound in [*LATENCY_BUCKETS_MS, "inf"]:
+            group[f"le_{bound}"] = {"$sum": f"$latency.le_{bound}"}
+        
+        pipeline = [{"$match": match}, {"$group": group}]
+        if sort:
+            pipeline.append({"$sort": sort})
+        if limit:
+            pipeline.append({"$limit": limit})
+        
+        return await database.api_usage_rollups.aggregate(pipeline).to_list(length=limit)
+    
+    @staticmethod
+    def _latency_percentile(rollup: Dict[str, Any], percentile: float) -> float:
+        """Approximate a latency percentile (upper bucket bound) from a rollup histogram"""
+        total = sum(rollup.get(f"le_{bound}", 0) for bound in [*LATENCY_BUCKETS_MS, "inf"])
+        if not total:
+            return 0.0
+        threshold = total * percentile / 100
+        cumulative = 0
+        for bound in LATENCY_BUCKETS_MS:
+            cumulative += rollup.get(f"le_{bound}", 0)
+            if cumulative >= threshold:
+                return float(bound)
+        return float(rollup.get("response_time_max") or LATENCY_BUCKETS_MS[-1])
+    
     @staticmethod
     async def get_user_quotas(user_id: str) -> Dict[str, Any]:
         """Get user's rate limit quotas and subscription limits"""
@@ -510,86 +711,71 @@ class RateLimitingService:
     @staticmethod
     async def get_top_endpoints(user_id: str, limit: int = 10, timeframe: str = "24h") -> Dict[str, Any]:
         """Get top API endpoints by usage"""
-        # Real database operation
-        top_endpoints = [
-            {
-                "endpoint": "/api/dashboard/overview",
-                "requests": 1234,
-                "avg_response_time": 67,
-                "success_rate": 99.0,
-                "throttle_rate": 1.2,
-                "data_usage_mb": 15.6,
-                "trending": "stable"
-            },
-            {
-                "endpoint": "/api/analytics/data",
-                "requests": 897,
-                "avg_response_time": 145,
-                "success_rate": 97.4,
-                "throttle_rate": 2.8,
-                "data_usage_mb": 45.2,
-                "trending": "up"
-            },
-            {
-                "endpoint": "/api/users/profile",
-                "requests": 654,
-                "avg_response_time": 89,
-                "success_rate": 99.5,
-                "throttle_rate": 0.5,
-                "data_usage_mb": 8.9,
-                "trending": "down"
-            },
-            {
-                "endpoint": "/api/workspaces",
-                "requests": 432,
-                "avg_response_time": 234,
-                "success_rate": 98.1,
-                "throttle_rate": 0.8,
-                "data_usage_mb": 12.3,
-                "trending": "stable"
-            }
-        ]
+        profile = await RateLimitingService.get_subscription_profile(user_id=user_id)
+        rollups = await RateLimitingService._aggregate_rollups(
+            profile["identity"], timeframe,
+            group_by="$endpoint", sort={"requests": -1}, limit=limit
+        )
+        
+        top_endpoints = []
+        for rollup in rollups:
+            requests = rollup["requests"] or 1
+            top_endpoints.append({
+                "endpoint": rollup["_id"],
+                "requests": rollup["requests"],
+                "avg_response_time": round(rollup["response_time_total"] / requests, 1),
+                "success_rate": round((requests - rollup["errors"] - rollup["throttled"]) / requests * 100, 1),
+                "throttle_rate": round(rollup["throttled"] / requests * 100, 1)
+            })
+        
+        total_requests = sum(ep["requests"] for ep in top_endpoints)
         
         return {
             "timeframe": timeframe,
             "limit": limit,
-            "endpoints": top_endpoints[:limit],
-            "total_requests": sum(ep["requests"] for ep in top_endpoints),
-            "avg_response_time": sum(ep["avg_response_time"] * ep["requests"] for ep in top_endpoints) / sum(ep["requests"] for ep in top_endpoints)
+            "endpoints": top_endpoints,
+            "total_requests": total_requests,
+            "avg_response_time": round(sum(ep["avg_response_time"] * ep["requests"] for ep in top_endpoints) / max(total_requests, 1), 1)
         }
     
     @staticmethod
     async def get_performance_metrics(user_id: str, timeframe: str = "24h") -> Dict[str, Any]:
         """Get API performance metrics"""
-        # Real database operation
+        profile = await RateLimitingService.get_subscription_profile(user_id=user_id)
+        rollups = await RateLimitingService._aggregate_rollups(profile["identity"], timeframe)
+        totals = rollups[0] if rollups else {}
+        
+        requests = totals.get("requests", 0)
+        errors = totals.get("errors", 0)
+        window_seconds = TIMEFRAMES.get(timeframe, TIMEFRAMES["24h"]).total_seconds()
+        cache_stats = await cache_manager.get_stats()
+        
         return {
             "timeframe": timeframe,
             "response_time": {
-                "average": 134.5,
-                "p50": 89.0,
-                "p95": 456.0,
-                "p99": 1234.0,
-                "min": 23.0,
-                "max": 5678.0
+                "average": round(totals.get("response_time_total", 0) / max(requests, 1), 1),
+                "p50": RateLimitingService._latency_percentile(totals, 50),
+                "p95": RateLimitingService._latency_percentile(totals, 95),
+                "p99": RateLimitingService._latency_percentile(totals, 99),
+                "min": totals.get("response_time_min") or 0.0,
+                "max": totals.get("response_time_max") or 0.0
             },
             "throughput": {
-                "requests_per_second": 12.5,
-                "requests_per_minute": 750,
-                "peak_rps": 45.6,
-                "low_rps": 2.3
+                "requests_per_second": round(requests / window_seconds, 3),
+                "requests_per_minute": round(requests / window_seconds * 60, 1),
+                "peak_rps": round((totals.get("peak_minute_requests") or 0) / 60, 2)
             },
             "error_rates": {
-                "total_errors": 23,
-                "error_rate_percentage": 1.8,
-                "4xx_errors": 15,
-                "5xx_errors": 8,
-                "timeout_errors": 2
+                "total_errors": errors,
+                "error_rate_percentage": round(errors / max(requests, 1) * 100, 2),
+                "4xx_errors": totals.get("status_4xx", 0),
+                "5xx_errors": totals.get("status_5xx", 0),
+                "throttled": totals.get("throttled", 0)
             },
             "cache_performance": {
-                "hit_rate": 76.3,
-                "miss_rate": 23.7,
-                "cache_size_mb": 245.6,
-                "avg_cache_response_time": 12.3
+                "hit_rate": cache_stats["hit_rate"],
+                "miss_rate": round(100 - cache_stats["hit_rate"], 2) if cache_stats["total_requests"] else 0,
+                "backend": cache_stats["backend"]
             }
         }
     
@@ -662,14 +848,14 @@ class RateLimitingService:
     @staticmethod
     async def reset_rate_limits(user_id: str, limit_type: str) -> Dict[str, Any]:
         """Reset rate limits (admin function)"""
-        database = get_database()
-        
-        # In real implementation, clear rate limit counters
+        profile = await RateLimitingService.get_subscription_profile(user_id=user_id)
+        cleared = await rate_limiter.reset(profile["identity"])
         reset_time = datetime.utcnow()
         
         return {
             "user_id": user_id,
             "limit_type": limit_type,
+            "counters_cleared": cleared,
             "reset_at": reset_time.isoformat(),
             "message": f"{limit_type} rate limits have been reset"
         }
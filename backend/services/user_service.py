@@ -9,6 +9,7 @@ from bson import ObjectId
 
 from core.database import get_users_collection, get_workspaces_collection
 from core.auth import get_password_hash, verify_password
+from core.auth_cache import auth_cache
 
 class UserService:
     def __init__(self):
@@ -90,6 +91,7 @@ class UserService:
             {"_id": user_doc["_id"]},
             {"$inc": {"usage_stats.workspaces_created": 1}}
         )
+        auth_cache.invalidate_user(user_doc["_id"])
         
         # Remove password from response
         user_doc.pop("password", None)
@@ -114,6 +116,7 @@ class UserService:
                 "$inc": {"usage_stats.login_count": 1}
             }
         )
+        auth_cache.invalidate_user(user["_id"])
         
         # Remove password from response
         user.pop("password", None)
@@ -163,6 +166,7 @@ class UserService:
             {"_id": user_id},
             update_doc
         )
+        auth_cache.invalidate_user(user_id)
         
         if result.modified_count == 0:
             raise ValueError("User not found or no changes made")
@@ -262,6 +266,7 @@ class UserService:
             {"_id": user_id},
             {"$set": {"preferences": preferences, "updated_at": datetime.utcnow()}}
         )
+        auth_cache.invalidate_user(user_id)
         
         if result.modified_count == 0:
             raise ValueError("User not found or no changes made")
@@ -6,6 +6,7 @@ Professional Mewayz Platform
 from datetime import datetime, timedelta
 from typing import Dict, Any, List, Optional
 from core.database import get_database
+from core.auth_cache import auth_cache
 import uuid
 
 class UsersService:
@@ -43,6 +44,7 @@ class UsersService:
             {"_id": user_id},
             {"$set": update_data}
         )
+        auth_cache.invalidate_user(user_id)
         
         return await db.users.find_one({"_id": user_id})
     
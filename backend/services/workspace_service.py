@@ -6,6 +6,8 @@ from typing import Optional, Dict, Any, List
 from datetime import datetime
 import uuid
 
+from core.cache import cache_manager
+from core.auth_cache import auth_cache
 from core.database import get_workspaces_collection, get_users_collection
 
 class WorkspaceService:
@@ -65,12 +67,14 @@ class WorkspaceService:
         
         # Insert workspace
         await self.workspaces_collection.insert_one(workspace_doc)
+        await cache_manager.invalidate_collection_cache("workspaces", owner_id)
         
         # Update user workspace count
         await self.users_collection.update_one(
             {"_id": owner_id},
             {"$inc": {"usage_stats.workspaces_created": 1}}
         )
+        auth_cache.invalidate_user(owner_id)
         
         return workspace_doc
 
@@ -274,6 +278,7 @@ class WorkspaceService:
         
         if result.deleted_count == 0:
             raise ValueError("Failed to delete workspace")
+        await cache_manager.invalidate_collection_cache("workspaces", owner_id)
         
         return {
             "workspace_id": workspace_id,
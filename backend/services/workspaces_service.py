@@ -5,6 +5,7 @@ Professional Mewayz Platform
 
 from datetime import datetime
 from typing import Dict, Any, List, Optional
+from core.cache import cache_manager
 from core.database import get_database
 import uuid
 
@@ -53,6 +54,7 @@ class WorkspacesService:
     }
         
         result = await db.workspaces.insert_one(workspace)
+        await cache_manager.invalidate_collection_cache("workspaces", user_id)
         return workspace
     
     @staticmethod
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Backfill Link Click Rollups
+Replays raw link_clicks into the hourly/daily link rollups (see
+services/link_click_rollup_service.py) for clicks recorded before the rollups
+existed. Run it once: counters are incremented, so replaying a click twice
+counts it twice. Raw clicks only start expiring once LINK_CLICK_TTL_ENABLED
+is set, which should happen after this has run.
+
+Usage: python scripts/maintenance/backfill_link_rollups.py --until 2026-10-18T12:00:00 [--link-id ID]
+  --until    first moment already covered by live rollups (the deploy time)
+  --link-id  only replay one link's clicks
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+from datetime import datetime
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', 'backend'))
+
+from core.database import connect_to_mongo, close_mongo_connection, get_database
+from core.write_behind import drain_all_writers
+from services.link_click_rollup_service import link_click_rollups
+
+async def main():
+    parser = argparse.ArgumentParser(description="Backfill link click rollups from raw clicks")
+    parser.add_argument("--until", required=True, type=datetime.fromisoformat,
+                        help="replay clicks before this UTC time")
+    parser.add_argument("--link-id", help="only replay this link")
+    args = parser.parse_args()
+
+    query = {"clicked_at": {"$lt": args.until}}
+    if args.link_id:
+        query["link_id"] = args.link_id
+
+    # An offline replay waits out a slow database instead of shedding clicks
+    link_click_rollups.hourly.block_timeout = None
+    link_click_rollups.daily.block_timeout = None
+
+    await connect_to_mongo()
+    try:
+        replayed = 0
+        async for click in get_database().link_clicks.find(query).batch_size(5000):
+            await link_click_rollups.record(
+                click["link_id"], click["clicked_at"], click.get("device_type", "unknown"),
+                click.get("referer"), click.get("country"), click.get("ip_address"),
+                block=True
+            )
+            replayed += 1
+        await drain_all_writers()
+        print(f"Replayed {replayed} clicks into link rollups")
+        print("Raw clicks can now expire: set LINK_CLICK_TTL_ENABLED=true")
+    finally:
+        await close_mongo_connection()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+Build Analytics Rollups
+Rolls raw analytics_events up into analytics_daily_rollups (see
+services/analytics_rollup_service.py), resuming from the stored watermark.
+
+Usage: python scripts/maintenance/build_analytics_rollups.py [--rebuild-days N] [--max-days N]
+  --rebuild-days N  re-roll the last N complete days, e.g. after a backfill
+  --max-days N      days rolled per batch; batches repeat until caught up (default 31)
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', 'backend'))
+
+from core.database import connect_to_mongo, close_mongo_connection
+from services.analytics_rollup_service import analytics_rollups, day_start
+
+async def main():
+    parser = argparse.ArgumentParser(description="Build daily analytics rollups")
+    parser.add_argument("--rebuild-days", type=int, default=0, help="re-roll the last N complete days")
+    parser.add_argument("--max-days", type=int, default=31, help="days rolled per batch")
+    args = parser.parse_args()
+
+    rebuild_from = None
+    if args.rebuild_days > 0:
+        rebuild_from = day_start(datetime.utcnow()) - timedelta(days=args.rebuild_days)
+
+    await connect_to_mongo()
+    try:
+        while True:
+            result = await analytics_rollups.build_daily_rollups(rebuild_from, max_days=args.max_days)
+            print(f"Rolled {result['days_rolled']} days (re-rolled {result['days_rerolled']}), rolled through {result['rolled_through']}")
+            # A long backlog is processed in --max-days chunks
+            if result["up_to_date"] or not result["days_rolled"]:
+                break
+            rebuild_from = None
+    finally:
+        await close_mongo_connection()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Ensure Mongo Indexes
+Reconciles the declarative index registry (core/indexes.py) with the
+database: creates missing indexes and reports conflicting ones.
+
+Usage: python scripts/maintenance/ensure_indexes.py [--check] [--json]
+  --check  only report missing indexes, do not create them (exit 1 if any)
+  --json   print the full report as JSON
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', 'backend'))
+
+from core.database import connect_to_mongo, close_mongo_connection
+from core.indexes import index_registry
+from services.analytics_ingest_service import analytics_ingest
+
+def print_section(title, specs):
+    if not specs:
+        return
+    print(f"{title} ({len(specs)})")
+    for spec in specs:
+        keys = ", ".join(f"{name}:{direction}" for name, direction in spec["keys"])
+        reason = f"  -- {spec['reason']}" if spec.get("reason") else ""
+        print(f"  {spec['collection']}.{spec['name']}  [{keys}]  ({spec['owner']}){reason}")
+
+async def main():
+    parser = argparse.ArgumentParser(description="Reconcile declared Mongo indexes")
+    parser.add_argument("--check", action="store_true", help="report only, do not create indexes")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    await connect_to_mongo()
+    try:
+        if not args.check:
+            # Index builds would otherwise create the event stream as a regular collection
+            await analytics_ingest.ensure_collection()
+        report = await index_registry.reconcile(create=not args.check)
+    finally:
+        await close_mongo_connection()
+
+    if args.json:
+        print(json.dumps(report, indent=2, default=str))
+    else:
+        print(f"Declared indexes: {report['declared']}, present: {len(report['present'])}")
+        print_section("Created", report["created"])
+        print_section("Missing", report["missing"])
+        print_section("Conflicts", report["conflicts"])
+        for error in report["errors"]:
+            print(f"Error: {error}")
+
+    return 1 if report["missing"] or report["conflicts"] or report["errors"] else 0
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
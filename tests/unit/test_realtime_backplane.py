@@ -0,0 +1,134 @@
+"""
+Realtime backplane: two WebSocketConnectionManagers, standing in for two
+workers, sharing one InProcessHub
+"""
+
+import asyncio
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "backend"))
+
+from core.realtime_backplane import InProcessBackplane, InProcessHub
+from core.realtime_notification_system import WebSocketConnectionManager
+
+class FakeWebSocket:
+    """Records sent frames; while paused, sends block so frames stay queued"""
+
+    def __init__(self):
+        self.sent = []
+        self.resumed = asyncio.Event()
+        self.resumed.set()
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, frame):
+        await self.resumed.wait()
+        self.sent.append(json.loads(frame))
+
+    async def close(self, code=1000):
+        pass
+
+def make_workers(namespace="test"):
+    hub = InProcessHub()
+    first = WebSocketConnectionManager(namespace, InProcessBackplane(namespace, hub))
+    second = WebSocketConnectionManager(namespace, InProcessBackplane(namespace, hub))
+    return first, second
+
+async def flush(*managers):
+    for manager in managers:
+        await manager.backplane.flush()
+    # Let the writer tasks drain their queues
+    await asyncio.sleep(0.01)
+
+async def close(*managers):
+    for manager in managers:
+        for websocket in list(manager.outbound):
+            manager.disconnect(websocket)
+        await manager.backplane.close()
+
+def test_send_reaches_sockets_in_other_worker():
+    async def scenario():
+        first, second = make_workers()
+        local, remote = FakeWebSocket(), FakeWebSocket()
+        await first.connect(local, "user-1")
+        await second.connect(remote, "user-1")
+        await flush(first, second)
+
+        queued = await first.send_to_user({"type": "ping", "n": 1}, "user-1")
+        await flush(first, second)
+
+        assert queued == 1
+        assert [message["type"] for message in local.sent] == ["connection_ack", "ping"]
+        assert [message["type"] for message in remote.sent] == ["connection_ack", "ping"]
+        assert first.backplane.stats["published"] == 1
+        assert second.backplane.stats["received"] == 1
+        # The sender delivered locally and ignores its own frame on the hub
+        assert first.backplane.stats["received"] == 0
+        await close(first, second)
+
+    asyncio.run(scenario())
+
+def test_send_skips_workers_without_the_user():
+    async def scenario():
+        first, second = make_workers()
+        other = FakeWebSocket()
+        await second.connect(other, "user-2")
+        await flush(first, second)
+
+        await first.send_to_user({"type": "ping"}, "user-1")
+        await first.broadcast_to_all({"type": "announcement"})
+        await flush(first, second)
+
+        assert [message["type"] for message in other.sent] == ["connection_ack", "announcement"]
+        await close(first, second)
+
+    asyncio.run(scenario())
+
+def test_presence_counts_span_workers():
+    async def scenario():
+        first, second = make_workers()
+        sockets = [FakeWebSocket() for _ in range(3)]
+        await first.connect(sockets[0], "user-1")
+        await first.connect(sockets[1], "user-1")
+        await second.connect(sockets[2], "user-1")
+        await flush(first, second)
+
+        assert first.get_user_connection_count("user-1") == 2
+        assert await first.get_global_user_connection_count("user-1") == 3
+        assert await second.get_global_user_connection_count("user-1") == 3
+        assert await second.get_global_total_connections() == 3
+
+        first.disconnect(sockets[0])
+        await flush(first, second)
+        assert await second.get_global_user_connection_count("user-1") == 2
+
+        await first.backplane.close()
+        assert await second.get_global_user_connection_count("user-1") == 1
+        await close(first, second)
+
+    asyncio.run(scenario())
+
+def test_remote_frames_coalesce_in_receiving_queue():
+    async def scenario():
+        first, second = make_workers()
+        remote = FakeWebSocket()
+        await second.connect(remote, "user-1")
+        await flush(first, second)
+
+        remote.resumed.clear()
+        for count in range(1, 4):
+            await first.send_to_user({"type": "unread", "count": count}, "user-1", coalesce_key="unread")
+        await first.send_to_user({"type": "ping"}, "user-1")
+        await flush(first, second)
+
+        assert second.get_stats()["frames_coalesced"] == 2
+        remote.resumed.set()
+        await asyncio.sleep(0.01)
+        assert [message["type"] for message in remote.sent] == ["connection_ack", "unread", "ping"]
+        assert remote.sent[1]["count"] == 3
+        await close(first, second)
+
+    asyncio.run(scenario())